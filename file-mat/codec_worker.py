@@ -0,0 +1,133 @@
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Client of the persistent codec worker (see mat-worker.py).
+#
+# The worker listens on Unix domain socket. Request and reply are single JSON lines,
+# the pixel data of decoded cel textures is written by worker to shared memory file
+# whose descriptor is passed along with the reply.
+
+import json
+import mmap
+import os
+import socket
+import stat
+import tempfile
+
+from typing import List, Optional
+
+from mat_format import ColorFormat, ColorMode
+from mat_codec import Mipmap
+
+WORKER_SOCKET_ENV    = 'MAT_CODEC_WORKER_SOCKET' # overrides default socket path
+WORKER_TIMEOUT       = 10.0 # seconds client waits for worker reply
+WORKER_TIMEOUT_PER_MB = 2.0 # additional seconds client waits for worker reply per MiB of decoded MAT file
+WORKER_RECV_SIZE     = 64 * 1024
+
+def get_worker_socket_path() -> str:
+    """Returns path of worker socket. The socket is per user and lives in runtime dir if available."""
+    path = os.environ.get(WORKER_SOCKET_ENV)
+    if path:
+        return path
+    run_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(run_dir, f'mat-codec-worker-{os.getuid()}.sock')
+
+def is_worker_supported() -> bool:
+    return hasattr(socket, 'AF_UNIX') and hasattr(socket, 'recv_fds')
+
+def check_worker_socket(socket_path: str):
+    """
+    Check that worker socket is owned by the current user, so that the socket in shared folder (e.g. /tmp)
+    can't be made by another user. Raises OSError if socket doesn't exist or isn't owned by the current user.
+    """
+    st = os.lstat(socket_path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"Codec worker socket '{socket_path}' is not owned by current user")
+
+def send_json(sock: socket.socket, msg: dict, fds: List[int] = []):
+    data = json.dumps(msg).encode() + b'\n'
+    if fds:
+        sent = socket.send_fds(sock, [data], fds)
+        data = data[sent:]
+    sock.sendall(data)
+
+def recv_json(sock: socket.socket, max_fds: int = 0) -> tuple:
+    """Receive JSON line message and passed file descriptors. Returns message and list of fds."""
+    if max_fds:
+        data, fds, _, _ = socket.recv_fds(sock, WORKER_RECV_SIZE, max_fds)
+    else:
+        data, fds = sock.recv(WORKER_RECV_SIZE), []
+    while data and not data.endswith(b'\n'):
+        chunk = sock.recv(WORKER_RECV_SIZE)
+        if not chunk:
+            break
+        data += chunk
+    if not data.endswith(b'\n'):
+        for fd in fds:
+            os.close(fd)
+        raise ConnectionError('Incomplete message from codec worker')
+    return json.loads(data), list(fds)
+
+def request_worker(msg: dict, timeout: float = WORKER_TIMEOUT) -> tuple:
+    """Send request to worker and return reply and passed fds. Raises OSError if worker isn't running."""
+    socket_path = get_worker_socket_path()
+    check_worker_socket(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        send_json(sock, msg)
+        return recv_json(sock, 1)
+
+def decode_with_worker(file_path: str, cmp_file_path: Optional[str] = None, max_cells: int = -1) -> Optional[List[Mipmap]]:
+    """
+    Decode cel textures of MAT file in codec worker.
+    Returns None if worker is not running or it failed to decode the file,
+    in this case the file should be decoded in-process.
+    See mat_codec.read_mat_file for parameters.
+    """
+    if not is_worker_supported() or not os.path.exists(get_worker_socket_path()):
+        return None
+
+    fds: List[int] = []
+    try:
+        # Decoding of large file takes longer, the timeout only detects hung worker
+        timeout = WORKER_TIMEOUT + WORKER_TIMEOUT_PER_MB * os.path.getsize(file_path) / (1024 * 1024)
+        reply, fds = request_worker({
+            'op'       : 'decode',
+            'path'     : os.path.abspath(file_path),
+            'cmp'      : os.path.abspath(cmp_file_path) if cmp_file_path else None,
+            'max_cells': max_cells
+        }, timeout)
+        if 'error' in reply or len(fds) != 1:
+            return None
+
+        cels: List[Mipmap] = []
+        size = reply['size']
+        with mmap.mmap(fds[0], size, access=mmap.ACCESS_READ) if size else memoryview(b'') as shm:
+            for width, height, ci, lods in reply['cels']:
+                ci = ColorFormat(ColorMode(ci[0]), *ci[1:])
+                cels.append(Mipmap(width, height, ci, [shm[offset: offset + lod_size] for offset, lod_size in lods]))
+        return cels
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    finally:
+        for fd in fds:
+            os.close(fd)
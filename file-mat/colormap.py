@@ -0,0 +1,89 @@
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+
+from struct import Struct
+from typing import BinaryIO, NamedTuple, Optional
+
+
+CMP_FILE_MAGIC     = b'CMP '
+CMP_PALETTE_SIZE   = 256 * 3 # 256 RGB entries
+CMP_FILE_EXTENSION = '.cmp'
+
+class CmpHeader(NamedTuple):
+    magic: bytes
+    version: int
+    transparency: int
+
+cmph_serf = Struct('<4sii52x')
+
+class ColorMap(NamedTuple):
+    header: CmpHeader
+    palette: bytes # 256 * RGB u8
+
+    def channel_table(self, channel: int) -> bytes:
+        """
+        Returns 256 byte translation table for palette color channel.
+        i.e.: channel_table(0)[idx] is red component of palette color at idx.
+        """
+        return self.palette[channel::3]
+
+
+def read_colormap(file_path: str) -> ColorMap:
+    """
+    Read ColorMap from CMP file.
+    Only header and palette are read, light level and transparency tables are skipped.
+    :param file_path: path to the CMP file
+    """
+    with open(file_path, 'rb') as f:
+        return read_colormap_from_file(f)
+
+def read_colormap_from_file(f: BinaryIO) -> ColorMap:
+    """Read ColorMap from CMP file object"""
+    data = f.read(cmph_serf.size)
+    if len(data) != cmph_serf.size:
+        raise ImportError('Invalid CMP file')
+    h = CmpHeader._make(cmph_serf.unpack(data))
+    if h.magic != CMP_FILE_MAGIC:
+        raise ImportError('Invalid CMP file')
+
+    palette = f.read(CMP_PALETTE_SIZE)
+    if len(palette) != CMP_PALETTE_SIZE:
+        raise ImportError('Invalid CMP file palette size')
+    return ColorMap(h, palette)
+
+def find_colormap(mat_file_path: str) -> Optional[str]:
+    """
+    Find the CMP file for MAT file.
+    First the CMP file with the same name as MAT file is searched for in the MAT file folder
+    and if not found the first CMP file found in the folder is returned.
+    :param mat_file_path: path to the MAT file
+    """
+    cmp_path = os.path.splitext(mat_file_path)[0] + CMP_FILE_EXTENSION
+    if os.path.isfile(cmp_path):
+        return cmp_path
+
+    mat_dir = os.path.dirname(os.path.abspath(mat_file_path))
+    for name in sorted(os.listdir(mat_dir)):
+        if name.lower().endswith(CMP_FILE_EXTENSION):
+            return os.path.join(mat_dir, name)
+    return None
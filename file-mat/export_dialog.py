@@ -0,0 +1,617 @@
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Export dialog of GIMP Plug-in for MAT file format.
+# Note, this module is imported only when the export procedure runs interactively.
+
+import gi
+gi.require_version('Gimp', '3.0')
+gi.require_version('GimpUi', '3.0')
+from gi.repository import Gimp, GimpUi, Gegl, GObject, GLib, Gtk, GdkPixbuf
+
+from utils import *
+from mat import *
+
+import gettext
+_ = gettext.gettext
+
+INPUT_MAX_MIPMAP_LEVEL    = 16
+INPUT_MAX_MIN_MIPMAP_SIZE = 128
+THUMBNAIL_SIZE            = 128
+
+def format_file_size(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024 or unit == 'MiB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024.0
+
+
+class ExportDialog(GimpUi.Dialog):
+    COL_IDX_LAYER      = 0
+    COL_IDX_THUMB      = 1
+    COL_IDX_INFO       = 2
+    COL_IDX_IS_MIPMAP  = 3
+    COL_IDX_EXPORT     = 4
+    COL_IDX_CEL_NUM    = 5
+    RESPONSE_EXPORT    = 1
+
+    def __init__(self, image: Gimp.Image, file_path: str, role: str, lod_min_size: int, lod_max_levels: int, extra_targets: List[Tuple[str, ColorFormat]] = [],
+                 verify: bool = False):
+        GimpUi.Dialog.__init__(self,
+           title=_('Export Image as MAT'), role=role,
+           parent=None, modal=True
+        )
+
+        self.set_modal(True)
+        self.set_keep_above(True)
+
+        self.eimg      = image.duplicate()
+        self.file_path = file_path
+
+        # Additional (file path, color format) targets exported in the same pass
+        self.extra_targets = list(extra_targets)
+        self.verify        = verify
+
+        self.add_button(_("Cancel"), Gtk.ResponseType.CANCEL)
+        self.add_button(_("Export"), self.RESPONSE_EXPORT)
+
+        self.set_name(role)
+        self.connect('response', self.on_response)
+        self.connect('destroy', self.on_destroy)
+
+        self.lod_max_levels = lod_max_levels
+        self.lod_min_size   = lod_min_size
+
+        # Per layer list of lossless color formats
+        self.layer_lossless_formats = {}
+
+        # Color depth preview state.
+        # Preview thumbnails and encoded LOD 0 pixel data are cached per (layer ID, color format, dither mode)
+        self.layer_thumbnails  = {}
+        self.preview_cache     = {}
+        self.encoded_cache     = {}
+        self.preview_source_id = None
+
+        # Make export options & image view widgets
+        export_opt_box      = self.make_export_options_box()
+        self.img_view_frame = self.make_image_view()
+        self.update_format_advice()
+
+        # Pack image vie widget and total export widget in a vertical box
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        vbox.pack_start(self.img_view_frame, True, True, 15)
+
+        self.total_label = Gtk.Label()
+        self.total_label.set_markup (f'<b>Texture(s) to export: {self.export_tex_count}</b>')
+        self.total_label.set_xalign(0.1)
+        vbox.pack_end(self.total_label , True, True, 0)
+
+        # Warn that image opened at reduced MipMap LOD level would be exported at reduced size
+        view = get_image_reduced_view(image)
+        if view is not None:
+            view_label = Gtk.Label()
+            view_label.set_markup(f'<b>Warning:</b> image was opened as reduced view at LOD level {view.lod_level} of {view.width}x{view.height} texture')
+            view_label.set_xalign(0.1)
+            vbox.pack_end(view_label, True, True, 0)
+
+        # Pack Export options and image view widgets in a horizontal box
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        hbox.pack_start(export_opt_box, True, True, 40)
+        hbox.pack_start(vbox, True, True, 15)
+
+        # Add hbox to the content area of the dialog
+        self.get_content_area().pack_start(hbox, True, True, 0)
+        self.show_all()
+
+        self.set_resizable(False)
+
+    def __del__(self):
+        Gimp.Image.delete(self.eimg)
+
+    def make_export_options_box(self):
+        b_alpha = self.has_alpha(self.eimg)
+
+        # Color depth
+        if b_alpha:
+            self.rb_color_16bit = Gtk.RadioButton(label='16 bit (RGBA-4444)')
+
+            self.rb_color_16bit_alpha_1bit = Gtk.RadioButton.new_from_widget(self.rb_color_16bit)
+            self.rb_color_16bit_alpha_1bit.set_label('16 bit (RGBA-5551)')
+
+            self.rb_color_32bit = Gtk.RadioButton.new_from_widget(self.rb_color_16bit_alpha_1bit)
+            self.rb_color_32bit.set_label('32 bit (RGBA-8888)')
+        else:
+            self.rb_color_16bit = Gtk.RadioButton(label='16 bit (RGB-565)')
+            self.rb_color_16bit_alpha_1bit = None
+
+            self.rb_color_32bit = Gtk.RadioButton.new_from_widget(self.rb_color_16bit)
+            self.rb_color_32bit.set_label('24 bit (RGB-888)')
+
+        # Radio button, color format and label of each color depth option
+        if b_alpha:
+            self.color_format_options = [
+                (self.rb_color_16bit, RGBA4444, self.rb_color_16bit.get_label()),
+                (self.rb_color_16bit_alpha_1bit, RGBA5551, self.rb_color_16bit_alpha_1bit.get_label()),
+                (self.rb_color_32bit, RGBA8888, self.rb_color_32bit.get_label())
+            ]
+        else:
+            self.color_format_options = [
+                (self.rb_color_16bit, RGB565, self.rb_color_16bit.get_label()),
+                (self.rb_color_32bit, RGB888, self.rb_color_32bit.get_label())
+            ]
+
+        # Place color depth radio buttons in a box
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        box.pack_start(self.rb_color_16bit, False, False, 0)
+        if self.rb_color_16bit_alpha_1bit:
+            box.pack_start(self.rb_color_16bit_alpha_1bit, False, False, 0)
+
+        # 32 bit radio button
+        box.pack_start(self.rb_color_32bit, False, False, 0)
+
+        # Dithering
+        self.cmb_dither = Gtk.ComboBoxText()
+        for mode, label in ((DitherMode.NONE, _('No dithering')), (DitherMode.ORDERED, _('Ordered (Bayer)')), (DitherMode.ERROR_DIFFUSION, _('Error diffusion'))):
+            self.cmb_dither.append(str(int(mode)), label)
+        self.cmb_dither.set_active_id(str(int(DitherMode.NONE)))
+        self.cmb_dither.set_tooltip_text(_('Dithering applied to every Mipmap level when encoding to lower color depth.'))
+        self.cmb_dither.connect('changed', lambda cmb: self.update_previews())
+        box.pack_start(self.cmb_dither, False, False, 0)
+
+        # Suggested color format
+        self.format_advice_label = Gtk.Label()
+        self.format_advice_label.set_line_wrap(True)
+        self.format_advice_label.set_xalign(0.0)
+        box.pack_start(self.format_advice_label, False, False, 0)
+
+        # Color depth preview
+        self.cb_preview = Gtk.CheckButton(label='Preview')
+        self.cb_preview.set_tooltip_text(_('Show texture thumbnails encoded in the selected color depth'))
+        self.cb_preview.connect('toggled', lambda cb: self.update_previews())
+        box.pack_start(self.cb_preview, False, False, 0)
+
+        for rb, _cf, _label in self.color_format_options:
+            rb.connect('toggled', lambda rb: rb.get_active() and self.update_previews())
+
+        # Add box to a frame
+        cdo_frame_label = Gtk.Label()
+        cdo_frame_label.set_markup('<b>Color Depth:</b>')
+
+        cdo_frame = Gtk.Frame()
+        cdo_frame.set_label_widget(cdo_frame_label)
+        cdo_frame.add(box)
+
+        # Min MM size
+        adjustment = Gtk.Adjustment(value=self.lod_min_size, 
+                                    lower=2, 
+                                    upper=INPUT_MAX_MIN_MIPMAP_SIZE, 
+                                    step_increment=1)
+        sb_mm_min_size = Gtk.SpinButton(adjustment=adjustment)
+        sb_mm_min_size.set_tooltip_text(_('Min size of Mipmap LOD texture'))
+        sb_mm_min_size.set_numeric(True)
+        sb_mm_min_size.set_update_policy(Gtk.SpinButtonUpdatePolicy.IF_VALID)
+
+        def sb_mm_min_size_changed(sp):
+            val = sp.get_value_as_int()
+            if val != self.lod_min_size:
+                if val > self.lod_min_size:
+                    self.lod_min_size = self.lod_min_size << 1
+                else:
+                    self.lod_min_size = self.lod_min_size >> 1
+                sp.set_value(self.lod_min_size)
+                self.update_format_advice()
+        sb_mm_min_size.connect('changed', sb_mm_min_size_changed)
+
+        t_mm_min_size = Gtk.Grid()
+        t_mm_min_size.attach(Gtk.Label(label='Min Size:    '), 0, 0, 1, 1)
+        t_mm_min_size.attach(sb_mm_min_size, 1, 0, 1, 1)
+
+        # Max MM level
+        adjustment = Gtk.Adjustment(value=self.lod_max_levels,
+                                    lower=1,
+                                    upper=INPUT_MAX_MIPMAP_LEVEL,
+                                    step_increment=1)
+        sb_mm_level_count = Gtk.SpinButton(adjustment=adjustment)
+        sb_mm_level_count.set_tooltip_text(_('Max Mipmap LOD level'))
+        sb_mm_level_count.set_numeric(True)
+        sb_mm_level_count.set_update_policy(Gtk.SpinButtonUpdatePolicy.IF_VALID)
+
+        def sb_mm_max_level_changed(sp):
+            self.lod_max_levels = sp.get_value_as_int()
+            self.update_format_advice()
+        sb_mm_level_count.connect('changed', sb_mm_max_level_changed)
+
+        t_mm_level_count = Gtk.Grid()
+        t_mm_level_count.attach(Gtk.Label(label='Max Level:  '), 0, 0, 1, 1)
+        t_mm_level_count.attach(sb_mm_level_count, 1, 0, 1, 1)
+
+        # Toggle Mipmap button
+        btn_toggle_mipmap = Gtk.Button(label='Toggle Mipmap')
+        btn_toggle_mipmap.set_tooltip_text(_('Toggle On/Off Mipmap exporting for all textures'))
+
+        def btn_toggle_mipmap_clicked(btn):
+            # Store our state in a custom property
+            mip_on = getattr(btn, 'mipmap_toggle_state', False)
+            mip_on = bool(not mip_on)
+            setattr(btn, 'mipmap_toggle_state', mip_on)
+            for row in self.liststore:
+                row[self.COL_IDX_IS_MIPMAP] = mip_on
+                set_layer_as_mipmap(row[self.COL_IDX_LAYER], mip_on)
+            self.update_format_advice()
+
+        btn_toggle_mipmap.connect('clicked', btn_toggle_mipmap_clicked)
+
+        # Mipmap option frame
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        box.set_homogeneous(True)
+        box.pack_start(t_mm_min_size, False, False, 0)
+        box.pack_start(t_mm_level_count, False, False, 0)
+        box.pack_start(btn_toggle_mipmap, False, False, 0)
+
+        # Add Mipmap options to a frame
+        cmmo_frame_label = Gtk.Label()
+        cmmo_frame_label.set_markup('<b>Mipmap Options:</b>')
+
+        mmo_frame = Gtk.Frame()
+        mmo_frame.set_label_widget(cmmo_frame_label)
+        mmo_frame.add(box)
+
+        # Main option frame
+        o_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        o_box.pack_start(cdo_frame, False, False, 10)
+        o_box.pack_start(mmo_frame, False, False, 10)
+
+        # Sprite sheet option
+        self.cb_slice_sprite_sheets = None
+        if any(get_layer_sprite_sheet(l) is not None for l in self.eimg.get_layers()):
+            self.cb_slice_sprite_sheets = Gtk.CheckButton(label='Slice sprite sheets')
+            self.cb_slice_sprite_sheets.set_tooltip_text(_('Export every cel of sprite sheet layer as separate MAT cel texture'))
+            self.cb_slice_sprite_sheets.set_active(True)
+            self.cb_slice_sprite_sheets.connect('toggled', lambda cb: self.update_format_advice())
+            o_box.pack_start(self.cb_slice_sprite_sheets, False, False, 10)
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        box.set_size_request(145, -1)
+        box.pack_start(o_box, True, False, 0)
+
+        return box
+
+    def make_image_view(self):
+        # Create a ListStore model
+        self.liststore = Gtk.ListStore(GObject.TYPE_PYOBJECT, GdkPixbuf.Pixbuf, str, bool, bool, int) # layer, thumbnail image, info text, is_mipmap, export, cel_num
+
+        for idx, layer in enumerate(reversed(self.eimg.get_layers())):
+            pbuf = self.get_layer_thumbnail(layer)
+            self.layer_thumbnails[layer.get_id()] = pbuf
+            img_info = f'<b>Name</b>: {layer.get_name()}'
+            img_info += f'\n<b>Size</b>: {layer.get_width()}x{layer.get_height()}'
+            img_info += '\n<b>Color</b>: {}'.format('RGB' if self.eimg.get_base_type() == Gimp.ImageBaseType.RGB else 'Grayscale' if self.eimg.get_base_type() == Gimp.ImageBaseType.GRAY else 'Indexed')
+            grid = get_layer_sprite_sheet(layer)
+            if grid is not None:
+                img_info += f'\n<b>Sprite sheet</b>: {grid.cel_count} cels {grid.cel_width}x{grid.cel_height}'
+            img_info += '\n<b>Mipmap</b>:'
+            self.liststore.append([layer, pbuf, img_info, is_layer_mipmap(layer), True, idx])
+
+        self.export_tex_count = len(self.liststore)
+
+        self.treeview = Gtk.TreeView(model=self.liststore)
+        self.treeview.set_enable_search(False)
+        self.treeview.set_grid_lines(Gtk.TreeViewGridLines.BOTH)
+        self.treeview.get_selection().set_mode(Gtk.SelectionMode.NONE)
+
+        # Column 'Cel num'
+        renderer = Gtk.CellRendererText()
+        renderer.set_property('xalign', 0.5)
+
+        col_cel_num = Gtk.TreeViewColumn('Cel', renderer, text=self.COL_IDX_CEL_NUM)
+        col_cel_num.pack_start(renderer, False)
+
+        col_cel_num_header = Gtk.Label(label='Cel')
+        col_cel_num_header.show_all()
+
+        tooltip = Gtk.Tooltip()
+        col_cel_num_header.set_tooltip_text('MAT cel number.\ni.e.: The sequence number of layer texture when exported to MAT file.')
+
+        col_cel_num.set_widget(col_cel_num_header)
+        self.treeview.append_column(col_cel_num)
+
+        # Column 'Texture'
+        pixrd = Gtk.CellRendererPixbuf()
+        col_pixbuf = Gtk.TreeViewColumn('Texture', pixrd, pixbuf=self.COL_IDX_THUMB)
+        col_pixbuf.set_min_width(THUMBNAIL_SIZE)
+        self.treeview.append_column(col_pixbuf)
+
+        # Column 'Info'
+        col_info = Gtk.TreeViewColumn()
+
+        # column tooltip
+        col_info_header = Gtk.Label(label='Info & Options')
+        col_info_header.show_all()
+        col_info.set_widget(col_info_header)
+
+        col_info_header.set_tooltip_text("Layer info and export options.\nIf 'Mipmap' is checked, layer image will be exported as Mipmap texture.")
+
+        # info text
+        renderer = Gtk.CellRendererText()
+        renderer.set_property('yalign', 0.4)
+        renderer.set_property('width', 260)
+        renderer.set_property('height', THUMBNAIL_SIZE)
+        col_info.pack_start(renderer, False)
+        col_info.add_attribute(renderer, 'markup', self.COL_IDX_INFO)
+
+        # CB Mipmap
+        renderer = Gtk.CellRendererToggle()
+        renderer.set_property('xalign', 0.3) # have no effect
+        renderer.set_property('yalign', 0.85)
+
+        def on_cb_mipmap_toggled(widget, path):
+            is_mipmap = not self.liststore[path][self.COL_IDX_IS_MIPMAP]
+            self.liststore[path][self.COL_IDX_IS_MIPMAP] = is_mipmap
+            set_layer_as_mipmap(self.liststore[path][self.COL_IDX_LAYER], is_mipmap)
+            self.update_format_advice()
+
+        renderer.connect('toggled', on_cb_mipmap_toggled)
+
+        col_info.pack_start(renderer, False)
+        col_info.add_attribute(renderer, 'active', self.COL_IDX_IS_MIPMAP)
+
+        self.treeview.append_column(col_info)
+
+        # Column 'Export'
+        def on_cb_export_toggled(widget, path):
+            row = self.liststore[path]
+            export = not row[self.COL_IDX_EXPORT]
+            row[self.COL_IDX_EXPORT] = export
+            self.export_tex_count += 1 if export else -1
+            self.set_btn_export_sensitive(self.export_tex_count > 0)
+            self.total_label.set_markup(f'<b>Texture(s) to export: {self.export_tex_count}</b>')
+
+            # re-enumerate rows
+            idx = 0
+            row[self.COL_IDX_CEL_NUM] = idx if export else -1
+            for row in self.liststore:
+                if row[self.COL_IDX_CEL_NUM] > -1:
+                    row[self.COL_IDX_CEL_NUM] = idx
+                    idx += 1
+            self.update_format_advice()
+
+        cb_export = Gtk.CellRendererToggle()
+        cb_export.connect('toggled', on_cb_export_toggled)
+
+        col_export = Gtk.TreeViewColumn('Export', cb_export)
+        col_export.add_attribute(cb_export, 'active', self.COL_IDX_EXPORT)
+
+        col_export_header = Gtk.Label(label='Export')
+        col_export_header.show_all()
+        col_export_header.set_tooltip_text('Export texture to file.')
+        col_export.set_widget(col_export_header)
+
+        self.treeview.append_column(col_export)
+
+        # Scroll window & root frame
+        scrl_win = Gtk.ScrolledWindow()
+        scrl_win.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrl_win.add(self.treeview)
+        scrl_win.set_size_request(THUMBNAIL_SIZE, THUMBNAIL_SIZE * 5 + THUMBNAIL_SIZE // 2)
+
+        frame_imgs = Gtk.Frame()
+        frame_imgs.add(scrl_win)
+        frame_imgs.set_size_request(535, -1)
+
+        return frame_imgs
+
+    def get_layer_thumbnail(self, layer):
+        from gi.repository import GdkPixbuf
+
+        width = layer.get_width()
+        height = layer.get_height()
+
+        img = Gimp.Image.new(width, height, Gimp.ImageBaseType.RGB)
+        lcpy = Gimp.Layer.new_from_drawable(layer, img)
+        lcpy.set_visible(True)
+        img.insert_layer(lcpy, None, 0)
+
+        scale = float(THUMBNAIL_SIZE) / max(width, height)
+        if scale and scale != 1.0:
+            width  = int(width * scale)
+            height = int(height * scale)
+
+        buffer = Gimp.Image.get_thumbnail(img, width, height, Gimp.PixbufTransparency.SMALL_CHECKS)
+
+        Gimp.Image.delete(img)
+        return buffer
+
+    def get_layer_lossless_formats(self, layer):
+        """Returns color formats which can encode layer pixels without loss of information"""
+        lid = layer.get_id()
+        if lid not in self.layer_lossless_formats:
+            alpha  = layer.has_alpha()
+            buffer = layer.get_buffer()
+            rect   = Gegl.Rectangle.new(0, 0, buffer.props.width, buffer.props.height)
+            pixels = buffer.get(rect, 1.0, "R~G~B~A u8" if alpha else "R~G~B~ u8", Gegl.AbyssPolicy.NONE)
+            cfs    = [cf for _, cf, _ in self.color_format_options]
+            self.layer_lossless_formats[lid] = get_lossless_color_formats(pixels, 4 if alpha else 3, cfs)
+        return self.layer_lossless_formats[lid]
+
+    def get_layer_textures(self, layer, is_mipmap):
+        """Returns list of (width, height, is_mipmap) of cel textures the layer is exported to"""
+        grid = get_layer_sprite_sheet(layer) if self.is_slice_sprite_sheets() else None
+        if grid is None:
+            return [(layer.get_width(), layer.get_height(), is_mipmap)]
+        return [(grid.cel_width, grid.cel_height, is_mipmap)] * grid.cel_count
+
+    def is_slice_sprite_sheets(self):
+        return self.cb_slice_sprite_sheets is not None and self.cb_slice_sprite_sheets.get_active()
+
+    def update_format_advice(self):
+        """
+        Update estimated file size of each color format option
+        and suggest the smallest color format which doesn't lose any information.
+        """
+        rows     = [row for row in self.liststore if row[self.COL_IDX_EXPORT]]
+        textures = [t for row in rows for t in self.get_layer_textures(row[self.COL_IDX_LAYER], row[self.COL_IDX_IS_MIPMAP])]
+
+        lossless = [cf for _, cf, _ in self.color_format_options]
+        for row in rows:
+            layer_lossless = self.get_layer_lossless_formats(row[self.COL_IDX_LAYER])
+            lossless = [cf for cf in lossless if cf in layer_lossless]
+
+        for rb, cf, label in self.color_format_options:
+            size = MAT.estimate_file_size(textures, cf, self.lod_min_size, self.lod_max_levels)
+            rb.set_label(f'{label}\n    ~{format_file_size(size)}' + (' (lossless)' if cf in lossless and rows else ''))
+
+        advice = ''
+        if rows and lossless:
+            suggested = min(lossless, key=lambda cf: cf.bpp)
+            for rb, cf, label in self.color_format_options:
+                if cf == suggested:
+                    advice = f'<i>Suggested: {label}</i>'
+                    break
+        self.format_advice_label.set_markup(advice)
+
+    def update_previews(self):
+        """
+        Update texture thumbnails to show the selected color depth when preview is enabled,
+        otherwise restore original thumbnails. Previews are computed one layer at a time in idle callback,
+        error diffusion dithering of layer is split over many idle callbacks so it doesn't block the dialog.
+        """
+        if self.preview_source_id is not None:
+            GLib.source_remove(self.preview_source_id)
+            self.preview_source_id = None
+
+        if not self.cb_preview.get_active():
+            for row in self.liststore:
+                row[self.COL_IDX_THUMB] = self.layer_thumbnails[row[self.COL_IDX_LAYER].get_id()]
+            return
+
+        cf     = self.get_export_color_format()
+        dither = self.get_export_dither_mode()
+        def iter_previews():
+            for row in list(self.liststore):
+                pbuf = yield from self.iter_layer_preview(row[self.COL_IDX_LAYER], cf, dither)
+                if pbuf is not None:
+                    row[self.COL_IDX_THUMB] = pbuf
+                yield
+
+        previews = iter_previews()
+        def update_next_preview():
+            try:
+                next(previews)
+                return True
+            except StopIteration:
+                self.preview_source_id = None
+                return False
+        self.preview_source_id = GLib.idle_add(update_next_preview)
+
+    def iter_layer_preview(self, layer, cf, dither):
+        """
+        Generator which returns layer thumbnail encoded in color format cf with dither mode or None if layer pixel format is not supported.
+        It yields while dithering is in progress, see iter_dither_pixel_data.
+        The encoded LOD 0 pixel data is cached, so it can be reused when exporting.
+        """
+        key = (layer.get_id(), cf, dither)
+        if key not in self.preview_cache:
+            buffer  = layer.get_buffer()
+            px_size = buffer.props.px_size
+            if self.eimg.get_base_type() != Gimp.ImageBaseType.RGB or px_size not in (3, 4):
+                return None
+
+            width  = layer.get_width()
+            height = layer.get_height()
+            pixels = yield from iter_dither_pixel_data(MAT._get_buffer_pixels(buffer), width, height, px_size, cf, dither)
+            self.encoded_cache[key] = encode_pixel_data(pixels, width, height, px_size, cf).tobytes()
+
+            # Make thumbnail of quantized pixels
+            qpixels = quantize_pixel_data(pixels, width, height, px_size, cf)
+            pbuf = GdkPixbuf.Pixbuf.new_from_bytes(GLib.Bytes.new(qpixels), GdkPixbuf.Colorspace.RGB,
+                                                   px_size == 4, 8, width, height, width * px_size)
+
+            scale   = min(float(THUMBNAIL_SIZE) / max(width, height), 1.0)
+            twidth  = max(int(width * scale), 1)
+            theight = max(int(height * scale), 1)
+            if px_size == 4:
+                pbuf = pbuf.composite_color_simple(twidth, theight, GdkPixbuf.InterpType.BILINEAR, 255, 8, 0xCCCCCC, 0x999999)
+            else:
+                pbuf = pbuf.scale_simple(twidth, theight, GdkPixbuf.InterpType.BILINEAR)
+            self.preview_cache[key] = pbuf
+        return self.preview_cache[key]
+
+    def has_alpha(self, img):
+        for layer in img.get_layers():
+            if layer.has_alpha():
+                return True
+        return False
+
+    def get_export_color_format(self):
+        alpha = self.has_alpha(self.eimg)
+        if alpha: # RGBA
+            if self.rb_color_16bit.get_active():
+                return RGBA4444
+            if self.rb_color_16bit_alpha_1bit.get_active():
+                return RGBA5551
+            else:
+                return RGBA8888 # 32 bit RGBA
+        else: # RGB
+            if self.rb_color_16bit.get_active():
+                return RGB565 # 16 bit RGB
+            else:
+                return RGB888 # 24 bit RGB
+
+    def get_export_dither_mode(self):
+        return DitherMode(int(self.cmb_dither.get_active_id()))
+
+    def export_image(self):
+        mat = MAT()
+        if self.eimg.get_base_type() != Gimp.ImageBaseType.RGB:
+            Gimp.Image.convert_rgb(self.eimg)
+
+        for row in self.liststore:
+            if not row[self.COL_IDX_EXPORT]: # 4 - include in export
+                self.eimg.remove_layer(row[self.COL_IDX_LAYER])
+
+        # Export image as MAT file format.
+        # Reuse LOD 0 pixel data encoded for preview
+        cf      = self.get_export_color_format()
+        dither  = self.get_export_dither_mode()
+        targets = [(self.file_path, cf)] + self.extra_targets
+        encoded = [
+            { lid: epd for (lid, ecf, edither), epd in self.encoded_cache.items() if ecf == tcf and edither == dither }
+            for _, tcf in targets
+        ]
+        mat.save_to_filepaths(targets, self.eimg, self.lod_min_size, self.lod_max_levels, encoded, self.is_slice_sprite_sheets(), dither, self.verify)
+
+    def set_btn_export_sensitive(self, sensitive):
+        self.get_widget_for_response(self.RESPONSE_EXPORT).set_sensitive(sensitive)
+
+    def on_response(self, dialog, response_id):
+        if self.preview_source_id is not None:
+            GLib.source_remove(self.preview_source_id)
+            self.preview_source_id = None
+        self.destroy()
+
+        if response_id == self.RESPONSE_EXPORT:
+            self.export_image()
+            Gtk.main_quit()
+        else:
+            Gtk.main_quit()
+
+    def on_destroy(self, widget):
+        Gtk.main_quit()
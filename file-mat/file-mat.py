@@ -25,16 +25,18 @@
 
 import gi
 gi.require_version('Gimp', '3.0')
-gi.require_version('GimpUi', '3.0')
-from gi.repository import Gimp, GimpUi, GObject, Gio, GLib, Gtk, GdkPixbuf
+from gi.repository import Gimp, GObject, GLib
 
+import contextlib
 import os
+import signal
 import sys
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from utils import *
-from mat import *
+# Note, GIMP queries plug-in procedures on every start, so only the modules
+# required by the procedure which is run are imported in the procedure function.
+from mat_format import MAT_FILE_MAGIC, MAT_REQUIRED_VERSION
 
 import gettext
 _ = gettext.gettext
@@ -49,15 +51,21 @@ EDITOR_PROC      = f'{PROC_NAME}-export-dialog'
 EXPORT_PROC      = f'{PROC_NAME}-export'
 LOAD_PROC        = f'{PROC_NAME}-load'
 LOAD_THUMB_PROC  = f'{PROC_NAME}-load-thumb'
+LOAD_MULTI_PROC  = f'{PROC_NAME}-load-multiple'
 
 DEBUG_MODE             = False
 LOAD_MIPMAP_LOD_CHAIN  = False # If True all images from Mipmap LOD chain will be displayed
+LOAD_AS_INDEXED        = False # If True indexed (8-bit) MAT is loaded as GIMP indexed image using CMP palette
+LOAD_PROGRESSIVE       = True  # If True progress text shows number of loaded cels while the rest of cels are loading (interactive mode only)
+LOAD_AS_SPRITE_SHEET   = False # If True all cels (and LOD images if LOAD_MIPMAP_LOD_CHAIN) are loaded in a grid on a single layer
+LOAD_LOD_LEVEL         = 0     # Default MipMap LOD level to load, if greater than 0 the image is opened as reduced view
+LOAD_MAX_SIZE          = 0     # Default max texture size to load, the first MipMap LOD level which fits is loaded. 0 means no limit.
+USE_CODEC_WORKER       = True  # If True textures are decoded by codec worker (mat-worker.py) when it's running
+
+EXPORT_VERIFY          = False # If True exported MAT files are read back and verified against the exported image
 
 DEFAULT_MAX_MIPMAP_LEVEL  = 4
 DEFAULT_MIN_MIPMAP_SIZE   = 16
-INPUT_MAX_MIPMAP_LEVEL    = 16
-INPUT_MAX_MIN_MIPMAP_SIZE = 128
-THUMBNAIL_SIZE            = 128
 
 script_path = os.path.abspath(__file__)
 script_dir  = os.path.dirname(script_path)
@@ -73,10 +81,30 @@ if DEBUG_MODE:
     sys.stdout = open(log_path, "w")
     sys.stderr = open(error_log_path, "w")
 
+@contextlib.contextmanager
+def stop_loading_on_terminate():
+    """
+    Context manager which makes SIGTERM and SIGINT stop loading, so that the partially loaded image is cleaned up
+    and load procedure returns CANCEL. Yields function which returns True when loading should stop.
+    Previous signal handlers are restored on exit.
+    Note, loading is also stopped when GIMP doesn't accept plug-in progress updates anymore, see MAT.load_from_file.
+    """
+    received = []
+    def on_terminate(signum, frame):
+        received.append(signum)
+
+    prev_handlers = {sig: signal.signal(sig, on_terminate) for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        yield lambda: bool(received)
+    finally:
+        for sig, handler in prev_handlers.items():
+            signal.signal(sig, handler)
+
 def thumbnail_mat(procedure, file, thumb_size, args, data):
+    from mat import MAT
     try:
         mat = MAT()
-        img = mat.load_from_filepath(file.peek_path(), max_cells=1)
+        img = mat.load_from_filepath(file.peek_path(), max_cells=1, use_codec_worker=USE_CODEC_WORKER)
 
         # Scale image
         img    = img.duplicate()
@@ -101,390 +129,148 @@ def thumbnail_mat(procedure, file, thumb_size, args, data):
         return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, error)
 
 def load_mat(procedure, run_mode, file, metadata, flags, config, *run_data):
-    try:
-        mat = MAT()
-        img = mat.load_from_filepath(file.peek_path(), load_mipmap_lod_chain=LOAD_MIPMAP_LOD_CHAIN)
-        if len(img. get_layers()) == 0:
-            raise ImportError('No textures to load')
-
-        return Gimp.ValueArray.new_from_values([
-            GObject.Value(Gimp.PDBStatusType, Gimp.PDBStatusType.SUCCESS),
-            GObject.Value(Gimp.Image, img),
-        ]), flags
-
-    except Exception as e:
-        error = GLib.Error()
-        error.message = f'Error loading MAT file:\n\n{str(e)}!'
-        return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, error)
-               
-def export_mat(procedure, run_mode, image, file, options, metadata, config, data):
-    GimpUi.init(EXPORT_PROC)
+    from mat import MAT, MatLoadCancelled
+    def on_cel_loaded(img, cel_idx):
+        # The image is displayed by GIMP when it's returned, until then progress shows loaded cels
+        Gimp.progress_set_text(f'Loading MAT image ({cel_idx + 1} {"cel" if cel_idx == 0 else "cels"} loaded)')
 
-    class ExportDialog(GimpUi.Dialog):
-        COL_IDX_LAYER      = 0
-        COL_IDX_THUMB      = 1
-        COL_IDX_INFO       = 2
-        COL_IDX_IS_MIPMAP  = 3
-        COL_IDX_EXPORT     = 4
-        COL_IDX_CEL_NUM    = 5
-        RESPONSE_EXPORT    = 1
-
-        def __init__(self):
-            GimpUi.Dialog.__init__(self,
-               title=_('Export Image as MAT'), role=EDITOR_PROC,
-               parent=None, modal=True
-            )
-
-            self.set_modal(True)
-            self.set_keep_above(True)
-
-            self.eimg = image.duplicate()
-
-            self.add_button(_("Cancel"), Gtk.ResponseType.CANCEL)
-            self.add_button(_("Export"), self.RESPONSE_EXPORT)
-
-            self.set_name(EDITOR_PROC)
-            self.connect('response', self.on_response)
-            self.connect('destroy', self.on_destroy)
-
-            self.lod_max_levels = DEFAULT_MAX_MIPMAP_LEVEL
-            self.lod_min_size   = DEFAULT_MIN_MIPMAP_SIZE
-
-            # Make export options & image view widgets
-            export_opt_box      = self.make_export_options_box()
-            self.img_view_frame = self.make_image_view()
-
-            # Pack image vie widget and total export widget in a vertical box
-            vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-            vbox.pack_start(self.img_view_frame, True, True, 15)
-
-            self.total_label = Gtk.Label()
-            self.total_label.set_markup (f'<b>Texture(s) to export: {self.export_tex_count}</b>')
-            self.total_label.set_xalign(0.1)
-            vbox.pack_end(self.total_label , True, True, 0)
-
-            # Pack Export options and image view widgets in a horizontal box
-            hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
-            hbox.pack_start(export_opt_box, True, True, 40)
-            hbox.pack_start(vbox, True, True, 15)
-
-            # Add hbox to the content area of the dialog
-            self.get_content_area().pack_start(hbox, True, True, 0)
-            self.show_all()
-
-            self.set_resizable(False)
-
-        def __del__(self):
-            Gimp.Image.delete(self.eimg)
-
-        def make_export_options_box(self):
-            b_alpha = self.has_alpha(self.eimg)
-
-            # Color depth
-            if b_alpha:
-                self.rb_color_16bit = Gtk.RadioButton(label='16 bit (RGBA-4444)')
-
-                self.rb_color_16bit_alpha_1bit = Gtk.RadioButton.new_from_widget(self.rb_color_16bit)
-                self.rb_color_16bit_alpha_1bit.set_label('16 bit (RGBA-5551)')
-
-                self.rb_color_32bit = Gtk.RadioButton.new_from_widget(self.rb_color_16bit_alpha_1bit)
-                self.rb_color_32bit.set_label('32 bit (RGBA-8888)')
-            else:
-                self.rb_color_16bit = Gtk.RadioButton(label='16 bit (RGB-565)')
-                self.rb_color_16bit_alpha_1bit = None
-
-                self.rb_color_32bit = Gtk.RadioButton.new_from_widget(self.rb_color_16bit)
-                self.rb_color_32bit.set_label('24 bit (RGB-888)')
-
-            # Place color depth radio buttons in a box
-            box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
-            box.pack_start(self.rb_color_16bit, False, False, 0)
-            if self.rb_color_16bit_alpha_1bit:
-                box.pack_start(self.rb_color_16bit_alpha_1bit, False, False, 0)
-
-            # 32 bit radio button
-            box.pack_start(self.rb_color_32bit, False, False, 0)
-
-            # Add box to a frame
-            cdo_frame_label = Gtk.Label()
-            cdo_frame_label.set_markup('<b>Color Depth:</b>')
-
-            cdo_frame = Gtk.Frame()
-            cdo_frame.set_label_widget(cdo_frame_label)
-            cdo_frame.add(box)
-
-            # Min MM size
-            adjustment = Gtk.Adjustment(value=self.lod_min_size, 
-                                        lower=2, 
-                                        upper=INPUT_MAX_MIN_MIPMAP_SIZE, 
-                                        step_increment=1)
-            sb_mm_min_size = Gtk.SpinButton(adjustment=adjustment)
-            sb_mm_min_size.set_tooltip_text(_('Min size of Mipmap LOD texture'))
-            sb_mm_min_size.set_numeric(True)
-            sb_mm_min_size.set_update_policy(Gtk.SpinButtonUpdatePolicy.IF_VALID)
-
-            def sb_mm_min_size_changed(sp):
-                val = sp.get_value_as_int()
-                if val != self.lod_min_size:
-                    if val > self.lod_min_size:
-                        self.lod_min_size = self.lod_min_size << 1
-                    else:
-                        self.lod_min_size = self.lod_min_size >> 1
-                    sp.set_value(self.lod_min_size)
-            sb_mm_min_size.connect('changed', sb_mm_min_size_changed)
-
-            t_mm_min_size = Gtk.Grid()
-            t_mm_min_size.attach(Gtk.Label(label='Min Size:    '), 0, 0, 1, 1)
-            t_mm_min_size.attach(sb_mm_min_size, 1, 0, 1, 1)
-
-            # Max MM level
-            adjustment = Gtk.Adjustment(value=self.lod_max_levels,
-                                        lower=1,
-                                        upper=INPUT_MAX_MIPMAP_LEVEL,
-                                        step_increment=1)
-            sb_mm_level_count = Gtk.SpinButton(adjustment=adjustment)
-            sb_mm_level_count.set_tooltip_text(_('Max Mipmap LOD level'))
-            sb_mm_level_count.set_numeric(True)
-            sb_mm_level_count.set_update_policy(Gtk.SpinButtonUpdatePolicy.IF_VALID)
-
-            def sb_mm_max_level_changed(sp):
-                self.lod_max_levels = sp.get_value_as_int()
-            sb_mm_level_count.connect('changed', sb_mm_max_level_changed)
-
-            t_mm_level_count = Gtk.Grid()
-            t_mm_level_count.attach(Gtk.Label(label='Max Level:  '), 0, 0, 1, 1)
-            t_mm_level_count.attach(sb_mm_level_count, 1, 0, 1, 1)
-
-            # Toggle Mipmap button
-            btn_toggle_mipmap = Gtk.Button(label='Toggle Mipmap')
-            btn_toggle_mipmap.set_tooltip_text(_('Toggle On/Off Mipmap exporting for all textures'))
-            
-            def btn_toggle_mipmap_clicked(btn):
-                # Store our state in a custom property
-                mip_on = getattr(btn, 'mipmap_toggle_state', False)
-                mip_on = bool(not mip_on)
-                setattr(btn, 'mipmap_toggle_state', mip_on)
-                for row in self.liststore:
-                    row[self.COL_IDX_IS_MIPMAP] = mip_on
-                    set_layer_as_mipmap(row[self.COL_IDX_LAYER], mip_on)
-
-            btn_toggle_mipmap.connect('clicked', btn_toggle_mipmap_clicked)
-
-            # Mipmap option frame
-            box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
-            box.set_homogeneous(True)
-            box.pack_start(t_mm_min_size, False, False, 0)
-            box.pack_start(t_mm_level_count, False, False, 0)
-            box.pack_start(btn_toggle_mipmap, False, False, 0)
-
-            # Add Mipmap options to a frame
-            cmmo_frame_label = Gtk.Label()
-            cmmo_frame_label.set_markup('<b>Mipmap Options:</b>')
-            
-            mmo_frame = Gtk.Frame()
-            mmo_frame.set_label_widget(cmmo_frame_label)
-            mmo_frame.add(box)
-
-            # Main option frame
-            o_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-            o_box.pack_start(cdo_frame, False, False, 10)
-            o_box.pack_start(mmo_frame, False, False, 10)
-
-            box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-            box.set_size_request(145, -1)
-            box.pack_start(o_box, True, False, 0)
-
-            return box
-
-        def make_image_view(self):
-            # Create a ListStore model
-            self.liststore = Gtk.ListStore(GObject.TYPE_PYOBJECT, GdkPixbuf.Pixbuf, str, bool, bool, int) # layer, thumbnail image, info text, is_mipmap, export, cel_num
-
-            for idx, layer in enumerate(reversed(self.eimg.get_layers())):
-                pbuf = self.get_layer_thumbnail(layer)
-                img_info = f'<b>Name</b>: {layer.get_name()}'
-                img_info += f'\n<b>Size</b>: {layer.get_width()}x{layer.get_height()}'
-                img_info += '\n<b>Color</b>: {}'.format('RGB' if self.eimg.get_base_type() == Gimp.ImageBaseType.RGB else 'Grayscale' if self.eimg.get_base_type() == Gimp.ImageBaseType.GRAY else 'Indexed')
-                img_info += '\n<b>Mipmap</b>:'
-                self.liststore.append([layer, pbuf, img_info, is_layer_mipmap(layer), True, idx])
-
-            self.export_tex_count = len(self.liststore)
-
-            self.treeview = Gtk.TreeView(model=self.liststore)
-            self.treeview.set_enable_search(False)
-            self.treeview.set_grid_lines(Gtk.TreeViewGridLines.BOTH)
-            self.treeview.get_selection().set_mode(Gtk.SelectionMode.NONE)
-
-            # Column 'Cel num'
-            renderer = Gtk.CellRendererText()
-            renderer.set_property('xalign', 0.5)
-
-            col_cel_num = Gtk.TreeViewColumn('Cel', renderer, text=self.COL_IDX_CEL_NUM)
-            col_cel_num.pack_start(renderer, False)
-            
-            col_cel_num_header = Gtk.Label(label='Cel')
-            col_cel_num_header.show_all()
-
-            tooltip = Gtk.Tooltip()
-            col_cel_num_header.set_tooltip_text('MAT cel number.\ni.e.: The sequence number of layer texture when exported to MAT file.')
-
-            col_cel_num.set_widget(col_cel_num_header)
-            self.treeview.append_column(col_cel_num)
-
-            # Column 'Texture'
-            pixrd = Gtk.CellRendererPixbuf()
-            col_pixbuf = Gtk.TreeViewColumn('Texture', pixrd, pixbuf=self.COL_IDX_THUMB)
-            col_pixbuf.set_min_width(THUMBNAIL_SIZE)
-            self.treeview.append_column(col_pixbuf)
-
-            # Column 'Info'
-            col_info = Gtk.TreeViewColumn()
-
-            # column tooltip
-            col_info_header = Gtk.Label(label='Info & Options')
-            col_info_header.show_all()
-            col_info.set_widget(col_info_header)
-
-            col_info_header.set_tooltip_text("Layer info and export options.\nIf 'Mipmap' is checked, layer image will be exported as Mipmap texture.")
-
-            # info text
-            renderer = Gtk.CellRendererText()
-            renderer.set_property('yalign', 0.4)
-            renderer.set_property('width', 260)
-            renderer.set_property('height', THUMBNAIL_SIZE)
-            col_info.pack_start(renderer, False)
-            col_info.add_attribute(renderer, 'markup', self.COL_IDX_INFO)
-
-            # CB Mipmap
-            renderer = Gtk.CellRendererToggle()
-            renderer.set_property('xalign', 0.3) # have no effect
-            renderer.set_property('yalign', 0.85)
-
-            def on_cb_mipmap_toggled(widget, path):
-                is_mipmap = not self.liststore[path][self.COL_IDX_IS_MIPMAP]
-                self.liststore[path][self.COL_IDX_IS_MIPMAP] = is_mipmap
-                set_layer_as_mipmap(self.liststore[path][self.COL_IDX_LAYER], is_mipmap)
-
-            renderer.connect('toggled', on_cb_mipmap_toggled)
-
-            col_info.pack_start(renderer, False)
-            col_info.add_attribute(renderer, 'active', self.COL_IDX_IS_MIPMAP)
-
-            self.treeview.append_column(col_info)
-
-            # Column 'Export'
-            def on_cb_export_toggled(widget, path):
-                row = self.liststore[path]
-                export = not row[self.COL_IDX_EXPORT]
-                row[self.COL_IDX_EXPORT] = export
-                self.export_tex_count += 1 if export else -1
-                self.set_btn_export_sensitive(self.export_tex_count > 0)
-                self.total_label.set_markup(f'<b>Texture(s) to export: {self.export_tex_count}</b>')
-
-                # re-enumerate rows
-                idx = 0
-                row[self.COL_IDX_CEL_NUM] = idx if export else -1
-                for row in self.liststore:
-                    if row[self.COL_IDX_CEL_NUM] > -1:
-                        row[self.COL_IDX_CEL_NUM] = idx
-                        idx += 1
-
-            cb_export = Gtk.CellRendererToggle()
-            cb_export.connect('toggled', on_cb_export_toggled)
-
-            col_export = Gtk.TreeViewColumn('Export', cb_export)
-            col_export.add_attribute(cb_export, 'active', self.COL_IDX_EXPORT)
-            
-            col_export_header = Gtk.Label(label='Export')
-            col_export_header.show_all()
-            col_export_header.set_tooltip_text('Export texture to file.')
-            col_export.set_widget(col_export_header)
-            
-            self.treeview.append_column(col_export)
-
-            # Scroll window & root frame
-            scrl_win = Gtk.ScrolledWindow()
-            scrl_win.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
-            scrl_win.add(self.treeview)
-            scrl_win.set_size_request(THUMBNAIL_SIZE, THUMBNAIL_SIZE * 5 + THUMBNAIL_SIZE // 2)
-
-            frame_imgs = Gtk.Frame()
-            frame_imgs.add(scrl_win)
-            frame_imgs.set_size_request(535, -1)
-
-            return frame_imgs
-
-        def get_layer_thumbnail(self, layer):
-            from gi.repository import GdkPixbuf
-            
-            width = layer.get_width()
-            height = layer.get_height()
-
-            img = Gimp.Image.new(width, height, Gimp.ImageBaseType.RGB)
-            lcpy = Gimp.Layer.new_from_drawable(layer, img)
-            lcpy.set_visible(True)
-            img.insert_layer(lcpy, None, 0)
-            
-            scale = float(THUMBNAIL_SIZE) / max(width, height)
-            if scale and scale != 1.0:
-                width  = int(width * scale)
-                height = int(height * scale)
-            
-            buffer = Gimp.Image.get_thumbnail(img, width, height, Gimp.PixbufTransparency.SMALL_CHECKS)
-
-            Gimp.Image.delete(img)
-            return buffer
-
-        def has_alpha(self, img):
-            for layer in img.get_layers():
-                if layer.has_alpha():
-                    return True
-            return False
-
-        def get_export_color_format(self):
-            alpha = self.has_alpha(self.eimg)
-            if alpha: # RGBA
-                if self.rb_color_16bit.get_active():
-                    return RGBA4444
-                if self.rb_color_16bit_alpha_1bit.get_active():
-                    return RGBA5551
-                else:
-                    return RGBA8888 # 32 bit RGBA
-            else: # RGB
-                if self.rb_color_16bit.get_active():
-                    return RGB565 # 16 bit RGB
-                else:
-                    return RGB888 # 24 bit RGB
-
-        def export_image(self):
+    with stop_loading_on_terminate() as is_load_cancelled:
+        try:
             mat = MAT()
-            if self.eimg.get_base_type() != Gimp.ImageBaseType.RGB:
-                Gimp.Image.convert_rgb(self.eimg)
-
-            for row in self.liststore:
-                if not row[self.COL_IDX_EXPORT]: # 4 - include in export
-                    self.eimg.remove_layer(row[self.COL_IDX_LAYER])
+            progressive = LOAD_PROGRESSIVE and run_mode == Gimp.RunMode.INTERACTIVE
+            img = mat.load_from_filepath(file.peek_path(),
+                load_mipmap_lod_chain=LOAD_MIPMAP_LOD_CHAIN,
+                load_as_indexed=LOAD_AS_INDEXED,
+                load_as_sprite_sheet=LOAD_AS_SPRITE_SHEET,
+                lod_level=config.get_property('lod-level'),
+                max_size=config.get_property('max-size'),
+                use_codec_worker=USE_CODEC_WORKER,
+                cancel_cb=is_load_cancelled,
+                cel_loaded_cb=on_cel_loaded if progressive else None
+            )
 
-            # Export image as MAT file format
-            cf = self.get_export_color_format()
-            mat.save_to_filepath(file.peek_path(), self.eimg, cf, self.lod_min_size, self.lod_max_levels)
+            if len(img.get_layers()) == 0:
+                raise ImportError('No textures to load')
 
-        def set_btn_export_sensitive(self, sensitive):
-            self.get_widget_for_response(self.RESPONSE_EXPORT).set_sensitive(sensitive)
+            return Gimp.ValueArray.new_from_values([
+                GObject.Value(Gimp.PDBStatusType, Gimp.PDBStatusType.SUCCESS),
+                GObject.Value(Gimp.Image, img),
+            ]), flags
 
-        def on_response(self, dialog, response_id):
-            self.destroy()
-            
-            if response_id == self.RESPONSE_EXPORT:
-                self.export_image()
-                Gtk.main_quit()
-            else:
-                Gtk.main_quit()
+        except MatLoadCancelled:
+            return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error())
+        except Exception as e:
+            error = GLib.Error()
+            error.message = f'Error loading MAT file:\n\n{str(e)}!'
+            return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, error)
+               
+def choose_mat_files() -> list:
+    """Show file chooser dialog for selecting MAT files. Returns selected file paths."""
+    gi.require_version('GimpUi', '3.0')
+    from gi.repository import GimpUi, Gtk
+
+    GimpUi.init(LOAD_MULTI_PROC)
+    dialog = Gtk.FileChooserDialog(title=_('Open MAT Files as Layers'), action=Gtk.FileChooserAction.OPEN)
+    dialog.add_button(_('Cancel'), Gtk.ResponseType.CANCEL)
+    dialog.add_button(_('Open'), Gtk.ResponseType.OK)
+    dialog.set_select_multiple(True)
+
+    mat_filter = Gtk.FileFilter()
+    mat_filter.set_name(_('MAT files'))
+    mat_filter.add_pattern('*.mat')
+    mat_filter.add_pattern('*.MAT')
+    dialog.add_filter(mat_filter)
+
+    paths = dialog.get_filenames() if dialog.run() == Gtk.ResponseType.OK else []
+    dialog.destroy()
+    return paths
+
+def load_multiple_mat(procedure, config, data):
+    from mat import MAT, MatLoadCancelled
+    run_mode = config.get_property('run-mode')
+    paths    = list(config.get_property('paths') or [])
+    if not paths and run_mode == Gimp.RunMode.INTERACTIVE:
+        paths = choose_mat_files()
+    if not paths:
+        return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error())
+
+    with stop_loading_on_terminate() as is_load_cancelled:
+        try:
+            img, errors = MAT().load_multiple_from_filepaths(paths, config.get_property('all-cels'), cancel_cb=is_load_cancelled)
+            if errors:
+                Gimp.message('Failed to load MAT file(s):\n\n' + '\n'.join(f'{os.path.basename(p)}: {e}' for p, e in errors))
+            if run_mode == Gimp.RunMode.INTERACTIVE:
+                Gimp.Display.new(img)
+                Gimp.displays_flush()
+
+            return Gimp.ValueArray.new_from_values([
+                GObject.Value(Gimp.PDBStatusType, Gimp.PDBStatusType.SUCCESS),
+                GObject.Value(Gimp.Image, img),
+            ])
+        except MatLoadCancelled:
+            return procedure.new_return_values(Gimp.PDBStatusType.CANCEL, GLib.Error())
+        except Exception as e:
+            error = GLib.Error()
+            error.message = f'Error loading MAT files:\n\n{str(e)}!'
+            return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, error)
+
+def parse_export_targets(targets: list, file_path: str) -> list:
+    """
+    Parse additional export targets in form '<color format>=<file path>' e.g.: 'RGBA8888=/build/hi/mat/wall.mat'.
+    Targets must have RGB(A) color format and file path different from other targets and the exported file_path.
+    Returns list of (file path, color format).
+    """
+    from mat_format import ColorMode, color_format_by_name
+    parsed = []
+    paths  = { os.path.normcase(os.path.abspath(file_path)) }
+    for t in targets:
+        name, sep, path = t.partition('=')
+        if not sep or not path:
+            raise ValueError(f"Invalid export target '{t}', expected '<color format>=<file path>'")
+        cf = color_format_by_name(name.strip())
+        if cf.color_mode == ColorMode.Indexed:
+            raise ValueError(f"Invalid export target '{t}', indexed color format is not supported")
+        npath = os.path.normcase(os.path.abspath(path))
+        if npath in paths:
+            raise ValueError(f"Invalid export target '{t}', file path is already exported")
+        paths.add(npath)
+        parsed.append((path, cf))
+    return parsed
 
-        def on_destroy(self, widget):
-            Gtk.main_quit()
+def export_mat(procedure, run_mode, image, file, options, metadata, config, data):
+    from mat import MAT, RGBA4444, RGB565
+    try:
+        extra_targets = parse_export_targets(config.get_property('targets') or [], file.peek_path())
+        verify        = config.get_property('verify')
+    except Exception as e:
+        error = GLib.Error()
+        error.message = f'Error exporting MAT file:\n\n{str(e)}!'
+        return procedure.new_return_values(Gimp.PDBStatusType.CALLING_ERROR, error)
+
+    if run_mode != Gimp.RunMode.INTERACTIVE:
+        # Export all layers with default options.
+        # Image is exported from a copy, because export adds MipMap LOD layers to the image.
+        eimg = image.duplicate()
+        try:
+            if eimg.get_base_type() != Gimp.ImageBaseType.RGB:
+                Gimp.Image.convert_rgb(eimg)
+            cf = RGBA4444 if any(l.has_alpha() for l in eimg.get_layers()) else RGB565
+            MAT().save_to_filepaths([(file.peek_path(), cf)] + extra_targets, eimg, DEFAULT_MIN_MIPMAP_SIZE, DEFAULT_MAX_MIPMAP_LEVEL, verify=verify)
+        except Exception as e:
+            error = GLib.Error()
+            error.message = f'Error exporting MAT file:\n\n{str(e)}!'
+            return procedure.new_return_values(Gimp.PDBStatusType.EXECUTION_ERROR, error)
+        finally:
+            eimg.delete()
+        return procedure.new_return_values(Gimp.PDBStatusType.SUCCESS, GLib.Error())
+
+    # Load UI modules only for interactive export
+    gi.require_version('GimpUi', '3.0')
+    from gi.repository import GimpUi, Gtk
+    from export_dialog import ExportDialog
 
-    ExportDialog()
+    GimpUi.init(EXPORT_PROC)
+    ExportDialog(image, file.peek_path(), EDITOR_PROC, DEFAULT_MIN_MIPMAP_SIZE, DEFAULT_MAX_MIPMAP_LEVEL, extra_targets, verify)
     Gtk.main()
 
     return procedure.new_return_values(Gimp.PDBStatusType.SUCCESS, GLib.Error())
@@ -492,7 +278,7 @@ def export_mat(procedure, run_mode, image, file, options, metadata, config, data
 
 class FileMat(Gimp.PlugIn):
     def do_query_procedures(self):
-        return [EXPORT_PROC, LOAD_PROC, LOAD_THUMB_PROC]
+        return [EXPORT_PROC, LOAD_PROC, LOAD_THUMB_PROC, LOAD_MULTI_PROC]
 
     def do_create_procedure(self, name):
         if name == LOAD_PROC:
@@ -509,6 +295,8 @@ class FileMat(Gimp.PlugIn):
             procedure.set_mime_types("image/mat")
             procedure.set_magics("0,string," + str(MAT_FILE_MAGIC) + chr(MAT_REQUIRED_VERSION))
             procedure.set_thumbnail_loader(LOAD_THUMB_PROC)
+            procedure.add_int_argument('lod-level', 'LOD level', 'MipMap LOD level to load, the smaller levels are loaded for reduced view', 0, 31, LOAD_LOD_LEVEL, GObject.ParamFlags.READWRITE)
+            procedure.add_int_argument('max-size', 'Max size', 'Loads the first MipMap LOD level which fits max size (0 = no limit)', 0, 65536, LOAD_MAX_SIZE, GObject.ParamFlags.READWRITE)
 
             return procedure
         elif name == LOAD_THUMB_PROC:
@@ -521,6 +309,24 @@ class FileMat(Gimp.PlugIn):
                 name)
             procedure.set_attribution(AUTHOR, COPYRIGHT, COPYRIGHT_YEAR)
 
+            return procedure
+        elif name == LOAD_MULTI_PROC:
+            procedure = Gimp.Procedure.new(self, name,
+                                           Gimp.PDBProcType.PLUGIN,
+                                           load_multiple_mat, None)
+            procedure.set_menu_label(_("Open MAT Files as Layers..."))
+            procedure.add_menu_path('<Image>/File/Open')
+            procedure.set_documentation(
+                _('Loads many texture files (.mat) of the game Indiana Jones and the Infernal Machine as layers of one image'),
+                _('MAT files are decoded in parallel. Every file is loaded as layer named after the file, '
+                  'or if all-cels is set every cel of the file is loaded as layer.'),
+                name)
+            procedure.set_attribution(AUTHOR, COPYRIGHT, COPYRIGHT_YEAR)
+            procedure.add_enum_argument('run-mode', 'Run mode', 'The run mode', Gimp.RunMode, Gimp.RunMode.INTERACTIVE, GObject.ParamFlags.READWRITE)
+            procedure.add_string_array_argument('paths', 'Paths', 'Paths to the MAT files', GObject.ParamFlags.READWRITE)
+            procedure.add_boolean_argument('all-cels', 'All cels', 'Load every cel of MAT file as layer', False, GObject.ParamFlags.READWRITE)
+            procedure.add_image_return_value('image', 'Image', 'The loaded image', False, GObject.ParamFlags.READWRITE)
+
             return procedure
         elif name == EXPORT_PROC:
             procedure = Gimp.ExportProcedure.new(self, name,
@@ -534,7 +340,12 @@ class FileMat(Gimp.PlugIn):
                 name)
             procedure.set_attribution(AUTHOR, COPYRIGHT, COPYRIGHT_YEAR)
             procedure.set_extensions("mat")
-            
+            procedure.add_string_array_argument('targets', 'Targets',
+                'Additional targets exported in the same pass, in form <color format>=<file path> e.g.: RGBA8888=/build/hi/mat/wall.mat',
+                GObject.ParamFlags.READWRITE)
+            procedure.add_boolean_argument('verify', 'Verify', 'Read exported MAT files back and verify them against the exported image',
+                EXPORT_VERIFY, GObject.ParamFlags.READWRITE)
+
             return procedure
 
         return None
@@ -0,0 +1,180 @@
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import mmap
+import os
+
+from struct import Struct
+from typing import Dict, List, NamedTuple, Optional
+
+
+GOB_FILE_MAGIC = b'GOB '
+
+class GobHeader(NamedTuple):
+    magic: bytes
+    version: int
+    dir_offset: int
+
+gh_serf = Struct('<4sii')
+
+class GobEntry(NamedTuple):
+    offset: int
+    size: int
+    name: str
+
+ge_serf = Struct('<ii128s')
+
+def normalize_gob_path(path: str) -> str:
+    """Normalize path of GOB archive member for case insensitive lookup"""
+    return path.replace('/', '\\').lower()
+
+def gob_path_basename(path: str) -> str:
+    """Returns file name of GOB archive member path"""
+    return path.replace('/', '\\').rsplit('\\', 1)[-1]
+
+
+class GobMemberFile(io.RawIOBase):
+    """
+    Read-only binary file object over the member data of GOB archive.
+    The member data is not copied, only the chunks which are read are.
+    """
+    def __init__(self, data: memoryview):
+        self._data = data
+        self._pos  = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size is None or size < 0 else min(self._pos + size, len(self._data))
+        b = bytes(self._data[self._pos: end])
+        self._pos = max(self._pos, end)
+        return b
+
+    def readinto(self, b) -> int:
+        chunk = self._data[self._pos: self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._data)
+        if offset < 0:
+            raise ValueError('Negative seek position')
+        self._pos = offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        self._data.release()
+        super().close()
+
+
+class GobArchive:
+    """
+    Memory-mapped GOB archive reader.
+    Member data is served as slices of memory-mapped archive file without copying.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            h = GobHeader._make(gh_serf.unpack_from(self._mm, 0))
+            if h.magic != GOB_FILE_MAGIC:
+                raise ImportError('Invalid GOB file')
+
+            count, = Struct('<i').unpack_from(self._mm, h.dir_offset)
+            self.entries: List[GobEntry] = []
+            for offset, size, name in ge_serf.iter_unpack(self._mm[h.dir_offset + 4: h.dir_offset + 4 + count * ge_serf.size]):
+                name = name.split(b'\0', 1)[0].decode('ascii', errors='replace')
+                if offset < 0 or size < 0 or offset + size > len(self._mm):
+                    raise ImportError(f"Invalid GOB entry '{name}'")
+                self.entries.append(GobEntry(offset, size, name))
+        except Exception:
+            self._mm.close()
+            raise
+
+        self._index: Dict[str, GobEntry] = { normalize_gob_path(e.name): e for e in self.entries }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return normalize_gob_path(name) in self._index
+
+    def close(self):
+        """
+        Close archive.
+        Note, all member views and files returned by archive must be released/closed before.
+        """
+        self._mm.close()
+
+    def find(self, name: str) -> Optional[GobEntry]:
+        """Find archive member by name. The lookup is case insensitive."""
+        return self._index.get(normalize_gob_path(name))
+
+    def list(self, extension: Optional[str] = None) -> List[GobEntry]:
+        """List archive members, optionally only those with file extension e.g.: '.mat'"""
+        if extension is None:
+            return list(self.entries)
+        extension = extension.lower()
+        return [e for e in self.entries if e.name.lower().endswith(extension)]
+
+    def get_data(self, name: str) -> memoryview:
+        """Returns zero-copy view of member data"""
+        e = self.find(name)
+        if e is None:
+            raise KeyError(f"No member '{name}' in GOB archive")
+        return memoryview(self._mm)[e.offset: e.offset + e.size]
+
+    def open(self, name: str) -> GobMemberFile:
+        """Open member as read-only binary file object"""
+        return GobMemberFile(self.get_data(name))
+
+
+def find_gob_colormap(archive: GobArchive, mat_member: str) -> Optional[str]:
+    """
+    Find the CMP file for MAT file in GOB archive.
+    First the CMP file with the same name as MAT file is searched for
+    and if not found the first CMP file in the archive is returned.
+    """
+    cmp_name = os.path.splitext(gob_path_basename(mat_member))[0].lower() + '.cmp'
+    cmps     = sorted(archive.list('.cmp'), key=lambda e: e.name.lower())
+    for e in cmps:
+        if gob_path_basename(e.name).lower() == cmp_name:
+            return e.name
+    return cmps[0].name if cmps else None
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Command line tool which compares two MAT files cel by cel without GIMP.
+# Raw encoded pixel data is compared first and only the cel textures which differ are decoded
+# to compute per-pixel error statistics.
+#
+# Exit status is 0 if files are equal, 1 if they differ and 2 on error.
+#
+# Usage:
+#   mat-diff.py <a.mat> <b.mat> [--cmp file.cmp] [--quiet]
+
+import argparse
+import io
+import math
+import mmap
+import operator
+import os
+import sys
+
+from typing import List, NamedTuple, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from colormap import *
+from mat_format import *
+from mat_codec import *
+
+COMPARE_CHUNK_SIZE = 1 << 20 # bytes compared at once
+
+class MatFile(NamedTuple):
+    path: str
+    data: mmap.mmap
+    header: MatHeader
+    textures: List[MatTextureLayout]
+    colormap: Optional[ColorMap]
+    texture_offset: int # end of record table
+
+    @property
+    def textures_end(self) -> int:
+        """Returns file offset of the end of the last texture"""
+        return self.textures[-1].end if self.textures else self.texture_offset
+
+class PixelDiff(NamedTuple):
+    max_delta: int
+    mean_delta: float
+    psnr: float # inf if pixels are equal
+
+def open_mat(file_path: str, cmp_file_path: Optional[str] = None) -> MatFile:
+    """Memory-map MAT file and compute its texture layout. The pixel data is not read."""
+    with open(file_path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        h, _ = read_header_and_records(data)
+        texture_offset = data.tell()
+        textures = get_texture_layouts(data, h, texture_offset)
+
+        cmp: Optional[ColorMap] = None
+        if h.color_info.color_mode == ColorMode.Indexed:
+            cmp_file_path = cmp_file_path or find_colormap(file_path)
+            if cmp_file_path is None:
+                raise ImportError('Indexed MAT file requires colormap (CMP) file')
+            cmp = read_colormap(cmp_file_path)
+        return MatFile(file_path, data, h, textures, cmp, texture_offset)
+    except Exception:
+        data.close()
+        raise
+
+def equal_bytes(a, b, a_offset: int = 0, b_offset: int = 0, size: int = -1) -> bool:
+    """Compare byte ranges of two buffers chunk by chunk"""
+    if size < 0:
+        if len(a) - a_offset != len(b) - b_offset:
+            return False
+        size = len(a) - a_offset
+    for pos in range(0, size, COMPARE_CHUNK_SIZE):
+        n = min(COMPARE_CHUNK_SIZE, size - pos)
+        if a[a_offset + pos: a_offset + pos + n] != b[b_offset + pos: b_offset + pos + n]:
+            return False
+    return True
+
+def decode_lod(mat: MatFile, cel_idx: int, level: int) -> bytes:
+    """Decode pixel data of cel texture LOD level to 4 channel planes (R, G, B, A), 8 bits per channel"""
+    tex   = mat.textures[cel_idx]
+    mmh   = tex.header
+    width, height = mmh.width >> level, mmh.height >> level
+    n     = width * height
+    pd    = memoryview(mat.data)[tex.lod_offset(level): tex.lod_offset(level) + tex.lod_sizes[level]]
+    try:
+        ci = mat.header.color_info
+        if ci.color_mode == ColorMode.Indexed:
+            px_size  = 4 if mmh.transparent else 3
+            pixels   = bytes(decode_indexed_pixel_data(pd, width, height, mat.colormap, mmh.transparent_color_num if mmh.transparent else None))
+            channels = [pixels[c::px_size] for c in range(0, px_size)]
+        else:
+            channels = decode_pixel_channels(pd, width, height, ci)
+    finally:
+        pd.release()
+
+    if len(channels) < 4:
+        channels.append(b'\xFF' * n)
+    return b''.join(channels)
+
+def diff_pixels(a: bytes, b: bytes) -> PixelDiff:
+    """Compute error statistics of two pixel buffers of equal layout"""
+    deltas = list(map(abs, map(operator.sub, a, b)))
+    if not deltas:
+        return PixelDiff(0, 0.0, math.inf)
+    mse  = sum(map(operator.mul, deltas, deltas)) / len(deltas)
+    psnr = 10 * math.log10(255 * 255 / mse) if mse else math.inf
+    return PixelDiff(max(deltas), sum(deltas) / len(deltas), psnr)
+
+def diff_mats(a: MatFile, b: MatFile, out=sys.stdout) -> bool:
+    """
+    Compare two MAT files and print differences. Returns True if files differ.
+    Cel textures are compared by raw encoded bytes of every LOD level,
+    only LOD levels which differ are decoded and compared pixel by pixel.
+    The record table and any trailing data after the last texture are compared by raw bytes.
+    """
+    if equal_bytes(a.data, b.data):
+        print('Files are identical', file=out)
+        return False
+
+    ha, hb   = a.header, b.header
+    same_cf  = ha.color_info == hb.color_info
+    if ha.magic != hb.magic or ha.version != hb.version:
+        print(f'magic/version: {ha.magic}/{ha.version} != {hb.magic}/{hb.version}', file=out)
+    if not same_cf:
+        print(f'color format: {color_format_name(ha.color_info)} != {color_format_name(hb.color_info)}', file=out)
+    if ha.cel_count != hb.cel_count:
+        print(f'cel count: {ha.cel_count} != {hb.cel_count}', file=out)
+    if ha.type != hb.type:
+        print(f'type: {ha.type} != {hb.type}', file=out)
+
+    hsize = mh_serf.size + cf_serf.size
+    if ha.record_count != hb.record_count:
+        print(f'record count: {ha.record_count} != {hb.record_count}', file=out)
+    elif not equal_bytes(a.data, b.data, hsize, hsize, a.texture_offset - hsize):
+        print('record table differs', file=out)
+
+    differ = ha != hb or not equal_bytes(a.data, b.data, 0, 0, a.texture_offset)
+    for cel_idx, (ta, tb) in enumerate(zip(a.textures, b.textures)):
+        ma, mb = ta.header, tb.header
+        if (ma.width, ma.height) != (mb.width, mb.height):
+            print(f'cel {cel_idx}: size {ma.width}x{ma.height} != {mb.width}x{mb.height}', file=out)
+            differ = True
+            continue
+
+        if ma.mipmap_levels != mb.mipmap_levels:
+            print(f'cel {cel_idx}: mipmap levels {ma.mipmap_levels} != {mb.mipmap_levels}', file=out)
+            differ = True
+        if ma[2:5] != mb[2:5]:
+            print(f'cel {cel_idx}: transparency {ma.transparent}/{ma.transparent_color_num} != {mb.transparent}/{mb.transparent_color_num}', file=out)
+            differ = True
+
+        for level in range(0, min(ma.mipmap_levels, mb.mipmap_levels)):
+            if same_cf and equal_bytes(a.data, b.data, ta.lod_offset(level), tb.lod_offset(level), ta.lod_sizes[level]):
+                continue
+            d = diff_pixels(decode_lod(a, cel_idx, level), decode_lod(b, cel_idx, level))
+            print(f'cel {cel_idx} lod {level}: max delta: {d.max_delta}, mean delta: {d.mean_delta:.3f}, PSNR: {d.psnr:.2f} dB', file=out)
+            differ = True
+
+    a_end, b_end = a.textures_end, b.textures_end
+    a_trailing, b_trailing = len(a.data) - a_end, len(b.data) - b_end
+    if a_trailing != b_trailing:
+        print(f'trailing data: {a_trailing} != {b_trailing} bytes', file=out)
+        differ = True
+    elif not equal_bytes(a.data, b.data, a_end, b_end, a_trailing):
+        print(f'trailing data differs ({a_trailing} bytes)', file=out)
+        differ = True
+
+    if not differ:
+        # Files aren't identical even though every compared part is equal
+        print('Files differ', file=out)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two MAT files cel by cel.')
+    parser.add_argument('a')
+    parser.add_argument('b')
+    parser.add_argument('--cmp', default=None, help='CMP file used to decode indexed MAT files (default: CMP file from MAT file folder)')
+    parser.add_argument('-q', '--quiet', action='store_true', help="don't print differences, only set exit status")
+    args = parser.parse_args()
+
+    try:
+        a = open_mat(args.a, args.cmp)
+        try:
+            b = open_mat(args.b, args.cmp)
+        except Exception:
+            a.data.close()
+            raise
+    except Exception as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        differ = diff_mats(a, b, io.StringIO() if args.quiet else sys.stdout)
+    finally:
+        a.data.close()
+        b.data.close()
+    sys.exit(1 if differ else 0)
+
+if __name__ == '__main__':
+    main()
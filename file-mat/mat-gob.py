@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Command line tool which lists and converts MAT files stored in GOB archive without extracting the archive.
+#
+# Usage:
+#   mat-gob.py list    <archive.gob>
+#   mat-gob.py convert <archive.gob> <output folder> [--cmp file.cmp] [--jobs N]
+
+import argparse
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from colormap import *
+from gob import *
+from mat_format import *
+from mat_codec import *
+from pngio import write_png
+
+# Per worker process state
+_archive: Optional[GobArchive] = None
+_colormap: Optional[ColorMap]  = None
+
+def _init_worker(gob_path: str, cmp_path: Optional[str]):
+    global _archive, _colormap
+    _archive  = GobArchive(gob_path)
+    _colormap = read_colormap(cmp_path) if cmp_path else None
+
+def _get_colormap(member: str) -> ColorMap:
+    if _colormap is not None:
+        return _colormap
+    cmp_member = find_gob_colormap(_archive, member)
+    if cmp_member is None:
+        raise ImportError('Indexed MAT file requires colormap (CMP) file')
+    with _archive.open(cmp_member) as f:
+        return read_colormap_from_file(f)
+
+def get_member_output_path(member: str, out_dir: str) -> str:
+    """
+    Returns output path (without extension) of archive member in output folder.
+    Raises ValueError if member path is absolute or it points outside of output folder.
+    """
+    path = os.path.splitext(member.replace('\\', '/'))[0]
+    parts = [p for p in path.split('/') if p not in ('', '.')]
+    if path.startswith('/') or not parts or any(p == '..' or ':' in p for p in parts):
+        raise ValueError(f'Invalid archive member path: {member}')
+
+    out_path = os.path.join(out_dir, *parts)
+    root = os.path.realpath(out_dir)
+    if os.path.commonpath([root, os.path.realpath(out_path)]) != root:
+        raise ValueError(f'Archive member path points outside of output folder: {member}')
+    return out_path
+
+def convert_member(member: str, out_dir: str) -> Tuple[str, Optional[str]]:
+    """Convert every cel of MAT archive member to PNG file. Returns member name and error if any."""
+    try:
+        with _archive.open(member) as f:
+            h, _ = read_header_and_records(f)
+            cmp = _get_colormap(member) if h.color_info.color_mode == ColorMode.Indexed else None
+
+            out_path = get_member_output_path(member, out_dir)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            for cel_idx in range(0, h.cel_count):
+                mm = read_texture(f, h.color_info, cmp)
+                png_path = out_path + (f'_cel_{cel_idx}' if h.cel_count > 1 else '') + '.png'
+                write_png(png_path, mm.pixel_data_array[0], mm.width, mm.height, get_decoded_pixel_size(mm.color_info))
+        return member, None
+    except Exception as e:
+        return member, str(e) or type(e).__name__
+
+def list_mats(gob_path: str):
+    with GobArchive(gob_path) as archive:
+        for e in archive.list('.mat'):
+            with archive.open(e.name) as f:
+                try:
+                    h, _ = read_header_and_records(f)
+                    mmh = read_mipmap_header(f)
+                    print(f'{e.name}\t{e.size}\t{mmh.width}x{mmh.height}\t{color_format_name(h.color_info)}\tcels: {h.cel_count}\tlods: {mmh.mipmap_levels}')
+                except Exception as ex:
+                    print(f'{e.name}\t{e.size}\terror: {ex}')
+
+def convert_mats(gob_path: str, out_dir: str, cmp_path: Optional[str] = None, jobs: Optional[int] = None) -> int:
+    """Convert all MAT files in GOB archive to PNG files. Returns number of failed conversions."""
+    with GobArchive(gob_path) as archive:
+        members: List[str] = [e.name for e in archive.list('.mat')]
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(gob_path, cmp_path)) as ex:
+        for member, error in ex.map(convert_member, members, [out_dir] * len(members)):
+            if error:
+                failed += 1
+                print(f'{member}: {error}', file=sys.stderr)
+            else:
+                print(member)
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description='List and convert MAT files in GOB archive.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_list = sub.add_parser('list', help='list MAT files in GOB archive')
+    p_list.add_argument('gob')
+
+    p_conv = sub.add_parser('convert', help='convert all MAT files in GOB archive to PNG files')
+    p_conv.add_argument('gob')
+    p_conv.add_argument('output')
+    p_conv.add_argument('--cmp', default=None, help='CMP file used to decode indexed MAT files (default: CMP file from archive)')
+    p_conv.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: CPU count)')
+
+    args = parser.parse_args()
+    if args.command == 'list':
+        list_mats(args.gob)
+    else:
+        sys.exit(1 if convert_mats(args.gob, args.output, args.cmp, args.jobs) else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Command line tool which indexes metadata of MAT files in a folder tree into SQLite database.
+#
+# Usage:
+#   mat-index.py scan  <folder> [--db mat-index.db] [--jobs N]
+#   mat-index.py query [--db mat-index.db] [--format RGBA4444] [--larger-than 256] [--more-cels-than 8] [--more-lods-than N]
+
+import argparse
+import os
+import sqlite3
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mat_format import *
+
+DEFAULT_DB_PATH  = 'mat-index.db'
+MAT_EXTENSION    = '.mat'
+SCAN_CHUNK_SIZE  = 64 # number of files sent to a worker process at once
+
+DB_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS mat (
+    path          TEXT PRIMARY KEY,
+    mtime_ns      INTEGER NOT NULL,
+    size          INTEGER NOT NULL,
+    width         INTEGER,
+    height        INTEGER,
+    color_format  TEXT,
+    color_mode    INTEGER,
+    bpp           INTEGER,
+    cel_count     INTEGER,
+    mipmap_levels INTEGER,
+    error         TEXT
+);
+CREATE INDEX IF NOT EXISTS mat_color_format ON mat (color_format);
+CREATE INDEX IF NOT EXISTS mat_area         ON mat (width * height);
+CREATE INDEX IF NOT EXISTS mat_cel_count    ON mat (cel_count);
+'''
+
+# Row columns, excluding path, mtime_ns and size
+MatInfo = Tuple[Optional[int], Optional[int], Optional[str], Optional[int], Optional[int], Optional[int], Optional[int], Optional[str]]
+
+def read_mat_info(file_path: str) -> MatInfo:
+    """
+    Read MAT metadata. Only headers are read, the pixel data is skipped.
+    Width, height and mipmap levels are of the largest cel texture.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            h, _ = read_header_and_records(f)
+            mmhs = read_mipmap_headers(f, h)
+
+        width  = max(mmh.width for mmh in mmhs)
+        height = max(mmh.height for mmh in mmhs)
+        levels = max(mmh.mipmap_levels for mmh in mmhs)
+        cf     = h.color_info
+        return (width, height, color_format_name(cf), int(cf.color_mode), cf.bpp, h.cel_count, levels, None)
+    except Exception as e:
+        return (None, None, None, None, None, None, None, str(e) or type(e).__name__)
+
+def _read_mat_infos(paths: List[str]) -> List[MatInfo]:
+    return [read_mat_info(p) for p in paths]
+
+def _chunks(l: List, size: int) -> Iterator[List]:
+    for i in range(0, len(l), size):
+        yield l[i: i + size]
+
+def walk_mat_files(root: str) -> Iterator[os.DirEntry]:
+    """Recursively yield dir entries of all MAT files in root folder"""
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                yield from walk_mat_files(e.path)
+            elif e.is_file() and e.name.lower().endswith(MAT_EXTENSION):
+                yield e
+
+def open_db(db_path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(db_path)
+    db.executescript(DB_SCHEMA)
+    return db
+
+def scan(db: sqlite3.Connection, root: str, jobs: Optional[int] = None) -> Tuple[int, int, int]:
+    """
+    Scan folder tree and update index.
+    Only new files and files whose mtime or size changed are parsed,
+    files which are not present anymore are removed from index.
+    Returns number of updated, unchanged and removed files.
+    """
+    root = os.path.abspath(root)
+
+    # Files under root are selected by path range, because LIKE is case-insensitive and treats '_' and '%' as wildcards
+    prefix = os.path.join(root, '')
+    indexed: Dict[str, Tuple[int, int]] = {
+        path: (mtime_ns, size) for path, mtime_ns, size in
+        db.execute('SELECT path, mtime_ns, size FROM mat WHERE path >= ? AND path < ?', (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+    }
+
+    changed: List[Tuple[str, int, int]] = []
+    unchanged = 0
+    for e in walk_mat_files(root):
+        st = e.stat()
+        if indexed.pop(e.path, None) == (st.st_mtime_ns, st.st_size):
+            unchanged += 1
+        else:
+            changed.append((e.path, st.st_mtime_ns, st.st_size))
+
+    # Parse changed files in parallel
+    paths = [c[0] for c in changed]
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        infos = [i for chunk in ex.map(_read_mat_infos, _chunks(paths, SCAN_CHUNK_SIZE)) for i in chunk]
+
+    with db:
+        db.executemany('INSERT OR REPLACE INTO mat VALUES (?,?,?,?,?,?,?,?,?,?,?)',
+            (c + info for c, info in zip(changed, infos))
+        )
+        db.executemany('DELETE FROM mat WHERE path = ?', ((p,) for p in indexed))
+    return len(changed), unchanged, len(indexed)
+
+def query(db: sqlite3.Connection, color_formats: List[str] = [], larger_than: int = 0, more_cels_than: int = 0, more_lods_than: int = 0) -> List[tuple]:
+    """
+    Query index for valid MAT files.
+    :param color_formats: list of color format names e.g. RGBA4444. Empty list means any format.
+    :param larger_than: select textures with more pixels than larger_than²
+    :param more_cels_than: select textures with more cels than more_cels_than
+    :param more_lods_than: select textures with more mipmap levels than more_lods_than
+    """
+    sql  = 'SELECT path, width, height, color_format, cel_count, mipmap_levels FROM mat WHERE error IS NULL'
+    args = []
+    if color_formats:
+        sql  += f' AND color_format IN ({",".join("?" * len(color_formats))})'
+        args += [f.upper() for f in color_formats]
+    if larger_than > 0:
+        sql  += ' AND width * height > ?'
+        args.append(larger_than * larger_than)
+    if more_cels_than > 0:
+        sql  += ' AND cel_count > ?'
+        args.append(more_cels_than)
+    if more_lods_than > 0:
+        sql  += ' AND mipmap_levels > ?'
+        args.append(more_lods_than)
+    return db.execute(sql + ' ORDER BY path', args).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description='Index metadata of MAT files into SQLite database.')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help=f'index database path (default: {DEFAULT_DB_PATH})')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_scan = sub.add_parser('scan', help='scan folder tree and update index')
+    p_scan.add_argument('folder')
+    p_scan.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: CPU count)')
+
+    p_query = sub.add_parser('query', help='query index')
+    p_query.add_argument('-f', '--format', action='append', default=[], help='color format e.g. RGBA4444 (can be repeated)')
+    p_query.add_argument('--larger-than', type=int, default=0, metavar='N', help='texture has more than N² pixels')
+    p_query.add_argument('--more-cels-than', type=int, default=0, metavar='N')
+    p_query.add_argument('--more-lods-than', type=int, default=0, metavar='N')
+
+    args = parser.parse_args()
+    db   = open_db(args.db)
+    if args.command == 'scan':
+        updated, unchanged, removed = scan(db, args.folder, args.jobs)
+        print(f'Updated: {updated}, unchanged: {unchanged}, removed: {removed}')
+    else:
+        for path, width, height, cf, cels, lods in query(db, args.format, args.larger_than, args.more_cels_than, args.more_lods_than):
+            print(f'{path}\t{width}x{height}\t{cf}\tcels: {cels}\tlods: {lods}')
+
+if __name__ == '__main__':
+    main()
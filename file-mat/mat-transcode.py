@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Command line tool which transcodes MAT files to another color format without GIMP.
+# Every cel texture and its stored mipmap LOD levels are transcoded, the LOD chain is not made again.
+# Record table and mipmap headers are kept as they are.
+#
+# Usage:
+#   mat-transcode.py <color format> <file or folder>... [--output <folder>] [--jobs N]
+#   mat-transcode.py <color format> <file or folder>... --in-place [--jobs N]
+
+import argparse
+import mmap
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mat_format import *
+from mat_codec import *
+
+MAT_EXTENSION        = '.mat'
+TRANSCODE_CHUNK_SIZE = 16 # number of files sent to a worker process at once
+
+def transcode_mat_data(data, dst_ci: ColorFormat) -> bytes:
+    """
+    Transcode MAT file data to color format dst_ci.
+    Header (except color format), record table, mipmap headers and any data after the last texture are copied unchanged.
+    :param data: memory-mapped MAT file
+    """
+    data.seek(0)
+    h, _    = read_header_and_records(data)
+    offset  = data.tell()
+    layouts = get_texture_layouts(data, h, offset)
+    src_ci  = h.color_info
+
+    out = bytearray(data[:mh_serf.size])
+    out += cf_serf.pack(*dst_ci)
+    out += data[mh_serf.size + cf_serf.size: offset]
+    for layout in layouts:
+        out += data[layout.offset - mmm_serf.size: layout.offset]
+        for level, size in enumerate(layout.lod_sizes):
+            pos = layout.lod_offset(level)
+            out += transcode_pixel_data(data[pos: pos + size], layout.header.width >> level, layout.header.height >> level, src_ci, dst_ci)
+    out += data[layouts[-1].end if layouts else offset:]
+    return bytes(out)
+
+def transcode_file(src: str, dst: str, cf: ColorFormat) -> Optional[str]:
+    """Transcode MAT file to color format cf. dst is replaced atomically. Returns error if any."""
+    try:
+        with open(src, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            out = transcode_mat_data(data, cf)
+
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        tmp = dst + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(out)
+        os.replace(tmp, dst)
+        return None
+    except Exception as e:
+        return str(e) or type(e).__name__
+
+def walk_mat_files(root: str) -> Iterator[str]:
+    """Recursively yield paths of all MAT files in root folder"""
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                yield from walk_mat_files(e.path)
+            elif e.is_file() and e.name.lower().endswith(MAT_EXTENSION):
+                yield e.path
+
+def collect_jobs(inputs: List[str], output: Optional[str]) -> List[Tuple[str, str]]:
+    """
+    Returns list of (source, destination) paths of MAT files to transcode.
+    Files of input folder are placed in output folder under their path relative to input folder.
+    If output is None files are transcoded in place.
+    """
+    jobs: List[Tuple[str, str]] = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for src in walk_mat_files(path):
+                jobs.append((src, os.path.join(output, os.path.relpath(src, path)) if output else src))
+        else:
+            jobs.append((path, os.path.join(output, os.path.basename(path)) if output else path))
+    return jobs
+
+def main():
+    parser = argparse.ArgumentParser(description='Transcode MAT files to another color format.')
+    parser.add_argument('format', help='target color format e.g. RGBA4444')
+    parser.add_argument('inputs', nargs='+', metavar='input', help='MAT file or folder of MAT files')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('-o', '--output', default=None, help='output folder')
+    group.add_argument('--in-place', action='store_true', help='replace input files')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    try:
+        cf = color_format_by_name(args.format)
+        if cf.color_mode == ColorMode.Indexed:
+            raise ValueError('Indexed color format is not supported')
+    except ValueError as e:
+        parser.error(str(e))
+
+    jobs   = collect_jobs(args.inputs, args.output)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+        errors = ex.map(transcode_file, [src for src, _ in jobs], [dst for _, dst in jobs], [cf] * len(jobs), chunksize=TRANSCODE_CHUNK_SIZE)
+        for (src, dst), error in zip(jobs, errors):
+            if error:
+                failed += 1
+                print(f'{src}: {error}', file=sys.stderr)
+            else:
+                print(dst)
+    print(f'Transcoded: {len(jobs) - failed}, failed: {failed}', file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Watch-folder daemon which rebuilds MAT files when their PNG or XCF source images change.
+#
+# Every source image is built to MAT file with the same name (or into the --output folder tree).
+# PNG images are built without GIMP, XCF images are built with GIMP in batch mode.
+# If PNG and XCF image have the same name, the MAT file is built from the XCF image.
+# Build options are read from the '.mat-watch.json' file in the source folder or the nearest parent folder, e.g.:
+#   { "color_format": "RGBA4444", "mipmap": true, "lod_min_size": 16, "lod_max_levels": 4 }
+#
+# Usage:
+#   mat-watch.py <folder> [--output <folder>] [--jobs N] [--poll] [--gimp gimp-console-3.0] [--stats-interval 60]
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+
+from collections import deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from struct import Struct
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(PLUGIN_DIR)
+
+from mat_format import *
+from mat_codec import *
+from pngio import read_png
+
+SOURCE_EXTENSIONS   = ('.png', '.xcf')
+SOURCE_PRIORITY     = ('.xcf', '.png') # source image built when several sources have the same MAT file
+MAT_EXTENSION       = '.mat'
+SETTINGS_FILE_NAME  = '.mat-watch.json'
+DEBOUNCE_DELAY      = 0.5  # seconds without change of source file before it's built
+POLL_INTERVAL       = 1.0  # seconds between folder scans of polling watcher
+DEFAULT_GIMP        = 'gimp-console-3.0'
+LATENCY_WINDOW      = 1000 # number of latest builds used for latency stats
+
+
+class FolderSettings(NamedTuple):
+    color_format: str   = 'RGBA4444'
+    mipmap: bool        = True
+    lod_min_size: int   = 16
+    lod_max_levels: int = 4
+
+def read_folder_settings(folder: str, root: str) -> FolderSettings:
+    """
+    Read build settings of source folder.
+    Settings are read from the settings file in folder or the nearest parent folder up to root.
+    Options which are not set in settings file have default value.
+    """
+    root = os.path.abspath(root)
+    folder = os.path.abspath(folder)
+    while True:
+        path = os.path.join(folder, SETTINGS_FILE_NAME)
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            unknown = set(data) - set(FolderSettings._fields)
+            if unknown:
+                raise ValueError(f"Unknown option(s) {', '.join(sorted(unknown))} in '{path}'")
+            return FolderSettings()._replace(**data)
+        if folder == root or os.path.dirname(folder) == folder:
+            return FolderSettings()
+        folder = os.path.dirname(folder)
+
+def is_source_file(path: str) -> bool:
+    return path.lower().endswith(SOURCE_EXTENSIONS)
+
+def walk_files(root: str) -> Iterator[os.DirEntry]:
+    """Recursively yield dir entries of all source and settings files in root folder"""
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                yield from walk_files(e.path)
+            elif e.is_file() and (is_source_file(e.name) or e.name == SETTINGS_FILE_NAME):
+                yield e
+
+
+# GIMP batch script which exports XCF file to MAT file
+_GIMP_BATCH_CODE = '''
+import sys
+sys.path.append({plugin_dir!r})
+from gi.repository import Gimp, Gio
+from mat import MAT
+from mat_format import color_format_by_name
+from utils import set_layer_as_mipmap
+img = Gimp.file_load(Gimp.RunMode.NONINTERACTIVE, Gio.File.new_for_path({src!r}))
+if img.get_base_type() != Gimp.ImageBaseType.RGB:
+    img.convert_rgb()
+for l in img.get_layers():
+    set_layer_as_mipmap(l, {mipmap!r})
+MAT().save_to_filepath({dst!r}, img, color_format_by_name({cf!r}), {lod_min_size!r}, {lod_max_levels!r})
+img.delete()
+'''
+
+def _build_png(src: str, dst: str, settings: FolderSettings):
+    cf = color_format_by_name(settings.color_format)
+    if cf.color_mode == ColorMode.Indexed:
+        raise ValueError('Indexed color format is not supported')
+
+    pixels, width, height, px_size = read_png(src)
+    etex = encode_texture_data(pixels, width, height, px_size, cf, settings.mipmap, settings.lod_min_size, settings.lod_max_levels)
+    with open(dst, 'wb') as f:
+        write_header(f, 1, cf)
+        write_records(f, 1)
+        f.write(etex)
+
+def _build_xcf(src: str, dst: str, settings: FolderSettings, gimp: str):
+    code = _GIMP_BATCH_CODE.format(plugin_dir=PLUGIN_DIR, src=src, dst=dst, cf=settings.color_format,
+        mipmap=bool(settings.mipmap), lod_min_size=settings.lod_min_size, lod_max_levels=settings.lod_max_levels)
+    out = subprocess.run([gimp, '-i', '--batch-interpreter=python-fu-eval', '-b', code, '--quit'],
+        stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if out.returncode != 0 or not os.path.isfile(dst):
+        raise RuntimeError(f'GIMP failed to export XCF file: {out.stderr.strip() or out.returncode}')
+
+def build_mat(src: str, dst: str, settings: FolderSettings, gimp: str = DEFAULT_GIMP) -> Optional[str]:
+    """
+    Build MAT file from source image. Returns error if any.
+    MAT file is first written to a temporary file which then replaces dst file,
+    so the dst file is never seen partially written.
+    """
+    tmp = f'{dst}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+        if src.lower().endswith('.xcf'):
+            _build_xcf(src, tmp, settings, gimp)
+        else:
+            _build_png(src, tmp, settings)
+        os.replace(tmp, dst)
+        return None
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return str(e) or type(e).__name__
+
+
+class PollingWatcher:
+    """Watches folder tree for changed files by scanning it periodically"""
+
+    def __init__(self, root: str):
+        self.root      = root
+        self._files    = self._scan()
+        self._next_poll = time.monotonic() + POLL_INTERVAL
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        for e in walk_files(self.root):
+            try:
+                st = e.stat()
+                files[e.path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass # removed while scanning
+        return files
+
+    def read_events(self, timeout: float) -> List[str]:
+        """Wait at most timeout seconds and return paths of new or changed files"""
+        time.sleep(max(0.0, min(timeout, self._next_poll - time.monotonic())))
+        if time.monotonic() < self._next_poll:
+            return []
+
+        self._next_poll = time.monotonic() + POLL_INTERVAL
+        files   = self._scan()
+        changed = [p for p, st in files.items() if self._files.get(p) != st]
+        self._files = files
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Watches folder tree for changed files using Linux inotify"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+    IN_Q_OVERFLOW  = 0x00004000
+    IN_IGNORED     = 0x00008000
+    IN_ISDIR       = 0x40000000
+    WATCH_MASK     = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    ie_serf = Struct('iIII') # wd, mask, cookie, len
+
+    def __init__(self, root: str):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is not supported on this platform')
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd   = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.root = root
+        self._watches: Dict[int, str] = {}
+        try:
+            self._add_watches(root)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _add_watches(self, folder: str) -> List[str]:
+        """Add watches for folder tree. Returns files already in the folder tree."""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), self.WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for '{folder}'")
+        self._watches[wd] = folder
+
+        files = []
+        with os.scandir(folder) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    files += self._add_watches(e.path)
+                elif e.is_file():
+                    files.append(e.path)
+        return files
+
+    def read_events(self, timeout: float) -> List[str]:
+        """Wait at most timeout seconds and return paths of new or changed files"""
+        if not select.select([self._fd], [], [], max(0.0, timeout))[0]:
+            return []
+
+        data = b''
+        while True:
+            try:
+                data += os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+        changed = []
+        pos = 0
+        while pos + self.ie_serf.size <= len(data):
+            wd, mask, _, name_len = self.ie_serf.unpack_from(data, pos)
+            name = os.fsdecode(data[pos + self.ie_serf.size: pos + self.ie_serf.size + name_len].rstrip(b'\0'))
+            pos += self.ie_serf.size + name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost, report all files
+                return [e.path for e in walk_files(self.root)]
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            folder = self._watches.get(wd)
+            if folder is None:
+                continue
+            path = os.path.join(folder, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    try:
+                        changed += self._add_watches(path)
+                    except OSError:
+                        pass # removed before watched
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+def create_watcher(root: str, polling: bool = False):
+    """Create inotify watcher for folder tree, or polling watcher if inotify is not available"""
+    if not polling:
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f'inotify not available ({e}), falling back to polling', file=sys.stderr)
+    return PollingWatcher(root)
+
+
+class WatchStats:
+    """Build statistics of watch daemon"""
+
+    def __init__(self):
+        self.built  = 0
+        self.failed = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, latency: float, ok: bool):
+        """Add finished build. latency is time from the first change of source file to finished build."""
+        if ok:
+            self.built += 1
+        else:
+            self.failed += 1
+        self.latencies.append(latency)
+
+    def format(self, queued: int, running: int) -> str:
+        s = f'queued: {queued}, running: {running}, built: {self.built}, failed: {self.failed}'
+        if self.latencies:
+            s += f', latency avg: {sum(self.latencies) / len(self.latencies):.2f}s max: {max(self.latencies):.2f}s'
+        return s
+
+
+class WatchDaemon:
+    """
+    Watches source folder tree and rebuilds MAT files of changed source images.
+    Changes are debounced, i.e. the source is built only after it hasn't changed for DEBOUNCE_DELAY seconds.
+    At most jobs sources are built at once, the rest wait in the queue.
+    """
+
+    def __init__(self, root: str, output: Optional[str] = None, jobs: Optional[int] = None, polling: bool = False, gimp: str = DEFAULT_GIMP):
+        self.root    = os.path.abspath(root)
+        self.output  = os.path.abspath(output) if output else None
+        self.jobs    = jobs or os.cpu_count() or 1
+        self.gimp    = gimp
+        self.stats   = WatchStats()
+        self.stopped = False
+        self._watcher = create_watcher(self.root, polling)
+
+        self._pending: Dict[str, Tuple[float, float]] = {}        # source path: (first change time, build deadline)
+        self._running: Dict[Future, Tuple[str, str, float]] = {}  # future: (source path, MAT path, first change time)
+
+    def get_output_path(self, src: str) -> str:
+        """Returns MAT file path of source image"""
+        if self.output:
+            src = os.path.join(self.output, os.path.relpath(src, self.root))
+        return os.path.splitext(src)[0] + MAT_EXTENSION
+
+    def get_built_source(self, src: str) -> str:
+        """
+        Returns source image which is built to the MAT file of src.
+        If there are several source images with the same name but different extension (e.g. x.png and x.xcf),
+        they would be built to the same MAT file, so only one of them is built by SOURCE_PRIORITY.
+        """
+        folder, name = os.path.split(src)
+        stem = os.path.splitext(name)[0]
+        try:
+            sources = [os.path.join(folder, n) for n in os.listdir(folder) if is_source_file(n) and os.path.splitext(n)[0] == stem]
+        except OSError:
+            return src
+        if len(sources) < 2:
+            return src
+        return min(sources, key=lambda p: (SOURCE_PRIORITY.index(os.path.splitext(p)[1].lower()), p))
+
+    def queue(self, path: str, delay: float = DEBOUNCE_DELAY):
+        """Queue source file to be built after delay. The delay restarts on every change."""
+        now   = time.monotonic()
+        first = self._pending[path][0] if path in self._pending else now
+        self._pending[path] = (first, now + delay)
+
+    def queue_outdated(self):
+        """Queue all source files whose MAT file is missing or older than source"""
+        for e in walk_files(self.root):
+            if not is_source_file(e.name):
+                continue
+            try:
+                if e.stat().st_mtime_ns > os.stat(self.get_output_path(e.path)).st_mtime_ns:
+                    self.queue(e.path, 0.0)
+            except FileNotFoundError:
+                self.queue(e.path, 0.0)
+
+    def _on_changed(self, path: str):
+        if os.path.basename(path) == SETTINGS_FILE_NAME:
+            # Settings changed, rebuild all sources in folder tree
+            for e in walk_files(os.path.dirname(path)):
+                if is_source_file(e.name):
+                    self.queue(e.path)
+        elif is_source_file(path):
+            self.queue(path)
+
+    def _submit_ready(self, ex: ProcessPoolExecutor):
+        now = time.monotonic()
+        running_srcs = { r[0] for r in self._running.values() }
+        running_dsts = { os.path.normcase(r[1]) for r in self._running.values() }
+        for src, (first, deadline) in sorted(self._pending.items(), key=lambda i: i[1][1]):
+            if len(self._running) >= self.jobs:
+                break
+            dst = self.get_output_path(src)
+            if deadline > now or src in running_srcs or os.path.normcase(dst) in running_dsts:
+                continue # not settled yet or being built, will be built when the running build finishes
+
+            del self._pending[src]
+            if not os.path.isfile(src):
+                continue # removed
+            built_src = self.get_built_source(src)
+            if built_src != src:
+                print(f'skipped {src}: {dst} is built from {built_src}', file=sys.stderr)
+                continue
+            try:
+                settings = read_folder_settings(os.path.dirname(src), self.root)
+            except Exception as e:
+                print(f'failed {src}: {e}', file=sys.stderr)
+                self.stats.add(now - first, False)
+                continue
+            try:
+                fut = ex.submit(build_mat, src, dst, settings, self.gimp)
+            except BrokenProcessPool:
+                self._pending[src] = (first, deadline)
+                raise
+            self._running[fut] = (src, dst, first)
+            running_dsts.add(os.path.normcase(dst))
+
+    def _collect_finished(self) -> bool:
+        """Report finished builds. Returns True if a worker process died and the process pool is broken."""
+        broken = False
+        for fut in [f for f in self._running if f.done()]:
+            src, dst, first = self._running.pop(fut)
+            try:
+                error = fut.result()
+            except CancelledError:
+                continue
+            except BrokenProcessPool:
+                error  = 'build worker process died'
+                broken = True
+            latency = time.monotonic() - first
+            self.stats.add(latency, error is None)
+            if error:
+                print(f'failed {src}: {error}', file=sys.stderr)
+            else:
+                print(f'built {dst} ({latency:.2f}s)')
+        return broken
+
+    def _restart_pool(self, ex: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """
+        Replace process pool which is broken because a worker process died (e.g. killed when out of memory).
+        The builds which were still running in the pool are reported as failed.
+        """
+        print('build worker process died, restarting worker processes', file=sys.stderr)
+        ex.shutdown(wait=False, cancel_futures=True)
+        for src, _, first in self._running.values():
+            self.stats.add(time.monotonic() - first, False)
+            print(f'failed {src}: build worker process died', file=sys.stderr)
+        self._running.clear()
+        return ProcessPoolExecutor(max_workers=self.jobs)
+
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def run(self, initial_build: bool = True, stats_interval: float = 60.0):
+        """Run daemon until stop is called"""
+        if initial_build:
+            self.queue_outdated()
+
+        next_stats = time.monotonic() + stats_interval
+        ex = ProcessPoolExecutor(max_workers=self.jobs)
+        try:
+            while not self.stopped:
+                broken = self._collect_finished()
+                if not broken:
+                    try:
+                        self._submit_ready(ex)
+                    except BrokenProcessPool:
+                        broken = True
+                if broken:
+                    ex = self._restart_pool(ex)
+                    self._submit_ready(ex)
+
+                # Wait for file changes until the next pending source settles
+                timeout = POLL_INTERVAL
+                if self._pending:
+                    timeout = min(timeout, max(0.0, min(d for _, d in self._pending.values()) - time.monotonic()))
+                if self._running:
+                    timeout = min(timeout, 0.1)
+                for path in self._watcher.read_events(timeout):
+                    self._on_changed(path)
+
+                if stats_interval > 0 and time.monotonic() >= next_stats:
+                    next_stats = time.monotonic() + stats_interval
+                    print(self.stats.format(self.queue_depth(), len(self._running)))
+        finally:
+            ex.shutdown(wait=True, cancel_futures=True)
+            self._collect_finished()
+            self._watcher.close()
+        print(self.stats.format(self.queue_depth(), len(self._running)))
+
+    def stop(self):
+        self.stopped = True
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch folder and rebuild MAT files when PNG or XCF source images change.')
+    parser.add_argument('folder')
+    parser.add_argument('-o', '--output', default=None, help='output folder of MAT files (default: next to source image)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='max number of concurrent builds (default: CPU count)')
+    parser.add_argument('--poll', action='store_true', help='scan folder periodically instead of using inotify')
+    parser.add_argument('--gimp', default=DEFAULT_GIMP, help=f'GIMP console executable used to build XCF files (default: {DEFAULT_GIMP})')
+    parser.add_argument('--no-initial-build', action='store_true', help="don't build outdated MAT files on start")
+    parser.add_argument('--stats-interval', type=float, default=60.0, metavar='SECONDS', help='print stats every SECONDS, 0 disables (default: 60)')
+    args = parser.parse_args()
+
+    daemon = WatchDaemon(args.folder, args.output, args.jobs, args.poll, args.gimp)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    daemon.run(not args.no_initial_build, args.stats_interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Persistent local codec worker which decodes MAT files for the GIMP plug-in.
+#
+# The worker keeps the codec loaded and decoded cel textures in memory (LRU cache),
+# so repeated loads and thumbnail requests of the same files don't decode them again.
+# The plug-in uses the worker when it's running and decodes files in-process otherwise.
+# Decoded pixel data is passed to the plug-in through shared memory (see codec_worker.py).
+#
+# Usage:
+#   mat-worker.py [--socket PATH] [--cache-size MB]
+#   mat-worker.py --stats [--socket PATH]
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from colormap import *
+from mat_format import *
+from mat_codec import *
+from codec_worker import *
+
+DEFAULT_CACHE_SIZE = 256 # MiB of decoded pixel data kept in cache
+
+# Cache key of decoded cel: MAT path, mtime and size, CMP path and mtime, cel index
+CelKey = Tuple[str, int, int, Optional[str], int, int]
+
+def _get_mipmap_size(mm: Mipmap) -> int:
+    return sum(len(memoryview(pd).cast('B')) for pd in mm.pixel_data_array)
+
+
+class CelCache:
+    """LRU cache of decoded cel textures limited by the total size of pixel data"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size     = 0
+        self.hits     = 0
+        self.misses   = 0
+        self._cels: OrderedDict[CelKey, Tuple[Mipmap, int]] = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def get(self, key: CelKey) -> Optional[Mipmap]:
+        with self._lock:
+            entry = self._cels.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._cels.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: CelKey, mm: Mipmap):
+        size = _get_mipmap_size(mm)
+        if size > self.max_size:
+            return
+        with self._lock:
+            old = self._cels.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._cels[key] = (mm, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted) = self._cels.popitem(last=False)
+                self.size -= evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return { 'cels': len(self._cels), 'size': self.size, 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses }
+
+
+def decode_cels(cache: CelCache, file_path: str, cmp_file_path: Optional[str], max_cells: int) -> List[Mipmap]:
+    """
+    Decode cel textures of MAT file, cached cels are not decoded again.
+    Cels are keyed by file mtime and size, so changed files are decoded again.
+    """
+    with open(file_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        h, _ = read_header_and_records(f)
+
+        cmp: Optional[ColorMap] = None
+        cmp_mtime = 0
+        if h.color_info.color_mode == ColorMode.Indexed:
+            if cmp_file_path is None:
+                cmp_file_path = find_colormap(file_path)
+            if cmp_file_path is None:
+                raise ImportError('Indexed MAT file requires colormap (CMP) file')
+            cmp_mtime = os.stat(cmp_file_path).st_mtime_ns
+        else:
+            cmp_file_path = None
+
+        max_cells = h.cel_count if max_cells < 0 else min(max_cells, h.cel_count)
+        cels: List[Mipmap] = []
+        for cel_idx in range(0, max_cells):
+            key = (file_path, st.st_mtime_ns, st.st_size, cmp_file_path, cmp_mtime, cel_idx)
+            mm  = cache.get(key)
+            if mm is not None:
+                # Skip pixel data of cached cel
+                mmh = read_mipmap_header(f)
+                f.seek(sum(get_mipmap_sizes(mmh, h.color_info.bpp)), 1)
+            else:
+                if cmp is None and cmp_file_path is not None:
+                    cmp = read_colormap(cmp_file_path)
+                mm = read_texture(f, h.color_info, cmp)
+                cache.put(key, mm)
+            cels.append(mm)
+        return cels
+
+def write_shared_memory(cels: List[Mipmap]) -> Tuple[int, int, list]:
+    """
+    Write pixel data of cels to new anonymous shared memory file.
+    Returns file descriptor, size of pixel data and cel layout [width, height, color format, [[offset, size] of LOD]].
+    """
+    layout = []
+    offset = 0
+    for mm in cels:
+        lods = []
+        for pd in mm.pixel_data_array:
+            size = len(memoryview(pd).cast('B'))
+            lods.append([offset, size])
+            offset += size
+        layout.append([mm.width, mm.height, [int(v) for v in mm.color_info], lods])
+
+    if hasattr(os, 'memfd_create'):
+        fd = os.memfd_create('mat-cels')
+    else:
+        fd, path = tempfile.mkstemp(prefix='mat-cels-')
+        os.unlink(path)
+    try:
+        os.ftruncate(fd, offset)
+        with os.fdopen(os.dup(fd), 'wb') as f:
+            for mm in cels:
+                for pd in mm.pixel_data_array:
+                    f.write(pd)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd, offset, layout
+
+
+class WorkerHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            req, _ = recv_json(self.request)
+        except (OSError, ValueError):
+            return
+
+        try:
+            op = req.get('op')
+            if op == 'decode':
+                cels = decode_cels(self.server.cache, req['path'], req.get('cmp'), int(req.get('max_cells', -1)))
+                fd, size, layout = write_shared_memory(cels)
+                try:
+                    send_json(self.request, { 'size': size, 'cels': layout }, [fd])
+                finally:
+                    os.close(fd)
+            elif op == 'stats':
+                send_json(self.request, self.server.cache.stats())
+            else:
+                send_json(self.request, { 'error': f"Unknown request '{op}'" })
+        except Exception as e:
+            try:
+                send_json(self.request, { 'error': str(e) or type(e).__name__ })
+            except OSError:
+                pass
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, cache: CelCache):
+        self.cache = cache
+        # Socket is made accessible only to the current user already on bind
+        umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, WorkerHandler)
+        finally:
+            os.umask(umask)
+        os.chmod(socket_path, 0o600)
+
+
+def remove_stale_socket(socket_path: str):
+    """
+    Remove socket file of worker which isn't running anymore.
+    Raises RuntimeError if worker is running or the socket file is owned by another user.
+    """
+    if not os.path.lexists(socket_path):
+        return
+    if os.lstat(socket_path).st_uid != os.getuid():
+        raise RuntimeError(f"Socket '{socket_path}' is owned by another user")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+    raise RuntimeError(f"Codec worker is already running on '{socket_path}'")
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistent codec worker which decodes MAT files for the GIMP plug-in.')
+    parser.add_argument('--socket', default=None, help=f'worker socket path (default: {get_worker_socket_path()})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, metavar='MB', help=f'max size of decoded cels kept in memory (default: {DEFAULT_CACHE_SIZE})')
+    parser.add_argument('--stats', action='store_true', help='print stats of running worker and exit')
+    args = parser.parse_args()
+
+    if not is_worker_supported():
+        sys.exit('Codec worker requires Unix domain sockets')
+    if args.socket:
+        os.environ[WORKER_SOCKET_ENV] = args.socket
+    socket_path = get_worker_socket_path()
+
+    if args.stats:
+        try:
+            stats, _ = request_worker({ 'op': 'stats' })
+        except OSError as e:
+            sys.exit(f'Codec worker is not running: {e}')
+        print(', '.join(f'{k}: {v}' for k, v in stats.items()))
+        return
+
+    try:
+        remove_stale_socket(socket_path)
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+    server = WorkerServer(socket_path, CelCache(args.cache_size * 1024 * 1024))
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f'Codec worker listening on {socket_path}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+if __name__ == '__main__':
+    main()
@@ -20,7 +20,10 @@
 # SOFTWARE.
 
 import gi
+import hashlib
+import mmap
 import os
+import sys
 
 gi.require_version('Gimp', '3.0')
 from gi.repository import Gimp
@@ -28,150 +31,298 @@ from gi.repository import Gio
 from gi.repository import Gegl
 
 from utils import *
+from colormap import *
+from mat_format import *
+from mat_codec import *
+from gob import *
+from codec_worker import decode_with_worker
 
 from array import array
-from enum import IntEnum
-from struct import Struct, pack
-from typing import List, BinaryIO, NamedTuple, Any
-
-
-MAT_FILE_MAGIC       = b'MAT ' # mind the space at the end
-MAT_REQUIRED_VERSION = 0x32
-
-class ColorMode(IntEnum):
-    Indexed = 0
-    RGB     = 1
-    RGBA    = 2
-
-class ColorFormat(NamedTuple):
-    color_mode: ColorMode
-    bpp: int
-    red_bpp: int
-    green_bpp: int
-    blue_bpp: int
-    red_shl: int
-    green_shl: int
-    blue_shl: int
-    red_shr: int
-    green_shr: int
-    blue_shr: int
-    alpha_bpp: int
-    alpha_shl: int
-    alpha_shr: int
-
-cf_serf = Struct('<14I')
-
-class MatType(IntEnum):
-    Color   = 0
-    Texture = 2
-
-class MatHeader(NamedTuple):
-    magic: bytes
-    version: int
-    type: MatType
-    record_count: int
-    cel_count: int
-    color_info: ColorFormat
-
-mh_serf = Struct('<4siIii')
-
-class MatRecordHeader(NamedTuple):
-    record_type: int
-    color_index: int
-    unknown_1: int
-    unknown_2: int
-    unknown_3: int
-    unknown_4: int
-    unknown_5: int
-    unknown_6: int
-    unknown_7: int
-    cel_idx: int
-
-mrh_serf = Struct('<10i')
-
-class MatMipmapHeader(NamedTuple):
-    width: int
-    height: int
-    transparent: int
-    unknown: int
-    transparent_color_num: int
-    mipmap_levels: int
-    
-mmm_serf = Struct('<6i')
-
-class Mipmap(NamedTuple):
-    width: int
-    height: int
-    color_info: ColorFormat
-    pixel_data_array: List[Any]
-
-# Color format constants
-RGBA5551 = ColorFormat(ColorMode.RGBA, 16, 5,5,5, 11,6,1, 3,3,3, 1,0,7)
-RGBA4444 = ColorFormat(ColorMode.RGBA, 16, 4,4,4, 12,8,4, 4,4,4, 4,0,4)
-RGB565   = ColorFormat(ColorMode.RGB , 16, 5,6,5, 11,5,0, 3,2,3, 0,0,0)
-RGBA8888 = ColorFormat(ColorMode.RGBA, 32, 8,8,8, 24,16,8, 0,0,0, 8,0,0)
-RGB888   = ColorFormat(ColorMode.RGB , 24, 8,8,8, 16,8,0, 0,0,0, 0,0,0)
+from struct import pack
+from typing import List, BinaryIO, NamedTuple, Any, Optional, Callable, Dict, Iterator, Tuple, Union
 
 
+class MatLoadCancelled(ImportError):
+    """Raised when loading of MAT file is cancelled"""
+
+class MatVerifyError(Exception):
+    """Raised when MAT file read back after export doesn't match the exported image"""
+
+# Expected content of exported cel texture: pixel data of every LOD level (after dithering), width, height, bytes per pixel
+# and cached encoded LOD 0 pixel data which written LOD 0 is compared to as is (LOD 0 pixel data is not dithered then).
+ExportedTexture = Tuple[List[bytes], int, int, int, Optional[bytes]]
+
+def _decode_mat_files(file_paths: List[str], max_cells: int, jobs: Optional[int]) -> Iterator[Tuple[List[Tuple[Mipmap, int]], Optional[str]]]:
+    """
+    Decode first LOD level of MAT files concurrently in worker processes and yield results in file order.
+    See mat_codec.decode_mat_file_lod0. If process pool can't be created or it breaks, the rest of files
+    is decoded in sequence.
+    """
+    decoded = 0
+    if len(file_paths) > 1 and jobs != 1:
+        try:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from concurrent.futures.process import BrokenProcessPool
+        except ImportError:
+            jobs = 1
+
+    if len(file_paths) > 1 and jobs != 1:
+        ex = None
+        try:
+            # Worker processes are spawned rather than forked, so they don't inherit plug-in's GIMP connection.
+            # The plug-in main module is hidden from spawned workers, otherwise they would re-run it
+            # and import gi just to call the codec.
+            main = sys.modules['__main__']
+            main_path = main.__dict__.pop('__file__', None)
+            try:
+                ex = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'))
+                futures = [ex.submit(decode_mat_file_lod0, p, max_cells) for p in file_paths]
+            finally:
+                if main_path is not None:
+                    main.__file__ = main_path
+
+            for fut in futures:
+                yield fut.result()
+                decoded += 1
+        except (OSError, ValueError, NotImplementedError, BrokenProcessPool):
+            pass # decode the rest in sequence
+        finally:
+            if ex is not None:
+                ex.shutdown(wait=False, cancel_futures=True)
+
+    for file_path in file_paths[decoded:]:
+        yield decode_mat_file_lod0(file_path, max_cells)
+
 class MAT:
     """
     Class for loading and saving image to MAT file format
     for Indiana Jones and the Infernal Machine game.
     """
 
-    def load_from_filepath(self, file_path: str, max_cells: int = -1, load_mipmap_lod_chain:bool = False) -> Gimp.Image:
+    def load_from_filepath(self, file_path: str, max_cells: int = -1, load_mipmap_lod_chain:bool = False, cmp_file_path: Optional[str] = None, load_as_indexed: bool = False,
+                           cancel_cb: Optional[Callable[[], bool]] = None, cel_loaded_cb: Optional[Callable[[Gimp.Image, int], None]] = None, load_as_sprite_sheet: bool = False,
+                           lod_level: int = 0, max_size: int = 0, use_codec_worker: bool = False) -> Gimp.Image:
         '''
         Loads MAT from file and returns image.
         :param file_path: path to the MAT file
         :param max_cells: max number of celluloid textures to load.
                           Default -1, meaning all.
         :param load_mipmap_lod_chain: Loads MipMap texture LOD images as layers. If false no LOD image is loaded.
+        :param cmp_file_path: path to the CMP file used to decode indexed (8-bit) MAT.
+                              If None, the CMP file is searched for in the MAT file folder.
+        :param load_as_indexed: Converts image of indexed MAT to GIMP indexed image using CMP palette.
+        :param cancel_cb: Called periodically while decoding pixel data. If it returns True loading is stopped,
+                          the partially loaded image is deleted and MatLoadCancelled is raised.
+                          Loading is stopped the same way when GIMP doesn't accept progress update, e.g. plug-in progress was cancelled.
+        :param cel_loaded_cb: Called with image and cel index after cel layers are added to the image.
+                              i.e.: Can be used to report loading progress, starting with first cel.
+        :param load_as_sprite_sheet: Loads all cel textures (and LOD images if load_mipmap_lod_chain is True) in a grid on a single layer.
+                                     The grid geometry is attached to the layer as parasite, so the layer can be exported back to cels.
+        :param lod_level: Loads only this stored MipMap LOD level of every cel texture instead of full size texture, the other levels are skipped.
+                          Textures with fewer LOD levels are loaded at their smallest level.
+        :param max_size: Loads only the first stored MipMap LOD level of every cel texture which fits max_size. Default 0, meaning no limit.
+                         When reduced LOD level is loaded the image is marked as reduced view with parasite and load_mipmap_lod_chain is ignored.
+        :param use_codec_worker: Decodes cel textures in persistent codec worker (see mat-worker.py) if it's running.
+                                 If worker is not running or it fails, the textures are decoded in-process.
         '''
-        Gimp.progress_init(f'Loading MAT image')
+        textures: Optional[List[Mipmap]] = None
+        if use_codec_worker and lod_level <= 0 and max_size <= 0:
+            textures = decode_with_worker(file_path, cmp_file_path, max_cells)
+
         with open(file_path, 'rb') as f:
-            # Read MAT header and records
-            h = self._read_header(f)
-            r = self._read_records(f, h)
+            return self.load_from_file(f, file_path, max_cells, load_mipmap_lod_chain, cmp_file_path, load_as_indexed, cancel_cb, cel_loaded_cb,
+                                       load_as_sprite_sheet=load_as_sprite_sheet, lod_level=lod_level, max_size=max_size, textures=textures)
+
+    def load_from_gob(self, gob: Union[str, GobArchive], member: str, max_cells: int = -1, load_mipmap_lod_chain:bool = False, cmp_file_path: Optional[str] = None, load_as_indexed: bool = False,
+                      cancel_cb: Optional[Callable[[], bool]] = None, cel_loaded_cb: Optional[Callable[[Gimp.Image, int], None]] = None, load_as_sprite_sheet: bool = False,
+                      lod_level: int = 0, max_size: int = 0) -> Gimp.Image:
+        '''
+        Loads MAT from GOB archive without extracting it and returns image.
+        :param gob: path to the GOB archive or opened GOB archive
+        :param member: path of MAT file in GOB archive
+        :param cmp_file_path: path to the CMP file used to decode indexed (8-bit) MAT.
+                              If None, the CMP file is searched for in the GOB archive.
+        See load_from_filepath for the rest of parameters.
+        '''
+        archive = GobArchive(gob) if isinstance(gob, str) else gob
+        try:
+            with archive.open(member) as f:
+                # Indexed MAT requires colormap from archive
+                cmp: Optional[ColorMap] = None
+                if cmp_file_path is None and read_header(f).color_info.color_mode == ColorMode.Indexed:
+                    cmp_member = find_gob_colormap(archive, member)
+                    if cmp_member is None:
+                        raise ImportError('Indexed MAT file requires colormap (CMP) file')
+                    with archive.open(cmp_member) as cf:
+                        cmp = read_colormap_from_file(cf)
+                f.seek(0)
+
+                file_path = os.path.join(os.path.dirname(archive.file_path), gob_path_basename(member))
+                return self.load_from_file(f, file_path, max_cells, load_mipmap_lod_chain, cmp_file_path, load_as_indexed, cancel_cb, cel_loaded_cb, cmp,
+                                           load_as_sprite_sheet, lod_level, max_size)
+        finally:
+            if archive is not gob:
+                archive.close()
+
+    def load_multiple_from_filepaths(self, file_paths: List[str], all_cels: bool = False, jobs: Optional[int] = None,
+                                     cancel_cb: Optional[Callable[[], bool]] = None) -> Tuple[Gimp.Image, List[Tuple[str, str]]]:
+        '''
+        Loads many MAT files into a single image, one layer per file (or per file cel).
+        Files are decoded concurrently in worker processes, the image is sized to fit the largest texture.
+        Returns image and list of (file path, error) of files which failed to load.
+        :param file_paths: paths to the MAT files
+        :param all_cels: Loads every cel texture of file as layer. If false only the first cel is loaded.
+        :param jobs: number of worker processes. Default None, meaning CPU count.
+        :param cancel_cb: Called after every decoded file. If it returns True or GIMP doesn't accept progress update loading is stopped,
+                          the partially loaded image is deleted and MatLoadCancelled is raised.
+        '''
+        Gimp.progress_init(f'Loading {len(file_paths)} MAT images')
+        img = Gimp.Image.new(1, 1, Gimp.ImageBaseType.RGB)
+        errors: List[Tuple[str, str]] = []
+
+        try:
+            results = _decode_mat_files(file_paths, -1 if all_cels else 1, jobs)
+            for idx, (file_path, (cels, error)) in enumerate(zip(file_paths, results)):
+                if error:
+                    errors.append((file_path, error))
+
+                name = os.path.basename(file_path)
+                for cel_idx, (mm, mipmap_levels) in enumerate(cels):
+                    l = MAT._add_layer(img, mm.pixel_data_array[0], mm.width, mm.height, mm.color_info)
+                    l.set_name(f'{name} cel_{cel_idx}' if all_cels and len(cels) > 1 else name)
+                    if len(img.get_layers()) > 1:
+                        l.set_visible(False)
+                    if mipmap_levels > 1:
+                        set_layer_as_mipmap(l, True)
 
-            max_cells = h.cel_count if max_cells < 0 else min(max_cells, h.cel_count)
-            Gimp.progress_update(0 / float(max_cells))
+                if not Gimp.progress_update((idx + 1) / float(len(file_paths))) or (cancel_cb is not None and cancel_cb()):
+                    results.close()
+                    raise MatLoadCancelled('MAT loading was cancelled')
+        except BaseException:
+            img.delete()
+            raise
 
-            # Create a new image
-            img = Gimp.Image.new(1, 1, Gimp.ImageBaseType.RGB)
-            img.set_file(Gio.file_new_for_path(os.path.splitext(file_path)[0]))
+        if not img.get_layers():
+            img.delete()
+            raise ImportError('No textures to load' if not errors else f'{errors[0][0]}: {errors[0][1]}')
 
-            # Read cel textures and add them to the image as layers
-            for cel_idx in range(0, max_cells):
-                # Read Mipmap texture chain
-                Gimp.progress_update(cel_idx / float(max_cells))
-                mm = self._read_texture(f, h.color_info)
+        img.resize_to_layers()
+        sanitize_image(img)
+        return img, errors
 
-                # Add Mipmap textures as layers
-                for lod_num, pixdata in enumerate(mm.pixel_data_array):
-                    lwidth  = mm.width >> lod_num
-                    lheight = mm.height >> lod_num
+    def load_from_file(self, f: BinaryIO, file_path: str, max_cells: int = -1, load_mipmap_lod_chain:bool = False, cmp_file_path: Optional[str] = None, load_as_indexed: bool = False,
+                       cancel_cb: Optional[Callable[[], bool]] = None, cel_loaded_cb: Optional[Callable[[Gimp.Image, int], None]] = None, colormap: Optional[ColorMap] = None,
+                       load_as_sprite_sheet: bool = False, lod_level: int = 0, max_size: int = 0, textures: Optional[List[Mipmap]] = None) -> Gimp.Image:
+        '''
+        Loads MAT from binary file object and returns image.
+        :param f: MAT file object opened for reading
+        :param file_path: path of the MAT file, used for image file name and to find CMP file
+        :param colormap: colormap used to decode indexed (8-bit) MAT. If None, the colormap is read from CMP file.
+        :param textures: already decoded cel textures of file e.g.: by codec worker. If set, the pixel data in file is not decoded.
+        See load_from_filepath for the rest of parameters.
+        '''
+        Gimp.progress_init(f'Loading MAT image')
 
-                    # Add layer to image
-                    l: Gimp.Layer = MAT._add_layer(img, pixdata, lwidth, lheight, mm.color_info)
-                    l.set_name(self._get_layer_name(cel_idx, lod_num))
+        # Read MAT header and records
+        h, r = read_header_and_records(f)
 
-                    # Hide hide layer if it is not the first cel
-                    if cel_idx > 0:
-                        l.set_visible(False)
+        # Indexed MAT requires colormap to decode pixels
+        cmp: Optional[ColorMap] = colormap
+        if h.color_info.color_mode == ColorMode.Indexed and cmp is None:
+            if cmp_file_path is None:
+                cmp_file_path = find_colormap(file_path)
+            if cmp_file_path is None:
+                raise ImportError('Indexed MAT file requires colormap (CMP) file')
+            cmp = read_colormap(cmp_file_path)
 
-                    if lod_num == 0 and len(mm.pixel_data_array) > 1:
-                        set_layer_as_mipmap(l, True)
+        max_cells = h.cel_count if max_cells < 0 else min(max_cells, h.cel_count)
+        Gimp.progress_update(0 / float(max_cells))
 
-                    # Skip loading LOD images?
-                    if not load_mipmap_lod_chain:
-                        break
+        # Decoded textures are not used if file changed since
+        if textures is not None and len(textures) != max_cells:
+            textures = None
 
-            # Set image size and sanitize it
-            img.resize_to_layers()
-            sanitize_image(img)
-            return img
+        # Load only single stored LOD level of cel textures?
+        reduced = lod_level > 0 or max_size > 0
+        view: Optional[ReducedView] = None
 
-    def save_to_filepath(self, file_path: str, img: Gimp.Image, cf: ColorFormat, lod_min_size: int = 8, lod_max_levels: int = 4):
+        grid: Optional[SpriteSheetGrid] = None
+        if load_as_sprite_sheet and max_cells > 0:
+            grid = MAT._get_sprite_sheet_grid(f, h, max_cells, load_mipmap_lod_chain and not reduced, lod_level, max_size)
+
+        # Create a new image
+        img = Gimp.Image.new(1, 1, Gimp.ImageBaseType.RGB)
+        img.set_file(Gio.file_new_for_path(os.path.splitext(file_path)[0]))
+
+        try:
+            sheet: Optional[Gimp.Layer] = None
+            if grid is not None:
+                sheet = MAT._add_sprite_sheet_layer(img, grid, h.color_info)
+
+            # Read cel textures and add them to the image as layers
+            for cel_idx in range(0, max_cells):
+                def update_progress(fraction: float, cel_idx=cel_idx):
+                    if (cancel_cb is not None and cancel_cb()) or not Gimp.progress_update((cel_idx + fraction) / float(max_cells)):
+                        raise MatLoadCancelled('MAT loading was cancelled')
+
+                # Read Mipmap texture chain or only the single LOD level of reduced view
+                update_progress(0.0)
+                if reduced:
+                    mm, mmh, lod_start = read_texture_lod(f, h.color_info, lod_level, max_size, cmp, update_progress)
+                    is_mipmap = mmh.mipmap_levels > 1
+                    if lod_start > 0 and view is None:
+                        view = ReducedView(lod_start, mmh.width, mmh.height)
+                else:
+                    mm = textures[cel_idx] if textures is not None else read_texture(f, h.color_info, cmp, update_progress)
+                    is_mipmap = len(mm.pixel_data_array) > 1
+                    lod_start = 0
+
+                # Add Mipmap textures to sprite sheet or as layers
+                if sheet is not None:
+                    MAT._set_sprite_sheet_cel(sheet, grid, cel_idx, mm)
+                    if is_mipmap and not is_layer_mipmap(sheet):
+                        set_layer_as_mipmap(sheet, True)
+                else:
+                    for lod_num, pixdata in enumerate(mm.pixel_data_array):
+                        lwidth  = mm.width >> lod_num
+                        lheight = mm.height >> lod_num
+
+                        # Add layer to image
+                        l: Gimp.Layer = MAT._add_layer(img, pixdata, lwidth, lheight, mm.color_info)
+                        l.set_name(self._get_layer_name(cel_idx, lod_start + lod_num))
+
+                        # Hide hide layer if it is not the first cel
+                        if cel_idx > 0:
+                            l.set_visible(False)
+
+                        if lod_num == 0 and is_mipmap:
+                            set_layer_as_mipmap(l, True)
+
+                        # Skip loading LOD images?
+                        if not load_mipmap_lod_chain:
+                            break
+
+                if cel_loaded_cb is not None:
+                    if cel_idx == 0:
+                        img.resize_to_layers()
+                    cel_loaded_cb(img, cel_idx)
+        except BaseException:
+            # Don't leave half-built image behind
+            img.delete()
+            raise
+
+        # Set image size and sanitize it
+        img.resize_to_layers()
+        if view is not None:
+            set_image_reduced_view(img, view)
+        if cmp is not None and load_as_indexed:
+            MAT._convert_to_indexed(img, cmp, os.path.basename(cmp_file_path) if cmp_file_path else 'MAT colormap')
+        sanitize_image(img)
+        return img
+
+    def save_to_filepath(self, file_path: str, img: Gimp.Image, cf: ColorFormat, lod_min_size: int = 8, lod_max_levels: int = 4, encoded_cache: Optional[Dict[int, bytes]] = None,
+                         slice_sprite_sheets: bool = True, dither: DitherMode = DitherMode.NONE, verify: bool = False):
         '''
         Save MAT to file.
         :param file_path: file path where to save MAT
@@ -179,273 +330,264 @@ class MAT:
         :param cf: The color format to encode texture bitmap
         :param lod_min_size: minimum MipMap LOD image size
         :param lod_max_levels: maximum number of MipMap levels
+        :param encoded_cache: already encoded (and dithered) LOD 0 pixel data in color format cf, keyed by layer ID
+        :param slice_sprite_sheets: export every cel of sprite sheet layer as separate cel texture.
+                                    If False sprite sheet layer is exported as a single texture.
+        :param dither: dither mode applied to every LOD level when encoding to color format cf
+        :param verify: read written file back and check its layout and that every cel LOD level decodes to the exported pixels
+                       quantized to color format cf. Raises MatVerifyError if file doesn't match.
         '''
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        with open(file_path, 'wb') as f:
-            layers    = img.get_layers()
-            cel_count = len(layers)
-
-            # Show progress
-            Gimp.progress_init(f'Exporting {cel_count} image {"layer" if cel_count == 1 else "layers"} to MAT')
-
-            self._write_header(f, cel_count, cf)
-            self._write_records(f, cel_count)
-
-            for idx, l in enumerate(reversed(layers)):
-                self.write_texture(f, l, cf, lod_min_size, lod_max_levels)
-                Gimp.progress_update(idx / float(cel_count))
-
-    @staticmethod
-    def _read_header(f: BinaryIO) -> MatHeader:
-        """Read MAT header from file"""
-        rh = bytearray(f.read(mh_serf.size))
-        rcf = bytearray(f.read(cf_serf.size))
-
-        deser_mh = mh_serf.unpack(rh)
-        cf = ColorFormat._make(cf_serf.unpack(rcf))
-
-        h = MatHeader(deser_mh[0], deser_mh[1], deser_mh[2], deser_mh[3], deser_mh[4], cf)
-        if h.magic != MAT_FILE_MAGIC:
-            raise ImportError('Invalid MAT file')
-        if h.version != MAT_REQUIRED_VERSION:
-            raise ImportError('Invalid MAT file version')
-        if h.type != MatType.Texture:
-            raise ImportError('Invalid MAT file type')
-        if h.record_count != h.cel_count:
-            raise ImportError('Cannot read older version of MAT file')
-        if h.record_count <= 0:
-            raise ImportError('MAT file record count <= 0')
-        if not (ColorMode.Indexed < h.color_info.color_mode <= ColorMode.RGBA):  # must not be indexed color mode (0)
-            raise ImportError('Invalid color mode')
-        if h.color_info.bpp % 8 != 0 and not (16 <= h.color_info.bpp <= 32):
-            raise ImportError('Invalid color depth')
-        return h
+        self.save_to_filepaths([(file_path, cf)], img, lod_min_size, lod_max_levels, [encoded_cache], slice_sprite_sheets, dither, verify)
 
-    @staticmethod
-    def _write_header(f: BinaryIO, cel_count: int, cf: ColorFormat):
-        """Write MAT header to file"""
-        h = MatHeader(MAT_FILE_MAGIC, MAT_REQUIRED_VERSION, MatType.Texture, cel_count, cel_count, cf)
-
-        rh = mh_serf.pack(*h[0:5])  # not including 'color_info' field
-        rcf = cf_serf.pack(*cf)
-        f.write(rh)
-        f.write(rcf)
-
-    @staticmethod
-    def _read_records(f:BinaryIO, h: MatHeader) -> List[MatRecordHeader]:
-        """Read MAT records from file"""
-        rh_list: List[MatRecordHeader] = []
-        for i in range(0, h.record_count):
-            mrh = mrh_serf.unpack(bytearray(f.read(mrh_serf.size)))
-            rh_list.append(MatRecordHeader._make(mrh))
-        return rh_list
-
-    @staticmethod
-    def _write_records(f: BinaryIO, record_count: int):
-        """Write MAT records to file"""
-        record_type = 8
-        for i in range(0, record_count):
-            r = MatRecordHeader(record_type, 0, 0, 0, 0, 0, 0, 0, 0, i)
-            f.write(mrh_serf.pack(*r))
+    def save_to_filepaths(self, targets: List[Tuple[str, ColorFormat]], img: Gimp.Image, lod_min_size: int = 8, lod_max_levels: int = 4,
+                          encoded_caches: Optional[List[Optional[Dict[int, bytes]]]] = None, slice_sprite_sheets: bool = True, dither: DitherMode = DitherMode.NONE,
+                          verify: bool = False):
+        '''
+        Save MAT to several files in one pass, each encoded in its own color format.
+        Pixels and MipMap LOD chain of every layer are fetched and made once, and every target is encoded from them.
+        :param targets: list of (file path, color format) to save MAT to
+        :param encoded_caches: per target encoded_cache, see save_to_filepath
+        See save_to_filepath for the rest of parameters.
+        '''
+        if encoded_caches is None:
+            encoded_caches = [None] * len(targets)
+        if len(encoded_caches) != len(targets):
+            raise ValueError('Number of encoded caches must match the number of targets')
+
+        for file_path, _ in targets:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        layers    = img.get_layers()
+        grids     = [get_layer_sprite_sheet(l) if slice_sprite_sheets else None for l in layers]
+        cel_count = sum(g.cel_count if g is not None else 1 for g in grids)
+
+        # Show progress
+        Gimp.progress_init(f'Exporting {cel_count} image {"layer" if cel_count == 1 else "layers"} to '
+                           + ('MAT' if len(targets) == 1 else f'{len(targets)} MAT files'))
+
+        files: List[BinaryIO] = []
+        try:
+            for file_path, cf in targets:
+                f = open(file_path, 'wb')
+                files.append(f)
+                write_header(f, cel_count, cf)
+                write_records(f, cel_count)
+
+            # Identical cels (e.g. repeated animation frames) are encoded only once.
+            # The value is list of encoded textures per target and pixel data they were encoded from (only for verification).
+            encoded_textures: Dict[bytes, List[Tuple[bytes, Optional[List[bytes]], Optional[bytes]]]] = {}
+            exported: List[List[ExportedTexture]] = [[] for _ in targets]
+            def write_cel_texture(key: bytes, width: int, height: int, px_size: int,
+                                  encode: Callable[[int, ColorFormat], Tuple[bytes, Optional[List[bytes]], Optional[bytes]]]):
+                etexs = encoded_textures.get(key)
+                if etexs is None:
+                    etexs = [encode(t, cf) for t, (_, cf) in enumerate(targets)]
+                    encoded_textures[key] = etexs
+                for t, (f, (etex, elod_pixels, encoded_lod0)) in enumerate(zip(files, etexs)):
+                    f.write(etex)
+                    if verify:
+                        exported[t].append((elod_pixels, width, height, px_size, encoded_lod0))
+
+            idx = 0
+            for l, grid in zip(reversed(layers), reversed(grids)):
+                px_size = l.get_buffer().props.px_size
+                if grid is None:
+                    pixels = MAT._get_buffer_pixels(l.get_buffer())
+                    key    = MAT._get_texture_key([pixels], l.get_width(), l.get_height(), px_size, is_layer_mipmap(l))
+
+                    # LOD chain is made only when the texture is encoded and it's shared by all targets
+                    lod_pixels: List[bytes] = []
+                    def encode_layer(t: int, cf: ColorFormat, l=l, pixels=pixels, lod_pixels=lod_pixels) -> Tuple[bytes, Optional[List[bytes]], Optional[bytes]]:
+                        if not lod_pixels:
+                            lod_pixels += MAT._get_layer_lod_pixels(l, lod_min_size, lod_max_levels, pixels)
+                        cache = encoded_caches[t]
+                        return MAT._encode_lod_pixels(lod_pixels, l.get_width(), l.get_height(), px_size, cf, dither,
+                                                      cache.get(l.get_id()) if cache else None, verify)
+
+                    write_cel_texture(key, l.get_width(), l.get_height(), px_size, encode_layer)
+                    Gimp.progress_update(idx / float(cel_count))
+                    idx += 1
+                    continue
+
+                # Slice sprite sheet into cel textures
+                for cel_idx in range(0, grid.cel_count):
+                    lod_pixels = MAT._get_sprite_sheet_cel_pixels(l.get_buffer(), grid, cel_idx)
+                    key        = MAT._get_texture_key(lod_pixels, grid.cel_width, grid.cel_height, px_size, is_layer_mipmap(l))
+
+                    cel_lod_pixels: List[bytes] = []
+                    def encode_cel(t: int, cf: ColorFormat, l=l, grid=grid, lod_pixels=lod_pixels, cel_lod_pixels=cel_lod_pixels) -> Tuple[bytes, Optional[List[bytes]], Optional[bytes]]:
+                        if not cel_lod_pixels:
+                            cel_lod_pixels += MAT._get_sprite_sheet_cel_lod_pixels(l, grid, lod_min_size, lod_max_levels, lod_pixels)
+                        return MAT._encode_lod_pixels(cel_lod_pixels, grid.cel_width, grid.cel_height, px_size, cf, dither, None, verify)
+
+                    write_cel_texture(key, grid.cel_width, grid.cel_height, px_size, encode_cel)
+                    Gimp.progress_update(idx / float(cel_count))
+                    idx += 1
+        finally:
+            for f in files:
+                f.close()
+
+        if verify:
+            for (file_path, cf), textures in zip(targets, exported):
+                MAT.verify_file(file_path, cf, textures)
 
     @staticmethod
-    def _get_img_row_len(width: int, bpp: int):
-        """Get image row length based on width and bpp"""
-        return int(abs(width) * (bpp / 8))
+    def _encode_lod_pixels(lod_pixels: List[bytes], width: int, height: int, px_size: int, cf: ColorFormat, dither: DitherMode,
+                           encoded_lod0: Optional[bytes], verify: bool) -> Tuple[bytes, Optional[List[bytes]], Optional[bytes]]:
+        '''
+        Encode pixel data of LOD chain to MAT texture.
+        If verify is True, also returns the pixel data which was encoded, i.e. dithered pixel data, so it's not dithered again when file is verified,
+        and encoded_lod0. LOD 0 is not dithered when encoded_lod0 is given, written LOD 0 is verified against encoded_lod0 instead.
+        '''
+        if not verify:
+            return encode_lod_pixel_data(lod_pixels, width, height, px_size, cf, dither, encoded_lod0), None, None
+        if dither != DitherMode.NONE:
+            lod_pixels = [pixels if level == 0 and encoded_lod0 is not None else dither_pixel_data(pixels, width >> level, height >> level, px_size, cf, dither)
+                          for level, pixels in enumerate(lod_pixels)]
+        return encode_lod_pixel_data(lod_pixels, width, height, px_size, cf, DitherMode.NONE, encoded_lod0), lod_pixels, encoded_lod0
 
     @staticmethod
-    def _get_pixel_data_size(width: int, height: int, bpp: int):
-        """Get pixel data size based on width, height and bpp"""
-        return int(abs(width * height) * (bpp / 8))
+    def verify_file(file_path: str, cf: ColorFormat, textures: List[ExportedTexture]):
+        '''
+        Verify MAT file written by export.
+        Header and texture layout are read without reading the pixel data and checked against exported textures,
+        then pixel data of every cel LOD level is decoded and compared to exported pixels quantized to color format cf.
+        Raises MatVerifyError if file doesn't match.
+        :param textures: exported cel textures in file order
+        '''
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise MatVerifyError(f"Exported MAT file '{file_path}' is empty")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                try:
+                    h, _ = read_header_and_records(data)
+                    layouts = get_texture_layouts(data, h, data.tell())
+                except ImportError as e:
+                    raise MatVerifyError(f"Exported MAT file '{file_path}' is invalid: {e}")
+
+                if h.color_info != cf or h.cel_count != len(textures):
+                    raise MatVerifyError(f"Exported MAT file '{file_path}' header doesn't match the exported image")
+                end = layouts[-1].end if layouts else data.tell()
+                if end != len(data):
+                    raise MatVerifyError(f"Exported MAT file '{file_path}' size {len(data)} doesn't match expected size {end}")
+
+                for cel_idx, (layout, (lod_pixels, width, height, px_size, encoded_lod0)) in enumerate(zip(layouts, textures)):
+                    mmh = layout.header
+                    if (mmh.width, mmh.height, mmh.mipmap_levels) != (width, height, len(lod_pixels)):
+                        raise MatVerifyError(f"Exported MAT file '{file_path}' cel {cel_idx} texture size or mipmap levels mismatch")
+                    for level, pixels in enumerate(lod_pixels):
+                        offset = layout.lod_offset(level)
+                        pd = data[offset: offset + layout.lod_sizes[level]]
+                        if level == 0 and encoded_lod0 is not None:
+                            matches = pd == encoded_lod0
+                        else:
+                            matches = verify_pixel_data(pd, pixels, width >> level, height >> level, px_size, cf)
+                        if not matches:
+                            raise MatVerifyError(f"Exported MAT file '{file_path}' cel {cel_idx} LOD {level} pixel data mismatch")
 
     @staticmethod
-    def _get_encoded_pixel_size(bpp: int):
-
-        return int(bpp / 8)
+    def _get_buffer_pixels(buffer: Gegl.Buffer) -> bytes:
+        """Get pixel data of the whole buffer in buffer format"""
+        rect = Gegl.Rectangle.new(0, 0, buffer.props.width, buffer.props.height)
+        return buffer.get(rect, 1.0, None, Gegl.AbyssPolicy.NONE)
 
     @staticmethod
-    def _get_decoded_pixel_size(ci: ColorFormat) -> int:
-        """Get decoded pixel size based on color format"""
-        return 4 if ci.alpha_bpp != 0 else 3
+    def _get_texture_key(lod_pixels: List[bytes], width: int, height: int, px_size: int, is_mipmap: bool) -> bytes:
+        """Get key which identifies encoded texture, i.e.: hash of texture pixels (of all given LOD levels), size and mipmap flag"""
+        h = hashlib.blake2b(digest_size=32)
+        for pixels in lod_pixels:
+            h.update(pixels)
+        h.update(pack('<iii?i', width, height, px_size, is_mipmap, len(lod_pixels)))
+        return h.digest()
 
     @staticmethod
-    def _get_color_mask(bpc: int) -> int:
-        return 0xFFFFFFFF >> (32 - bpc)
-    
-    @staticmethod
-    def _scale_color_component(cc: int, src_bpp: int, delta_bpp: int) -> int:
-        """Scale a color component from src_bpp to dest_bpp (where delta_bpp = src_bpp - dest_bpp)"""
-        if delta_bpp <= 0:  # Upscale
-            # Calculate bit pattern to fill in lower bits for better upscaling
-            d_src_bpp = src_bpp + delta_bpp
-            main_shift = cc << -delta_bpp
-            
-            if d_src_bpp >= 0:
-                # Take the highest bits from source and use them for the lower bits
-                fill_pattern = cc >> d_src_bpp
-            else:
-                # For very large bit depth increases, replicate the pattern
-                fill_pattern = cc * ((1 << -delta_bpp) - 1)
-                
-            return main_shift | fill_pattern
-        else:  # Downscale
-            return cc >> delta_bpp
-    
-    @staticmethod
-    def _decode_pixel(p: int, ci: ColorFormat, rmask: int, gmask: int, bmask: int, amask: int) -> array[int]:
-        """Decode pixel data from integer"""
-
-        r = ((p >> ci.red_shl) & rmask)
-        g = ((p >> ci.green_shl) & gmask)
-        b = ((p >> ci.blue_shl) & bmask)
-        
-        # Set pixel tuple
-        # Note, 8 is bpp for decoded pixel
-        dp = (
-            MAT._scale_color_component(r, ci.red_bpp  , ci.red_bpp - 8),
-            MAT._scale_color_component(g, ci.green_bpp, ci.green_bpp - 8),
-            MAT._scale_color_component(b, ci.blue_bpp , ci.blue_bpp - 8)
-        )
-        
-        if ci.alpha_bpp != 0:
-            a = ((p >> ci.alpha_shl) & amask)
-            a = MAT._scale_color_component(a, ci.alpha_bpp, ci.alpha_bpp - 8)
-            dp = dp + (a,)
-
-        return array('B', dp)
+    def _get_sprite_sheet_cel_pixels(buffer: Gegl.Buffer, grid: SpriteSheetGrid, cel_idx: int) -> List[bytes]:
+        """Get pixel data of every LOD level of sprite sheet cel in buffer format"""
+        lod_pixels = []
+        for lod_num in range(0, grid.lod_count):
+            x, y, width, height = get_sprite_sheet_lod_rect(grid, cel_idx, lod_num)
+            lod_pixels.append(buffer.get(Gegl.Rectangle.new(x, y, width, height), 1.0, None, Gegl.AbyssPolicy.NONE))
+        return lod_pixels
 
     @staticmethod
-    def _encode_pixel(p: array[int], ci: ColorFormat) -> int:
-        """Encode pixel data to integer"""
-        r = p[0]
-        g = p[1]
-        b = p[2]
-
-        e_p = ((r >> ci.red_shr) << ci.red_shl) | \
-              ((g >> ci.green_shr) << ci.green_shl) | \
-              ((b >> ci.blue_shr) << ci.blue_shl)
-
-        if ci.alpha_bpp != 0:
-            a    = p[3] if len(p) == 4 else 255
-            e_p |= ((a >> ci.alpha_shr) << ci.alpha_shl)
-
-        return int(e_p)
+    def total_mipmap_bytes(width: int, height: int, bytes_per_texel: int, levels: int) -> int:
+        r = 1/4
+        geom_factor = (1 - r**levels) / (1 - r)
+        return int(width * height * bytes_per_texel * geom_factor)
 
     @staticmethod
-    def _decode_pixel_data(pd: memoryview, width: int, height: int, ci: ColorFormat) -> array[int]:
-        """Decode pixel data from byte array"""
-        e_pixel_size = MAT._get_encoded_pixel_size(ci.bpp)
-        e_row_len    = MAT._get_img_row_len(width, ci.bpp)
-        d_pixel_size = MAT._get_decoded_pixel_size(ci)
-        d_row_len    = d_pixel_size * width
-        dpd          = array('B', bytes(height * d_row_len))
-
-        rmask = MAT._get_color_mask(ci.red_bpp)
-        gmask = MAT._get_color_mask(ci.green_bpp)
-        bmask = MAT._get_color_mask(ci.blue_bpp)
-        amask = MAT._get_color_mask(ci.alpha_bpp)
-
-        for r in range(0, height):
-            e_row_idx = r * e_row_len
-            d_row_idx = r * d_row_len
-            for c in range(0, e_row_len, e_pixel_size):
-                # decode pixel as little endian integer
-                pixel: int = 0
-                i = c + e_row_idx
-                for b in reversed(pd[i: i + e_pixel_size]):
-                    pixel = pixel << 8 | b
-
-                d_pos = (c // e_pixel_size) * d_pixel_size + d_row_idx
-                dpd[d_pos: (d_pos + d_pixel_size)] = MAT._decode_pixel(pixel, ci, rmask, gmask, bmask, amask)
-        return dpd
+    def estimate_file_size(textures: List[Tuple[int, int, bool]], cf: ColorFormat, lod_min_size: int, lod_max_levels: int) -> int:
+        """
+        Estimate MAT file size.
+        :param textures: list of (width, height, is_mipmap) for each cel texture
+        :param cf: The color format to encode texture bitmap
+        :param lod_min_size: minimum MipMap LOD image size
+        :param lod_max_levels: maximum number of MipMap levels
+        """
+        size = mh_serf.size + cf_serf.size + mrh_serf.size * len(textures)
+        for width, height, is_mipmap in textures:
+            levels = get_mipmap_level_count(width, height, lod_min_size, lod_max_levels) if is_mipmap else 1
+            size  += mmm_serf.size + MAT.total_mipmap_bytes(width, height, get_encoded_pixel_size(cf.bpp), levels)
+        return size
 
     @staticmethod
-    def _encode_pixel_buffer(buffer: Gegl.Buffer, ci: ColorFormat) -> array[int]:
-        """Encode pixel buffer to byte array"""
-        width: int        = buffer.props.width
-        height: int       = buffer.props.height
-        bpp: int          = buffer.props.px_size
-        row_len: int      = width * bpp
-        e_pixel_size: int = MAT._get_encoded_pixel_size(ci.bpp)
-        e_row_len: int    = e_pixel_size * width
-        epd: array[int]   = array('B', bytes(height * e_row_len))
-
-        # encode pixel as little endian
-        fmt = 'B' if e_pixel_size == 1 else '<H' if e_pixel_size == 2 else '<I'
-
-        rect               = Gegl.Rectangle.new(0, 0, width, height)
-        img_data: str      = buffer.get(rect, 1.0, None, Gegl.AbyssPolicy.NONE)
-        pixels: array[int] = array('B', map(int, img_data))
-
-        for y in range(0, height):
-            row_idx = y * row_len
-            for x in range(0, width):
-                p_ofs = x * bpp + row_idx
-                p     = pixels[p_ofs: p_ofs + bpp]  # get pixel. bpp is bytes per pixel
-                
-                e_p = MAT._encode_pixel(p, ci)
-                e_p = array('B', pack(fmt, e_p))
-                if e_pixel_size == 3:
-                    e_p = e_p[:3]
-
-                e_pos = x * e_pixel_size + y * e_row_len
-                epd[e_pos: (e_pos + e_pixel_size)] = e_p
-        return epd
+    def _get_layer_lod_pixels(layer: Gimp.Layer, min_mipmap_size: int, max_mipmap_levels: int, pixels: Optional[bytes] = None) -> List[bytes]:
+        """
+        Get pixel data of layer and its MipMap LOD levels in layer buffer format.
+        LOD levels are made only if layer is mipmap.
+        :param pixels: already fetched pixel data of layer buffer. If None pixel data is fetched from layer.
+        """
+        if pixels is None:
+            pixels = MAT._get_buffer_pixels(layer.get_buffer())
+
+        lod_pixels = [pixels]
+        if is_layer_mipmap(layer):
+            lod_pixels += [MAT._get_buffer_pixels(b) for b in make_mipmap_lods(layer, min_mipmap_size, max_mipmap_levels -1 if max_mipmap_levels >= 0 else -1)]
+        return lod_pixels
 
     @staticmethod
-    def total_mipmap_bytes(width: int, height: int, bytes_per_texel: int, levels: int) -> int:
-        r = 1/4
-        geom_factor = (1 - r**levels) / (1 - r)
-        return int(width * height * bytes_per_texel * geom_factor)
-
+    def _get_sprite_sheet_cel_lod_pixels(layer: Gimp.Layer, grid: SpriteSheetGrid, min_mipmap_size: int, max_mipmap_levels: int, lod_pixels: List[bytes]) -> List[bytes]:
+        """
+        Get pixel data of every MipMap LOD level of sprite sheet cel.
+        If sprite sheet holds all required LOD levels they are used, otherwise LOD levels are made from cel image with box filter.
+        :param lod_pixels: pixel data of cel LOD levels stored in sprite sheet
+        """
+        width, height = grid.cel_width, grid.cel_height
+        levels = get_mipmap_level_count(width, height, min_mipmap_size, max_mipmap_levels) if is_layer_mipmap(layer) else 1
+        if levels > len(lod_pixels):
+            return make_lod_pixel_data(lod_pixels[0], width, height, layer.get_buffer().props.px_size, levels)
+        return lod_pixels[:levels]
 
     @staticmethod
-    def _read_texture(f: BinaryIO, ci: ColorFormat) -> Mipmap:
-        """Read texture from MAT file"""
-        mmh_raw = mmm_serf.unpack(bytearray(f.read(mmm_serf.size)))
-        mmh = MatMipmapHeader._make(mmh_raw)
-
-        # Calculate total mipmap pixel data size
-        sizes = [
-            MAT._get_pixel_data_size(mmh.width >> i, mmh.height >> i, ci.bpp)
-            for i in range(mmh.mipmap_levels)
-        ]
-
-        # Read in mipmap pixel data
-        raw_mipmap = bytearray(f.read(sum(sizes)))
-
-        # Decode mipmap pixel data
-        offset = 0
-        pd: List[Any]  = []
-        for size, level in zip(sizes, range(mmh.mipmap_levels)):
-            mv = memoryview(raw_mipmap)[offset: offset + size]
-            pd.append(MAT._decode_pixel_data(mv, mmh.width >> level, mmh.height >> level, ci))
-            offset += size
-        return Mipmap(mmh.width, mmh.height, ci, pd)
+    def encode_texture(layer: Gimp.Layer, ci: ColorFormat, min_mipmap_size: int, max_mipmap_levels: int, pixels: Optional[bytes] = None, encoded_pixels: Optional[bytes] = None,
+                       dither: DitherMode = DitherMode.NONE) -> bytes:
+        """
+        Encode layer to MAT texture, i.e.: mipmap header followed by pixel data of all LOD levels.
+        :param pixels: already fetched pixel data of layer buffer. If None pixel data is fetched from layer.
+        :param encoded_pixels: already encoded LOD 0 pixel data. If None pixel data is encoded.
+        :param dither: dither mode applied to every LOD level
+        """
+        lod_pixels = MAT._get_layer_lod_pixels(layer, min_mipmap_size, max_mipmap_levels, pixels)
+        return encode_lod_pixel_data(lod_pixels, layer.get_width(), layer.get_height(), layer.get_buffer().props.px_size, ci, dither, encoded_pixels)
 
     @staticmethod
-    def _write_pixel_data(f: BinaryIO, pixels: Gegl.Buffer, ci):
-        epd = MAT._encode_pixel_buffer(pixels, ci)
-        f.write(epd)
+    def encode_sprite_sheet_cel(layer: Gimp.Layer, grid: SpriteSheetGrid, cel_idx: int, ci: ColorFormat, min_mipmap_size: int, max_mipmap_levels: int,
+                                lod_pixels: Optional[List[bytes]] = None, dither: DitherMode = DitherMode.NONE) -> bytes:
+        """
+        Encode cel of sprite sheet layer to MAT texture.
+        If sprite sheet holds all required LOD levels they are used, otherwise LOD levels are made from cel image with box filter.
+        :param lod_pixels: already fetched pixel data of cel LOD levels. If None pixel data is fetched from layer.
+        """
+        if lod_pixels is None:
+            lod_pixels = MAT._get_sprite_sheet_cel_pixels(layer.get_buffer(), grid, cel_idx)
+        lod_pixels = MAT._get_sprite_sheet_cel_lod_pixels(layer, grid, min_mipmap_size, max_mipmap_levels, lod_pixels)
+        return encode_lod_pixel_data(lod_pixels, grid.cel_width, grid.cel_height, layer.get_buffer().props.px_size, ci, dither)
 
     @staticmethod
     def write_texture(f: BinaryIO, layer: Gimp.Layer, ci: ColorFormat, min_mipmap_size: int, max_mipmap_levels: int):
         """Write texture to MAT file"""
-
-        # Get the buffer from the layer
-        pixels = layer.get_buffer()
-
-        lod_pixels: List[Gegl.Buffer] = [pixels]
-        if is_layer_mipmap(layer):
-            lod_pixels += make_mipmap_lods(layer, min_mipmap_size, max_mipmap_levels -1 if max_mipmap_levels >= 0 else -1)
-
-        mmh = MatMipmapHeader(layer.get_width(), layer.get_height(), 0, 0, 0, len(lod_pixels))
-        f.write(mmm_serf.pack(*mmh))
-
-        for idx, pixels in enumerate(lod_pixels):
-            MAT._write_pixel_data(f, pixels, ci)
+        f.write(MAT.encode_texture(layer, ci, min_mipmap_size, max_mipmap_levels))
 
     @staticmethod
     def _get_layer_name(cel_idx: int, lod_num: int) -> str:
@@ -454,6 +596,21 @@ class MAT:
             name += '_lod_' + str(lod_num)
         return name
 
+    @staticmethod
+    def _convert_to_indexed(img: Gimp.Image, cmp: ColorMap, palette_name: str):
+        """
+        Convert image to GIMP indexed image using colormap palette.
+        Note, the pixels of image must be already decoded with the same palette,
+              so the conversion is lossless.
+        """
+        palette = Gimp.Palette.new(palette_name)
+        for idx in range(0, len(cmp.palette) // 3):
+            r, g, b = cmp.palette[idx * 3: idx * 3 + 3]
+            palette.add_entry(str(idx), Gegl.Color.new(f'#{r:02x}{g:02x}{b:02x}'))
+
+        img.convert_indexed(Gimp.ConvertDitherType.NONE, Gimp.ConvertPaletteType.CUSTOM, 256, False, False, palette)
+        palette.delete()
+
     @staticmethod
     def _add_layer(img: Gimp.Image, pixdata, width: int, height: int, ci: ColorFormat) -> Gimp.Layer:
         """ Add a new layer to the image with the given pixel data. """
@@ -480,3 +637,49 @@ class MAT:
         img.insert_layer(layer, None, -1)  # None for parent, -1 for position (top)
 
         return layer
+
+    @staticmethod
+    def _get_sprite_sheet_grid(f: BinaryIO, h: MatHeader, cel_count: int, load_mipmap_lod_chain: bool, lod_level: int = 0, max_size: int = 0) -> SpriteSheetGrid:
+        """
+        Get sprite sheet grid for cel textures of MAT file. Grid is made close to square.
+        If lod_level or max_size is set, grid cell is sized to the LOD level which is loaded (see get_texture_lod_level).
+        File must be positioned at the first texture, the position is restored after mipmap headers are read.
+        """
+        pos  = f.tell()
+        mmhs = read_mipmap_headers(f, h)[:cel_count]
+        f.seek(pos)
+
+        levels = [get_texture_lod_level(mmh, lod_level, max_size) for mmh in mmhs]
+        sizes  = [(mmh.width >> lvl, mmh.height >> lvl) for mmh, lvl in zip(mmhs, levels)]
+        width, height = sizes[0]
+        if any(size != (width, height) for size in sizes):
+            raise ImportError('Sprite sheet requires all MAT cel textures to be of equal size')
+
+        lod_count = max(mmh.mipmap_levels for mmh in mmhs) if load_mipmap_lod_chain else 1
+        columns   = 1
+        while columns * columns < cel_count:
+            columns += 1
+        return SpriteSheetGrid(columns, cel_count, width, height, lod_count)
+
+    @staticmethod
+    def _add_sprite_sheet_layer(img: Gimp.Image, grid: SpriteSheetGrid, ci: ColorFormat) -> Gimp.Layer:
+        """Add a new empty sprite sheet layer to the image. Indexed textures can be transparent, so the layer has alpha channel."""
+        width, height = get_sprite_sheet_size(grid)
+        has_alpha  = ci.alpha_bpp != 0 or ci.color_mode == ColorMode.Indexed
+        layer_type = Gimp.ImageType.RGBA_IMAGE if has_alpha else Gimp.ImageType.RGB_IMAGE
+
+        layer = Gimp.Layer.new(img, 'sprite_sheet', width, height, layer_type, 100.0, Gimp.LayerMode.NORMAL)
+        img.insert_layer(layer, None, -1)
+        if has_alpha:
+            layer.fill(Gimp.FillType.TRANSPARENT)
+        set_layer_sprite_sheet(layer, grid)
+        return layer
+
+    @staticmethod
+    def _set_sprite_sheet_cel(layer: Gimp.Layer, grid: SpriteSheetGrid, cel_idx: int, mm: Mipmap):
+        """Write cel texture and its LOD images to sprite sheet grid cell"""
+        format = "R~G~B~A u8" if mm.color_info.alpha_bpp != 0 else "R~G~B~ u8"
+        buffer = layer.get_buffer()
+        for lod_num, pixdata in enumerate(mm.pixel_data_array[:grid.lod_count]):
+            x, y, width, height = get_sprite_sheet_lod_rect(grid, cel_idx, lod_num)
+            buffer.set(Gegl.Rectangle.new(x, y, width, height), format, pixdata)
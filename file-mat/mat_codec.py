@@ -0,0 +1,612 @@
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from colormap import *
+from mat_format import *
+
+from array import array
+from enum import IntEnum
+from typing import List, BinaryIO, NamedTuple, Any, Optional, Callable, Generator, Tuple
+
+
+MAT_DECODE_STRIP_ROWS = 64 # number of pixel rows decoded between progress updates
+MAT_DITHER_STRIP_ROWS = 16 # number of pixel rows error diffused between yields of iter_dither_pixel_data
+
+class DitherMode(IntEnum):
+    NONE            = 0
+    ORDERED         = 1 # 4x4 Bayer matrix
+    ERROR_DIFFUSION = 2 # error diffused to the next row
+
+BAYER_MATRIX_4X4 = (
+    ( 0,  8,  2, 10),
+    (12,  4, 14,  6),
+    ( 3, 11,  1,  9),
+    (15,  7, 13,  5),
+)
+
+class Mipmap(NamedTuple):
+    width: int
+    height: int
+    color_info: ColorFormat
+    pixel_data_array: List[Any]
+
+
+def get_color_mask(bpc: int) -> int:
+    return 0xFFFFFFFF >> (32 - bpc)
+
+def scale_color_component(cc: int, src_bpp: int, delta_bpp: int) -> int:
+    """Scale a color component from src_bpp to dest_bpp (where delta_bpp = src_bpp - dest_bpp)"""
+    if delta_bpp <= 0:  # Upscale
+        # Calculate bit pattern to fill in lower bits for better upscaling
+        d_src_bpp = src_bpp + delta_bpp
+        main_shift = cc << -delta_bpp
+
+        if d_src_bpp >= 0:
+            # Take the highest bits from source and use them for the lower bits
+            fill_pattern = cc >> d_src_bpp
+        else:
+            # For very large bit depth increases, replicate the pattern
+            fill_pattern = cc * ((1 << -delta_bpp) - 1)
+
+        return main_shift | fill_pattern
+    else:  # Downscale
+        return cc >> delta_bpp
+
+def decode_pixel(p: int, ci: ColorFormat, rmask: int, gmask: int, bmask: int, amask: int) -> array[int]:
+    """Decode pixel data from integer"""
+
+    r = ((p >> ci.red_shl) & rmask)
+    g = ((p >> ci.green_shl) & gmask)
+    b = ((p >> ci.blue_shl) & bmask)
+
+    # Set pixel tuple
+    # Note, 8 is bpp for decoded pixel
+    dp = (
+        scale_color_component(r, ci.red_bpp  , ci.red_bpp - 8),
+        scale_color_component(g, ci.green_bpp, ci.green_bpp - 8),
+        scale_color_component(b, ci.blue_bpp , ci.blue_bpp - 8)
+    )
+
+    if ci.alpha_bpp != 0:
+        a = ((p >> ci.alpha_shl) & amask)
+        a = scale_color_component(a, ci.alpha_bpp, ci.alpha_bpp - 8)
+        dp = dp + (a,)
+
+    return array('B', dp)
+
+def encode_pixel(p: array[int], ci: ColorFormat) -> int:
+    """Encode pixel data to integer"""
+    r = p[0]
+    g = p[1]
+    b = p[2]
+
+    e_p = ((r >> ci.red_shr) << ci.red_shl) | \
+          ((g >> ci.green_shr) << ci.green_shl) | \
+          ((b >> ci.blue_shr) << ci.blue_shl)
+
+    if ci.alpha_bpp != 0:
+        a    = p[3] if len(p) == 4 else 255
+        e_p |= ((a >> ci.alpha_shr) << ci.alpha_shl)
+
+    return int(e_p)
+
+def decode_pixel_data(pd: memoryview, width: int, height: int, ci: ColorFormat, progress_cb: Optional[Callable[[float], None]] = None) -> array[int]:
+    """
+    Decode pixel data from byte array.
+    Pixel data is decoded in strips of MAT_DECODE_STRIP_ROWS rows, color channels of every strip are decoded
+    over the whole strip (see decode_pixel_channels) and interleaved to decoded pixels.
+    progress_cb is called with the fraction of decoded rows before every strip.
+    """
+    e_row_len    = get_img_row_len(width, ci.bpp)
+    d_pixel_size = get_decoded_pixel_size(ci)
+    d_row_len    = d_pixel_size * width
+    dpd          = bytearray(height * d_row_len)
+
+    for r in range(0, height, MAT_DECODE_STRIP_ROWS):
+        if progress_cb is not None:
+            progress_cb(r / float(height))
+
+        rows     = min(MAT_DECODE_STRIP_ROWS, height - r)
+        channels = decode_pixel_channels(pd[r * e_row_len: (r + rows) * e_row_len], width, rows, ci)
+        d_pos    = r * d_row_len
+        for c, channel in enumerate(channels):
+            dpd[d_pos + c: d_pos + rows * d_row_len: d_pixel_size] = channel
+    return array('B', dpd)
+
+def decode_indexed_pixel_data(pd: memoryview, width: int, height: int, cmp: ColorMap, transparent_idx: Optional[int] = None) -> array[int]:
+    """
+    Decode 8-bit indexed pixel data to RGB(A) using colormap palette.
+    Each color channel is expanded with a single translate over the whole buffer.
+    If transparent_idx is not None pixels with this color index are made transparent.
+    """
+    indices      = bytes(pd[:width * height])
+    d_pixel_size = 3 if transparent_idx is None else 4
+    dpd          = bytearray(len(indices) * d_pixel_size)
+
+    for c in range(0, 3):
+        dpd[c::d_pixel_size] = indices.translate(cmp.channel_table(c))
+
+    if transparent_idx is not None:
+        alpha_table = bytearray(b'\xFF' * 256)
+        alpha_table[transparent_idx & 0xFF] = 0
+        dpd[3::d_pixel_size] = indices.translate(alpha_table)
+    return array('B', dpd)
+
+def get_quantize_table(bpc: int, shr: int) -> bytes:
+    """
+    Returns 256 byte translation table which maps 8-bit color component value
+    to the value after it's encoded to bpc bits and decoded back.
+    If bpc is 0 (e.g. no alpha channel) every value is mapped to 255.
+    """
+    if bpc == 0:
+        return b'\xFF' * 256
+    return bytes(scale_color_component(v >> shr, bpc, bpc - 8) for v in range(256))
+
+def _get_pixel_channels(pixels, width: int, height: int, bpp: int) -> List[bytes]:
+    """
+    Split RGB(A) pixel data into 4 color channels (R, G, B, A).
+    If pixel data has no alpha channel, alpha channel is opaque.
+    """
+    n = width * height
+    if bpp < 3:
+        raise ValueError('Unsupported pixel format, pixel data must be RGB or RGBA')
+
+    pixels = bytes(memoryview(pixels).cast('B')[:n * bpp])
+    channels = [pixels[c::bpp] for c in range(0, min(bpp, 4))]
+    if len(channels) < 4:
+        channels.append(b'\xFF' * n)
+    return channels
+
+def _get_ordered_dither_table(bpc: int, shr: int, threshold: int) -> bytes:
+    """
+    Returns 256 byte translation table which maps 8-bit color component value to the value
+    which is encoded to the lower or upper nearest bpc bits level, depending on Bayer threshold.
+    """
+    levels = (1 << bpc) - 1
+    return bytes(
+        min((v * levels * 32 + (2 * threshold + 1) * 255) // (255 * 32), levels) << shr
+        for v in range(256)
+    )
+
+def _dither_ordered(channel: bytes, width: int, height: int, bpc: int, shr: int) -> bytes:
+    """Ordered dither color channel. Every 4th pixel of a row is dithered with a single translate."""
+    tables = [_get_ordered_dither_table(bpc, shr, t) for t in range(0, 16)]
+    out    = bytearray(channel)
+    for y in range(0, height):
+        pos = y * width
+        row = channel[pos: pos + width]
+        thresholds = BAYER_MATRIX_4X4[y & 3]
+        for x in range(0, min(width, 4)):
+            out[pos + x: pos + width: 4] = row[x::4].translate(tables[thresholds[x]])
+    return bytes(out)
+
+def _iter_dither_error_diffusion(channel: bytes, width: int, height: int, bpc: int, shr: int) -> Generator[None, None, bytes]:
+    """
+    Error diffusion dither color channel. Yields after every MAT_DITHER_STRIP_ROWS rows and returns dithered channel.
+    Quantization error of pixel is diffused to the 3 pixels below it (1/4, 1/2, 1/4), so the whole row is dithered at once:
+    row and error carried from the previous row are added as 16-bit lanes of a big int, the sum is clamped
+    with translate lookups and the error of the row is spread to the next row by shifting lanes.
+    Error is measured against the value after encoding and decoding (see get_quantize_table) and is biased by 128.
+    """
+    qt    = get_quantize_table(bpc, shr)
+    etab  = bytes(v - qt[v] + 128 for v in range(256))
+    clamp = [bytes(max(v - 128, 0) for v in range(256)), bytes(min(v + 128, 255) for v in range(256))] # lane value v + carry + 128, by high byte
+    hmask = b'\x00' + b'\xFF' * 255
+
+    n       = width * 2
+    lanes   = bytearray(n)
+    lane_8  = int.from_bytes(b'\xFF\x00' * width, 'little')
+    carry   = int.from_bytes(b'\x80\x00' * width, 'little') # no error
+    edge    = 128 + (128 << (16 * (width - 1)))              # error of missing neighbors of the first and last pixel
+    rounder = int.from_bytes(b'\x02\x00' * width, 'little')
+    out     = bytearray(len(channel))
+    for y in range(0, height):
+        pos = y * width
+        lanes[0::2] = channel[pos: pos + width]
+        s  = (int.from_bytes(lanes, 'little') + carry).to_bytes(n, 'little')
+        lo = s[0::2]
+        v0 = int.from_bytes(lo.translate(clamp[0]), 'little')
+        v1 = int.from_bytes(lo.translate(clamp[1]), 'little')
+        row = (v0 ^ ((v0 ^ v1) & int.from_bytes(s[1::2].translate(hmask), 'little'))).to_bytes(width, 'little')
+        out[pos: pos + width] = row
+
+        lanes[0::2] = row.translate(etab)
+        e = int.from_bytes(lanes, 'little')
+        carry = ((((e << 16) + (e << 1) + (e >> 16) + edge + rounder) >> 2) & lane_8)
+        if (y + 1) % MAT_DITHER_STRIP_ROWS == 0:
+            yield
+    return bytes(out)
+
+def iter_dither_pixel_data(pixels, width: int, height: int, bpp: int, ci: ColorFormat, mode: DitherMode) -> Generator[None, None, bytes]:
+    """
+    Generator version of dither_pixel_data which returns dithered pixel data.
+    Error diffusion yields after every few dithered rows which allows caller
+    e.g. to process UI events in between. Ordered dithering doesn't yield.
+    """
+    pixels = bytes(memoryview(pixels).cast('B')[:width * height * bpp])
+    if mode == DitherMode.NONE:
+        return pixels
+
+    dpd = bytearray(pixels)
+    components = [
+        (ci.red_bpp  , ci.red_shr),
+        (ci.green_bpp, ci.green_shr),
+        (ci.blue_bpp , ci.blue_shr),
+        (ci.alpha_bpp, ci.alpha_shr),
+    ]
+    for c in range(0, min(bpp, 4)):
+        bpc, shr = components[c]
+        if bpc <= 1 or shr == 0:
+            continue
+        if mode == DitherMode.ORDERED:
+            dpd[c::bpp] = _dither_ordered(pixels[c::bpp], width, height, bpc, shr)
+        else:
+            dpd[c::bpp] = yield from _iter_dither_error_diffusion(pixels[c::bpp], width, height, bpc, shr)
+    return bytes(dpd)
+
+def dither_pixel_data(pixels, width: int, height: int, bpp: int, ci: ColorFormat, mode: DitherMode) -> bytes:
+    """
+    Dither pixel data for encoding to color format ci.
+    Returned pixel data has the same layout as input pixel data and is meant to be encoded with encode_pixel_data.
+    Only color channels which lose precision are dithered, 1-bit alpha channel is not dithered.
+    :param pixels: decoded pixel data, 8 bits per color channel
+    :param bpp: bytes per decoded pixel
+    """
+    it = iter_dither_pixel_data(pixels, width, height, bpp, ci, mode)
+    while True:
+        try:
+            next(it)
+        except StopIteration as e:
+            return e.value
+
+def encode_pixel_data(pixels, width: int, height: int, bpp: int, ci: ColorFormat, dither: DitherMode = DitherMode.NONE) -> array[int]:
+    """
+    Encode pixel data to byte array.
+    Each byte of encoded pixel is made by OR-ing translate lookups of color channels over the whole buffer.
+    :param pixels: decoded pixel data, 8 bits per color channel
+    :param bpp: bytes per decoded pixel
+    :param dither: dither mode applied to pixel data before encoding
+    """
+    if dither != DitherMode.NONE:
+        pixels = dither_pixel_data(pixels, width, height, bpp, ci, dither)
+    return _encode_pixel_channels(_get_pixel_channels(pixels, width, height, bpp), width * height, ci)
+
+def _encode_pixel_channels(channels: List[bytes], n: int, ci: ColorFormat) -> array[int]:
+    """Encode n pixels given as 4 color channels (R, G, B, A), 8 bits per channel"""
+    e_pixel_size = get_encoded_pixel_size(ci.bpp)
+    components   = [
+        (channels[0], ci.red_bpp  , ci.red_shr  , ci.red_shl),
+        (channels[1], ci.green_bpp, ci.green_shr, ci.green_shl),
+        (channels[2], ci.blue_bpp , ci.blue_shr , ci.blue_shl),
+        (channels[3], ci.alpha_bpp, ci.alpha_shr, ci.alpha_shl),
+    ]
+
+    # Encoded pixel is little endian
+    epd = bytearray(n * e_pixel_size)
+    for byte_idx in range(0, e_pixel_size):
+        ebyte = 0
+        for channel, bpc, shr, shl in components:
+            if bpc == 0:
+                continue
+            table = bytes(((((v >> shr) << shl) >> (8 * byte_idx)) & 0xFF) for v in range(256))
+            if any(table):
+                ebyte |= int.from_bytes(channel.translate(table), 'little')
+        epd[byte_idx::e_pixel_size] = ebyte.to_bytes(n, 'little')
+    return array('B', epd)
+
+def quantize_pixel_data(pixels, width: int, height: int, bpp: int, ci: ColorFormat, dither: DitherMode = DitherMode.NONE) -> bytes:
+    """
+    Returns pixel data as it would be after encoded to color format ci and decoded back.
+    Each color channel is quantized with a single translate over the whole buffer.
+    Returned pixel data has the same layout as input pixel data.
+    """
+    channels = _quantize_pixel_channels(pixels, width, height, bpp, ci, dither)
+    qpd      = bytearray(width * height * bpp)
+    for c in range(0, min(bpp, 4)):
+        qpd[c::bpp] = channels[c]
+    return bytes(qpd)
+
+def _quantize_pixel_channels(pixels, width: int, height: int, bpp: int, ci: ColorFormat, dither: DitherMode = DitherMode.NONE) -> List[bytes]:
+    """Returns 4 color channels (R, G, B, A) of pixel data as they would be after encoded to color format ci and decoded back"""
+    if dither != DitherMode.NONE:
+        pixels = dither_pixel_data(pixels, width, height, bpp, ci, dither)
+
+    channels = _get_pixel_channels(pixels, width, height, bpp)
+    tables   = [
+        get_quantize_table(ci.red_bpp, ci.red_shr),
+        get_quantize_table(ci.green_bpp, ci.green_shr),
+        get_quantize_table(ci.blue_bpp, ci.blue_shr),
+        get_quantize_table(ci.alpha_bpp, ci.alpha_shr),
+    ]
+    return [channel.translate(table) for channel, table in zip(channels, tables)]
+
+def decode_pixel_channels(pd, width: int, height: int, ci: ColorFormat) -> List[bytes]:
+    """
+    Decode pixel data of RGB(A) color format to color channels (R, G, B and A if color format has alpha), 8 bits per channel.
+    Each color channel is decoded by OR-ing translate lookups of encoded pixel bytes over the whole buffer.
+    """
+    n            = width * height
+    e_pixel_size = get_encoded_pixel_size(ci.bpp)
+    pd           = bytes(memoryview(pd).cast('B')[:n * e_pixel_size])
+    if len(pd) != n * e_pixel_size:
+        raise ValueError('Invalid pixel data size')
+
+    ebytes     = [pd[i::e_pixel_size] for i in range(0, e_pixel_size)]
+    components = [(ci.red_bpp, ci.red_shl), (ci.green_bpp, ci.green_shl), (ci.blue_bpp, ci.blue_shl)]
+    if ci.alpha_bpp != 0:
+        components.append((ci.alpha_bpp, ci.alpha_shl))
+
+    channels: List[bytes] = []
+    for bpc, shl in components:
+        # Encoded pixel is little endian, component bits of every byte are disjoint
+        mask = get_color_mask(bpc)
+        cc   = 0
+        for byte_idx, eb in enumerate(ebytes):
+            table = bytes((((v << (8 * byte_idx)) >> shl) & mask) for v in range(256))
+            if any(table):
+                cc |= int.from_bytes(eb.translate(table), 'little')
+        scale = bytes(scale_color_component(v & mask, bpc, bpc - 8) & 0xFF for v in range(256))
+        channels.append(cc.to_bytes(n, 'little').translate(scale))
+    return channels
+
+def transcode_pixel_data(pd, width: int, height: int, src_ci: ColorFormat, dst_ci: ColorFormat) -> array[int]:
+    """
+    Transcode encoded pixel data from color format src_ci to dst_ci.
+    Color channels are unpacked and packed again over the whole buffer, pixels are not decoded one by one.
+    If src_ci has no alpha channel the pixels are opaque, if dst_ci has none the alpha is dropped.
+    """
+    if src_ci.color_mode == ColorMode.Indexed or dst_ci.color_mode == ColorMode.Indexed:
+        raise ValueError('Indexed color format is not supported')
+
+    channels = decode_pixel_channels(pd, width, height, src_ci)
+    if len(channels) < 4:
+        channels.append(b'\xFF' * (width * height))
+    return _encode_pixel_channels(channels, width * height, dst_ci)
+
+def verify_pixel_data(pd, pixels, width: int, height: int, bpp: int, ci: ColorFormat, dither: DitherMode = DitherMode.NONE) -> bool:
+    """
+    Check that encoded pixel data decodes to pixels quantized to color format ci.
+    :param pd: encoded pixel data
+    :param pixels: pixel data which was encoded, 8 bits per color channel
+    :param bpp: bytes per pixel of pixels
+    :param dither: dither mode pixels were encoded with
+    """
+    decoded  = decode_pixel_channels(pd, width, height, ci)
+    expected = _quantize_pixel_channels(pixels, width, height, bpp, ci, dither)
+    return all(d == e for d, e in zip(decoded, expected))
+
+def _get_lossy_value_table(bpc: int) -> bytes:
+    """
+    Returns 256 byte translation table which maps 8-bit color component value to 1
+    if the value changes after it's encoded to bpc bits and decoded back, otherwise to 0.
+    If bpc is 0 (e.g. no alpha channel) every value except 255 is lossy.
+    """
+    qt = get_quantize_table(bpc, 8 - bpc)
+    return bytes(0 if qt[v] == v else 1 for v in range(256))
+
+def get_lossless_color_formats(pixels, px_size: int, cfs: List[ColorFormat]) -> List[ColorFormat]:
+    """
+    Returns color formats from cfs which can encode all pixels without loss of information.
+    Each color channel is checked with a single translate over the whole buffer.
+    :param pixels: decoded pixel data, 8 bits per color channel
+    :param px_size: bytes per pixel, 3 for RGB or 4 for RGBA
+    """
+    pixels = bytes(pixels)
+    channels = [pixels[c::px_size] for c in range(0, px_size)]
+    lossy_cache = {}
+    def is_lossy(c: int, bpc: int) -> bool:
+        if (c, bpc) not in lossy_cache:
+            lossy_cache[(c, bpc)] = 1 in channels[c].translate(_get_lossy_value_table(bpc))
+        return lossy_cache[(c, bpc)]
+
+    lossless = []
+    for cf in cfs:
+        if cf.color_mode == ColorMode.Indexed:
+            continue
+        bpcs = [cf.red_bpp, cf.green_bpp, cf.blue_bpp]
+        if px_size == 4:
+            bpcs.append(cf.alpha_bpp)
+        if not any(is_lossy(c, bpc) for c, bpc in enumerate(bpcs) if bpc < 8):
+            lossless.append(cf)
+    return lossless
+
+def downscale_pixel_data(pixels, width: int, height: int, bpp: int) -> bytes:
+    """
+    Downscale pixel data to half size using 2x2 box filter.
+    Odd last row and column are dropped, i.e.: the result is (width // 2) x (height // 2) image.
+    Note, unlike GIMP layer scale, the filter is applied to sRGB values directly.
+    :param pixels: decoded pixel data, 8 bits per color channel
+    :param bpp: bytes per decoded pixel
+    """
+    dwidth  = width // 2
+    dheight = height // 2
+    pixels  = memoryview(pixels).cast('B')
+    row_len = width * bpp
+    drow_len = dwidth * bpp
+
+    # Gather even and odd rows, trimmed to even width
+    even = bytearray(dheight * drow_len * 2)
+    odd  = bytearray(dheight * drow_len * 2)
+    for y in range(0, dheight):
+        pos = 2 * y * row_len
+        even[y * 2 * drow_len: (y + 1) * 2 * drow_len] = pixels[pos: pos + 2 * drow_len]
+        odd [y * 2 * drow_len: (y + 1) * 2 * drow_len] = pixels[pos + row_len: pos + row_len + 2 * drow_len]
+
+    dpd = bytearray(dwidth * dheight * bpp)
+    for c in range(0, bpp):
+        dpd[c::bpp] = bytes(
+            (p00 + p01 + p10 + p11 + 2) >> 2 for p00, p01, p10, p11 in
+            zip(even[c::2 * bpp], even[c + bpp::2 * bpp], odd[c::2 * bpp], odd[c + bpp::2 * bpp])
+        )
+    return bytes(dpd)
+
+def encode_texture_data(pixels, width: int, height: int, bpp: int, ci: ColorFormat, is_mipmap: bool, min_mipmap_size: int, max_mipmap_levels: int,
+                        dither: DitherMode = DitherMode.NONE) -> bytes:
+    """
+    Encode pixel data to MAT texture, i.e.: mipmap header followed by pixel data of all LOD levels.
+    The LOD levels are made with downscale_pixel_data from undithered pixel data and each level is dithered separately.
+    :param pixels: decoded pixel data of LOD 0, 8 bits per color channel
+    :param bpp: bytes per decoded pixel
+    """
+    levels = get_mipmap_level_count(width, height, min_mipmap_size, max_mipmap_levels) if is_mipmap else 1
+    return encode_lod_pixel_data(make_lod_pixel_data(pixels, width, height, bpp, levels), width, height, bpp, ci, dither)
+
+def make_lod_pixel_data(pixels, width: int, height: int, bpp: int, levels: int) -> List[bytes]:
+    """
+    Make pixel data of Mipmap LOD chain with downscale_pixel_data, starting with LOD 0 pixels.
+    Every level is made from the undithered pixel data of the previous level.
+    """
+    lod_pixels = [pixels]
+    for level in range(1, levels):
+        lod_pixels.append(downscale_pixel_data(lod_pixels[-1], width >> (level - 1), height >> (level - 1), bpp))
+    return lod_pixels
+
+def encode_lod_pixel_data(lod_pixels: List[Any], width: int, height: int, bpp: int, ci: ColorFormat, dither: DitherMode = DitherMode.NONE,
+                          encoded_lod0: Optional[bytes] = None) -> bytes:
+    """
+    Encode pixel data of Mipmap LOD chain to MAT texture, i.e.: mipmap header followed by pixel data of all LOD levels.
+    The LOD chain can be encoded to several color formats without making it again.
+    :param lod_pixels: decoded pixel data of every LOD level, 8 bits per color channel
+    :param encoded_lod0: already encoded LOD 0 pixel data. If None LOD 0 pixel data is encoded.
+    """
+    etex = bytearray(mmm_serf.pack(*MatMipmapHeader(width, height, 0, 0, 0, len(lod_pixels))))
+    for level, pixels in enumerate(lod_pixels):
+        if level == 0 and encoded_lod0 is not None:
+            etex += encoded_lod0
+        else:
+            etex += encode_pixel_data(pixels, width >> level, height >> level, bpp, ci, dither)
+    return bytes(etex)
+
+def _get_decoded_color_info(ci: ColorFormat, mmh: MatMipmapHeader, cmp: Optional[ColorMap]) -> Tuple[ColorFormat, Optional[int]]:
+    """
+    Returns color format of decoded texture pixels and transparent color index of indexed texture.
+    Indexed pixels are decoded to 24 or 32 bit pixels.
+    """
+    if ci.color_mode != ColorMode.Indexed:
+        return ci, None
+    if cmp is None:
+        raise ImportError('Missing colormap for indexed MAT texture')
+    transparent_idx = mmh.transparent_color_num if mmh.transparent else None
+    return (RGB888 if transparent_idx is None else RGBA8888), transparent_idx
+
+def _decode_lod_pixel_data(pd: memoryview, width: int, height: int, ci: ColorFormat, cmp: Optional[ColorMap], transparent_idx: Optional[int],
+                           progress_cb: Optional[Callable[[float], None]] = None) -> array[int]:
+    if ci.color_mode == ColorMode.Indexed:
+        return decode_indexed_pixel_data(pd, width, height, cmp, transparent_idx)
+    return decode_pixel_data(pd, width, height, ci, progress_cb)
+
+def read_texture(f: BinaryIO, ci: ColorFormat, cmp: Optional[ColorMap] = None, progress_cb: Optional[Callable[[float], None]] = None) -> Mipmap:
+    """
+    Read texture from MAT file. cmp is required for indexed color format.
+    progress_cb is called with the fraction of decoded texture pixel data.
+    """
+    mmh = read_mipmap_header(f)
+    dci, transparent_idx = _get_decoded_color_info(ci, mmh, cmp)
+
+    # Calculate total mipmap pixel data size
+    sizes = get_mipmap_sizes(mmh, ci.bpp)
+
+    # Read in mipmap pixel data
+    raw_mipmap = bytearray(f.read(sum(sizes)))
+
+    # Decode mipmap pixel data
+    offset = 0
+    total  = float(max(sum(sizes), 1))
+    pd: List[Any]  = []
+    for size, level in zip(sizes, range(mmh.mipmap_levels)):
+        lod_progress_cb = None
+        if progress_cb is not None:
+            lod_progress_cb = lambda rf, offset=offset, size=size: progress_cb((offset + rf * size) / total)
+            lod_progress_cb(0.0)
+
+        mv = memoryview(raw_mipmap)[offset: offset + size]
+        pd.append(_decode_lod_pixel_data(mv, mmh.width >> level, mmh.height >> level, ci, cmp, transparent_idx, lod_progress_cb))
+        offset += size
+    return Mipmap(mmh.width, mmh.height, dci, pd)
+
+def read_texture_lod(f: BinaryIO, ci: ColorFormat, lod_level: int = 0, max_size: int = 0, cmp: Optional[ColorMap] = None,
+                     progress_cb: Optional[Callable[[float], None]] = None) -> Tuple[Mipmap, MatMipmapHeader, int]:
+    """
+    Read single LOD level of texture from MAT file, pixel data of the other LOD levels is skipped.
+    The LOD level is selected with get_texture_lod_level.
+    Returns Mipmap of the LOD level size with the LOD level as the only pixel data, texture mipmap header and the LOD level read.
+    """
+    mmh   = read_mipmap_header(f)
+    level = get_texture_lod_level(mmh, lod_level, max_size)
+    dci, transparent_idx = _get_decoded_color_info(ci, mmh, cmp)
+
+    sizes = get_mipmap_sizes(mmh, ci.bpp)
+    f.seek(sum(sizes[:level]), 1)
+    raw_lod = f.read(sizes[level])
+    f.seek(sum(sizes[level + 1:]), 1)
+
+    width, height = mmh.width >> level, mmh.height >> level
+    if progress_cb is not None:
+        progress_cb(0.0)
+    pd = _decode_lod_pixel_data(memoryview(raw_lod), width, height, ci, cmp, transparent_idx, progress_cb)
+    return Mipmap(width, height, dci, [pd]), mmh, level
+
+def _find_mat_colormap(file_path: str, h: MatHeader, cmp_file_path: Optional[str]) -> Optional[ColorMap]:
+    if h.color_info.color_mode != ColorMode.Indexed:
+        return None
+    if cmp_file_path is None:
+        cmp_file_path = find_colormap(file_path)
+    if cmp_file_path is None:
+        raise ImportError('Indexed MAT file requires colormap (CMP) file')
+    return read_colormap(cmp_file_path)
+
+def read_mat_file(file_path: str, cmp_file_path: Optional[str] = None, max_cells: int = -1) -> Tuple[MatHeader, List[Mipmap]]:
+    """
+    Read MAT file and decode its cel textures.
+    :param cmp_file_path: path to the CMP file used to decode indexed (8-bit) MAT.
+                          If None, the CMP file is searched for in the MAT file folder.
+    :param max_cells: max number of cel textures to read. Default -1, meaning all.
+    """
+    with open(file_path, 'rb') as f:
+        h, _ = read_header_and_records(f)
+        cmp = _find_mat_colormap(file_path, h, cmp_file_path)
+        max_cells = h.cel_count if max_cells < 0 else min(max_cells, h.cel_count)
+        return h, [read_texture(f, h.color_info, cmp) for _ in range(0, max_cells)]
+
+def read_mat_file_lod(file_path: str, lod_level: int = 0, cmp_file_path: Optional[str] = None, max_cells: int = -1) -> Tuple[MatHeader, List[Tuple[Mipmap, MatMipmapHeader]]]:
+    """
+    Read MAT file and decode single LOD level of its cel textures, see read_texture_lod.
+    Returns MAT header and list of decoded LOD level and mipmap header of every cel texture.
+    """
+    with open(file_path, 'rb') as f:
+        h, _ = read_header_and_records(f)
+        cmp = _find_mat_colormap(file_path, h, cmp_file_path)
+        max_cells = h.cel_count if max_cells < 0 else min(max_cells, h.cel_count)
+        cels = []
+        for _ in range(0, max_cells):
+            mm, mmh, _ = read_texture_lod(f, h.color_info, lod_level, cmp=cmp)
+            cels.append((mm, mmh))
+        return h, cels
+
+def decode_mat_file_lod0(file_path: str, max_cells: int = -1) -> Tuple[List[Tuple[Mipmap, int]], Optional[str]]:
+    """
+    Decode first LOD level of MAT file cel textures. Used as entry point of process pool workers,
+    thus it doesn't raise but returns list of (decoded LOD level, mipmap level count) and error if any.
+    """
+    try:
+        return [(mm, mmh.mipmap_levels) for mm, mmh in read_mat_file_lod(file_path, max_cells=max_cells)[1]], None
+    except Exception as e:
+        return [], str(e) or type(e).__name__
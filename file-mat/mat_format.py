@@ -0,0 +1,337 @@
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+
+from array import array
+from enum import IntEnum
+from struct import Struct
+from typing import List, BinaryIO, Iterator, NamedTuple, Tuple
+
+
+MAT_FILE_MAGIC       = b'MAT ' # mind the space at the end
+MAT_REQUIRED_VERSION = 0x32
+
+class ColorMode(IntEnum):
+    Indexed = 0
+    RGB     = 1
+    RGBA    = 2
+
+class ColorFormat(NamedTuple):
+    color_mode: ColorMode
+    bpp: int
+    red_bpp: int
+    green_bpp: int
+    blue_bpp: int
+    red_shl: int
+    green_shl: int
+    blue_shl: int
+    red_shr: int
+    green_shr: int
+    blue_shr: int
+    alpha_bpp: int
+    alpha_shl: int
+    alpha_shr: int
+
+cf_serf = Struct('<14I')
+
+class MatType(IntEnum):
+    Color   = 0
+    Texture = 2
+
+class MatHeader(NamedTuple):
+    magic: bytes
+    version: int
+    type: MatType
+    record_count: int
+    cel_count: int
+    color_info: ColorFormat
+
+mh_serf = Struct('<4siIii')
+
+class MatRecordHeader(NamedTuple):
+    record_type: int
+    color_index: int
+    unknown_1: int
+    unknown_2: int
+    unknown_3: int
+    unknown_4: int
+    unknown_5: int
+    unknown_6: int
+    unknown_7: int
+    cel_idx: int
+
+mrh_serf = Struct('<10i')
+
+class MatMipmapHeader(NamedTuple):
+    width: int
+    height: int
+    transparent: int
+    unknown: int
+    transparent_color_num: int
+    mipmap_levels: int
+    
+mmm_serf = Struct('<6i')
+
+# Color format constants
+RGBA5551 = ColorFormat(ColorMode.RGBA, 16, 5,5,5, 11,6,1, 3,3,3, 1,0,7)
+RGBA4444 = ColorFormat(ColorMode.RGBA, 16, 4,4,4, 12,8,4, 4,4,4, 4,0,4)
+RGB565   = ColorFormat(ColorMode.RGB , 16, 5,6,5, 11,5,0, 3,2,3, 0,0,0)
+RGBA8888 = ColorFormat(ColorMode.RGBA, 32, 8,8,8, 24,16,8, 0,0,0, 8,0,0)
+RGB888   = ColorFormat(ColorMode.RGB , 24, 8,8,8, 16,8,0, 0,0,0, 0,0,0)
+INDEXED8 = ColorFormat(ColorMode.Indexed, 8, 0,0,0, 0,0,0, 0,0,0, 0,0,0)
+
+COLOR_FORMAT_NAMES = {
+    RGBA5551: 'RGBA5551',
+    RGBA4444: 'RGBA4444',
+    RGB565  : 'RGB565',
+    RGBA8888: 'RGBA8888',
+    RGB888  : 'RGB888',
+    INDEXED8: 'INDEXED8',
+}
+
+def color_format_name(cf: ColorFormat) -> str:
+    """Returns name of known color format or generic name made of color mode and bpp"""
+    name = COLOR_FORMAT_NAMES.get(cf)
+    if name is None:
+        name = f'{ColorMode(cf.color_mode).name.upper()}{cf.bpp}'
+    return name
+
+def color_format_by_name(name: str) -> ColorFormat:
+    """Returns known color format by name e.g. 'RGBA4444'. The lookup is case insensitive."""
+    name = name.upper()
+    for cf, cf_name in COLOR_FORMAT_NAMES.items():
+        if cf_name == name:
+            return cf
+    raise ValueError(f"Unknown color format '{name}'")
+
+
+MAT_HEADER_PREFETCH_SIZE = 4096 # bytes read at once for header and record table
+
+class MatRecordTable:
+    """
+    Column-style table of MAT records parsed from raw record data.
+    Record fields are stored in single int array, MatRecordHeader is created only when record is accessed.
+    """
+    FIELD_COUNT = len(MatRecordHeader._fields)
+
+    def __init__(self, data: bytes):
+        self._fields = array('i')
+        self._fields.frombytes(data)
+        if sys.byteorder != 'little':
+            self._fields.byteswap()
+
+    def __len__(self) -> int:
+        return len(self._fields) // self.FIELD_COUNT
+
+    def __getitem__(self, idx: int) -> MatRecordHeader:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('record index out of range')
+        pos = idx * self.FIELD_COUNT
+        return MatRecordHeader._make(self._fields[pos: pos + self.FIELD_COUNT])
+
+    def __iter__(self) -> Iterator[MatRecordHeader]:
+        for i in range(0, len(self)):
+            yield self[i]
+
+    def column(self, field: str) -> array:
+        """Returns values of record field for all records e.g. column('cel_idx')"""
+        return self._fields[MatRecordHeader._fields.index(field)::self.FIELD_COUNT]
+
+def _make_header(data) -> MatHeader:
+    """Make and validate MAT header from raw header and color format data"""
+    deser_mh = mh_serf.unpack_from(data, 0)
+    cf = ColorFormat._make(cf_serf.unpack_from(data, mh_serf.size))
+
+    h = MatHeader(deser_mh[0], deser_mh[1], deser_mh[2], deser_mh[3], deser_mh[4], cf)
+    if h.magic != MAT_FILE_MAGIC:
+        raise ImportError('Invalid MAT file')
+    if h.version != MAT_REQUIRED_VERSION:
+        raise ImportError('Invalid MAT file version')
+    if h.type != MatType.Texture:
+        raise ImportError('Invalid MAT file type')
+    if h.record_count != h.cel_count:
+        raise ImportError('Cannot read older version of MAT file')
+    if h.record_count <= 0:
+        raise ImportError('MAT file record count <= 0')
+    if not (ColorMode.Indexed <= h.color_info.color_mode <= ColorMode.RGBA):
+        raise ImportError('Invalid color mode')
+    if h.color_info.color_mode == ColorMode.Indexed:
+        if h.color_info.bpp != 8:
+            raise ImportError('Invalid color depth')
+    elif h.color_info.bpp % 8 != 0 and not (16 <= h.color_info.bpp <= 32):
+        raise ImportError('Invalid color depth')
+    return h
+
+def read_header(f: BinaryIO) -> MatHeader:
+    """Read MAT header from file"""
+    data = f.read(mh_serf.size + cf_serf.size)
+    if len(data) != mh_serf.size + cf_serf.size:
+        raise ImportError('Invalid MAT file')
+    return _make_header(data)
+
+def read_header_and_records(f: BinaryIO) -> Tuple[MatHeader, MatRecordTable]:
+    """
+    Read MAT header and record table from file with a single read for most of files.
+    After return the file is positioned at the first texture.
+    """
+    start = f.tell()
+    data  = f.read(MAT_HEADER_PREFETCH_SIZE)
+    hsize = mh_serf.size + cf_serf.size
+    if len(data) < hsize:
+        raise ImportError('Invalid MAT file')
+    h = _make_header(data)
+
+    end = hsize + h.record_count * mrh_serf.size
+    if len(data) < end:
+        data += f.read(end - len(data))
+        if len(data) < end:
+            raise ImportError('Invalid MAT file record table')
+
+    f.seek(start + end)
+    return h, MatRecordTable(memoryview(data)[hsize: end])
+
+def write_header(f: BinaryIO, cel_count: int, cf: ColorFormat):
+    """Write MAT header to file"""
+    h = MatHeader(MAT_FILE_MAGIC, MAT_REQUIRED_VERSION, MatType.Texture, cel_count, cel_count, cf)
+
+    rh = mh_serf.pack(*h[0:5])  # not including 'color_info' field
+    rcf = cf_serf.pack(*cf)
+    f.write(rh)
+    f.write(rcf)
+
+def read_records(f: BinaryIO, h: MatHeader) -> MatRecordTable:
+    """Read MAT records from file"""
+    size = h.record_count * mrh_serf.size
+    data = f.read(size)
+    if len(data) != size:
+        raise ImportError('Invalid MAT file record table')
+    return MatRecordTable(data)
+
+def write_records(f: BinaryIO, record_count: int):
+    """Write MAT records to file"""
+    record_type = 8
+    for i in range(0, record_count):
+        r = MatRecordHeader(record_type, 0, 0, 0, 0, 0, 0, 0, 0, i)
+        f.write(mrh_serf.pack(*r))
+
+def get_img_row_len(width: int, bpp: int):
+    """Get image row length based on width and bpp"""
+    return int(abs(width) * (bpp / 8))
+
+def get_pixel_data_size(width: int, height: int, bpp: int):
+    """Get pixel data size based on width, height and bpp"""
+    return int(abs(width * height) * (bpp / 8))
+
+def get_encoded_pixel_size(bpp: int):
+    """Get encoded pixel size in bytes based on bpp"""
+    return int(bpp / 8)
+
+def get_decoded_pixel_size(ci: ColorFormat) -> int:
+    """Get decoded pixel size based on color format"""
+    return 4 if ci.alpha_bpp != 0 else 3
+
+def get_mipmap_sizes(mmh: MatMipmapHeader, bpp: int) -> List[int]:
+    """Get pixel data size of every mipmap LOD level"""
+    return [
+        get_pixel_data_size(mmh.width >> i, mmh.height >> i, bpp)
+        for i in range(mmh.mipmap_levels)
+    ]
+
+def get_mipmap_level_count(width: int, height: int, min_size: int, max_levels: int) -> int:
+    """
+    Get number of mipmap levels (including LOD 0) for texture of size width x height.
+    LOD levels are generated until either dimension falls below min_size or max_levels is reached.
+    Negative max_levels means no limit.
+    """
+    levels = 1
+    if min_size < 1 or max_levels == 1:
+        return levels
+
+    width  //= 2
+    height //= 2
+    while width >= min_size and height >= min_size and levels != max_levels:
+        levels += 1
+        width  //= 2
+        height //= 2
+    return levels
+
+def get_texture_lod_level(mmh: MatMipmapHeader, lod_level: int = 0, max_size: int = 0) -> int:
+    """
+    Returns stored LOD level of texture to load for reduced view.
+    The level is the larger of lod_level and the first level whose width and height are at most max_size (if max_size > 0),
+    but at most the last LOD level of texture.
+    """
+    level = lod_level
+    if max_size > 0:
+        while max(mmh.width >> level, mmh.height >> level) > max_size and level < mmh.mipmap_levels - 1:
+            level += 1
+    return max(min(level, mmh.mipmap_levels - 1), 0)
+
+def read_mipmap_header(f: BinaryIO) -> MatMipmapHeader:
+    """Read texture mipmap header from file"""
+    return MatMipmapHeader._make(mmm_serf.unpack(bytearray(f.read(mmm_serf.size))))
+
+def read_mipmap_headers(f: BinaryIO, h: MatHeader) -> List[MatMipmapHeader]:
+    """
+    Read mipmap headers of all cel textures from file.
+    The pixel data is skipped, file must be positioned at the first texture (i.e. after records).
+    """
+    mmh_list: List[MatMipmapHeader] = []
+    for i in range(0, h.cel_count):
+        mmh = read_mipmap_header(f)
+        mmh_list.append(mmh)
+        f.seek(sum(get_mipmap_sizes(mmh, h.color_info.bpp)), 1)
+    return mmh_list
+
+class MatTextureLayout(NamedTuple):
+    header: MatMipmapHeader
+    offset: int           # file offset of LOD 0 pixel data
+    lod_sizes: List[int]  # pixel data size of every LOD level
+
+    def lod_offset(self, level: int) -> int:
+        """Returns file offset of pixel data of LOD level"""
+        return self.offset + sum(self.lod_sizes[:level])
+
+    @property
+    def end(self) -> int:
+        return self.offset + sum(self.lod_sizes)
+
+def get_texture_layouts(data, h: MatHeader, offset: int) -> List[MatTextureLayout]:
+    """
+    Compute layout of all cel textures in MAT file data without reading the pixel data.
+    :param data: MAT file data, e.g. bytes or mmap
+    :param offset: offset of the first texture, i.e. end of record table
+    """
+    layouts: List[MatTextureLayout] = []
+    for _ in range(0, h.cel_count):
+        if offset + mmm_serf.size > len(data):
+            raise ImportError('Invalid MAT file texture')
+        mmh   = MatMipmapHeader._make(mmm_serf.unpack_from(data, offset))
+        sizes = get_mipmap_sizes(mmh, h.color_info.bpp)
+        layout = MatTextureLayout(mmh, offset + mmm_serf.size, sizes)
+        if mmh.mipmap_levels < 1 or layout.end > len(data):
+            raise ImportError('Invalid MAT file texture')
+        layouts.append(layout)
+        offset = layout.end
+    return layouts
@@ -0,0 +1,154 @@
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Minimal PNG reader and writer for 8-bit images used by command line tools (no GIMP required)
+
+import zlib
+
+from struct import pack, unpack_from
+from typing import List, Tuple
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return pack('>I', len(data)) + tag + data + pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+def write_png(file_path: str, pixels, width: int, height: int, px_size: int):
+    """
+    Write 8-bit RGB or RGBA pixel data to PNG file.
+    :param pixels: pixel data rows, 8 bits per color channel
+    :param px_size: bytes per pixel, 3 for RGB or 4 for RGBA
+    """
+    if px_size not in (3, 4):
+        raise ValueError('Invalid PNG pixel size')
+
+    # Prefix each row with filter type 0 (None)
+    pixels  = memoryview(pixels).cast('B')
+    row_len = width * px_size
+    raw     = bytearray((row_len + 1) * height)
+    for y in range(0, height):
+        pos = y * (row_len + 1) + 1
+        raw[pos: pos + row_len] = pixels[y * row_len: (y + 1) * row_len]
+
+    color_type = 2 if px_size == 3 else 6
+    with open(file_path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(_png_chunk(b'IHDR', pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)))
+        f.write(_png_chunk(b'IDAT', zlib.compress(bytes(raw), 6)))
+        f.write(_png_chunk(b'IEND', b''))
+
+def _unfilter_scanlines(raw: bytes, row_len: int, height: int, px_size: int) -> bytearray:
+    """Reverse PNG scanline filters. Returns pixel data without filter type bytes."""
+    out   = bytearray(row_len * height)
+    prior = bytearray(row_len)
+    pos   = 0
+    for y in range(0, height):
+        ftype = raw[pos]
+        row   = bytearray(raw[pos + 1: pos + 1 + row_len])
+        pos  += row_len + 1
+        if ftype == 1: # Sub
+            for i in range(px_size, row_len):
+                row[i] = (row[i] + row[i - px_size]) & 0xFF
+        elif ftype == 2: # Up
+            row = bytearray((a + b) & 0xFF for a, b in zip(row, prior))
+        elif ftype == 3: # Average
+            for i in range(0, row_len):
+                left   = row[i - px_size] if i >= px_size else 0
+                row[i] = (row[i] + ((left + prior[i]) >> 1)) & 0xFF
+        elif ftype == 4: # Paeth
+            for i in range(0, row_len):
+                a = row[i - px_size] if i >= px_size else 0
+                b = prior[i]
+                c = prior[i - px_size] if i >= px_size else 0
+                p  = a + b - c
+                pa = abs(p - a)
+                pb = abs(p - b)
+                pc = abs(p - c)
+                row[i] = (row[i] + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 0xFF
+        elif ftype != 0:
+            raise ValueError('Invalid PNG filter type')
+        out[y * row_len: (y + 1) * row_len] = row
+        prior = row
+    return out
+
+def read_png(file_path: str) -> Tuple[bytes, int, int, int]:
+    """
+    Read PNG file as 8-bit RGB or RGBA pixel data.
+    Only non-interlaced images with 8 bits per channel are supported.
+    Grayscale images are converted to RGB(A), palette images to RGB or to RGBA when palette has transparency.
+    Returns pixel data, width, height and bytes per pixel (3 for RGB or 4 for RGBA).
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError('Invalid PNG file')
+
+    idat: List[bytes] = []
+    plte = trns = b''
+    width = height = depth = color_type = interlace = None
+    pos  = 8
+    while pos + 8 <= len(data):
+        size, = unpack_from('>I', data, pos)
+        tag   = data[pos + 4: pos + 8]
+        chunk = data[pos + 8: pos + 8 + size]
+        pos  += size + 12
+        if tag == b'IHDR':
+            if idat or len(chunk) < 13:
+                raise ValueError('Invalid PNG file')
+            width, height, depth, color_type, _, _, interlace = unpack_from('>IIBBBBB', chunk)
+        elif tag == b'PLTE':
+            plte = chunk
+        elif tag == b'tRNS':
+            trns = chunk
+        elif tag == b'IDAT':
+            idat.append(chunk)
+        elif tag == b'IEND':
+            break
+
+    if width is None:
+        raise ValueError('Invalid PNG file')
+    if not idat or depth != 8 or interlace != 0 or color_type not in (0, 2, 3, 4, 6):
+        raise ValueError('Unsupported PNG file, only non-interlaced 8-bit images are supported')
+
+    channels = { 0: 1, 2: 3, 3: 1, 4: 2, 6: 4 }[color_type]
+    pixels   = _unfilter_scanlines(zlib.decompress(b''.join(idat)), width * channels, height, channels)
+    n        = width * height
+    if color_type in (2, 6):
+        return bytes(pixels), width, height, channels
+
+    # Expand grayscale and palette images
+    px_size = 4 if color_type == 4 or (color_type == 3 and trns) else 3
+    out     = bytearray(n * px_size)
+    if color_type == 3:
+        indices = bytes(pixels)
+        plte    = plte.ljust(256 * 3, b'\0')
+        for c in range(0, 3):
+            out[c::px_size] = indices.translate(plte[c::3])
+        if px_size == 4:
+            out[3::px_size] = indices.translate(trns[:256].ljust(256, b'\xFF'))
+    else:
+        gray = bytes(pixels[0::channels])
+        for c in range(0, 3):
+            out[c::px_size] = gray
+        if px_size == 4:
+            out[3::px_size] = pixels[1::channels]
+    return bytes(out), width, height, px_size
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# File-MAT GIMP plugin
+# Copyright (c) 2019-2025 Crt Vavros
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Benchmark which measures plug-in startup time (module import time) of each plug-in procedure.
+# Every sample is measured in a new Python process, the same way GIMP starts the plug-in for every procedure call.
+#
+# Usage:
+#   startup-bench.py [--runs 10]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imports done by plug-in main module at module level, i.e. by every procedure
+PLUGIN_IMPORTS = [
+    'import gi',
+    "gi.require_version('Gimp', '3.0')",
+    'from gi.repository import Gimp, GObject, GLib',
+    'import mat_format',
+]
+
+# UI imports of procedures which show dialog
+UI_IMPORTS = [
+    "gi.require_version('GimpUi', '3.0')",
+    'from gi.repository import GimpUi, Gtk, GdkPixbuf',
+]
+
+# Imports done by each procedure
+PROCEDURE_IMPORTS = {
+    'query':            PLUGIN_IMPORTS,
+    'load':             PLUGIN_IMPORTS + ['import mat'],
+    'thumbnail':        PLUGIN_IMPORTS + ['import mat'],
+    'load (multiple)':  PLUGIN_IMPORTS + ['import mat'] + UI_IMPORTS,
+    'export':           PLUGIN_IMPORTS + ['import mat'],
+    'export (dialog)':  PLUGIN_IMPORTS + ['import mat'] + UI_IMPORTS + ['import export_dialog'],
+}
+
+# Imports done by every procedure when the whole plug-in is imported at once
+EAGER_IMPORTS = PLUGIN_IMPORTS + ['import mat'] + UI_IMPORTS + ['import export_dialog']
+
+_BENCH_CODE = '''
+import sys, time
+sys.path.append({plugin_dir!r})
+t = time.perf_counter()
+for stmt in {imports!r}:
+    exec(stmt)
+print(time.perf_counter() - t)
+'''
+
+def measure_import_time(imports, runs: int) -> float:
+    """Returns median time in seconds of import statements, each run in a new process"""
+    code    = _BENCH_CODE.format(plugin_dir=PLUGIN_DIR, imports=imports)
+    samples = []
+    for _ in range(0, runs):
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout))
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure startup time of file-mat plug-in procedures.')
+    parser.add_argument('-r', '--runs', type=int, default=10, help='number of runs per procedure (default: 10)')
+    args = parser.parse_args()
+
+    eager = measure_import_time(EAGER_IMPORTS, args.runs)
+    print(f'{"procedure":<16}{"lazy [ms]":>12}{"eager [ms]":>12}')
+    for proc, imports in PROCEDURE_IMPORTS.items():
+        lazy = measure_import_time(imports, args.runs)
+        print(f'{proc:<16}{lazy * 1000:>12.1f}{eager * 1000:>12.1f}')
+
+if __name__ == '__main__':
+    main()
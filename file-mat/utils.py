@@ -22,7 +22,35 @@
 import gi
 gi.require_version('Gimp', '3.0')
 from gi.repository import Gimp, Gegl
-from typing import List
+from struct import Struct
+from typing import List, NamedTuple, Optional, Tuple
+
+
+SPRITE_SHEET_PARASITE = 'mat-sprite-sheet'
+
+class SpriteSheetGrid(NamedTuple):
+    """
+    Geometry of sprite sheet layer, i.e.: layer with all cel textures laid out in a grid.
+    Every grid cell holds LOD 0 of cel texture at the top left corner
+    and the rest of LOD levels (if any) stacked in a column on the right of it.
+    """
+    columns: int
+    cel_count: int
+    cel_width: int
+    cel_height: int
+    lod_count: int # number of LOD levels in grid cell
+
+ssg_serf = Struct('<5i')
+
+REDUCED_VIEW_PARASITE = 'mat-reduced-view'
+
+class ReducedView(NamedTuple):
+    """Marks image loaded from stored mipmap LOD level instead of full resolution LOD 0"""
+    lod_level: int # LOD level of the first cel
+    width: int     # LOD 0 width of the first cel
+    height: int    # LOD 0 height of the first cel
+
+rv_serf = Struct('<3i')
 
 def is_layer_mipmap(layer: Gimp.Layer) -> bool:
     """
@@ -45,6 +73,71 @@ def set_layer_as_mipmap(layer: Gimp.Layer, is_mipmap: bool) -> None:
     )
     layer.attach_parasite(parasite)
 
+def get_sprite_sheet_cell_size(grid: SpriteSheetGrid) -> Tuple[int, int]:
+    """Returns width and height of sprite sheet grid cell"""
+    width = grid.cel_width + (grid.cel_width // 2 if grid.lod_count > 1 else 0)
+    return width, grid.cel_height
+
+def get_sprite_sheet_size(grid: SpriteSheetGrid) -> Tuple[int, int]:
+    """Returns width and height of sprite sheet layer"""
+    cwidth, cheight = get_sprite_sheet_cell_size(grid)
+    rows = (grid.cel_count + grid.columns - 1) // grid.columns
+    return cwidth * grid.columns, cheight * rows
+
+def get_sprite_sheet_lod_rect(grid: SpriteSheetGrid, cel_idx: int, lod_num: int) -> Tuple[int, int, int, int]:
+    """Returns x, y, width and height of cel texture LOD level in sprite sheet layer"""
+    cwidth, cheight = get_sprite_sheet_cell_size(grid)
+    x = (cel_idx % grid.columns) * cwidth
+    y = (cel_idx // grid.columns) * cheight
+    if lod_num > 0:
+        x += grid.cel_width
+        y += sum(grid.cel_height >> l for l in range(1, lod_num))
+    return x, y, grid.cel_width >> lod_num, grid.cel_height >> lod_num
+
+def get_layer_sprite_sheet(layer: Gimp.Layer) -> Optional[SpriteSheetGrid]:
+    """
+    Returns sprite sheet grid of the layer or None if layer is not a sprite sheet.
+    """
+    par = layer.get_parasite(SPRITE_SHEET_PARASITE)
+    if not par or len(par.get_data()) != ssg_serf.size:
+        return None
+    return SpriteSheetGrid._make(ssg_serf.unpack(bytes(par.get_data())))
+
+def set_layer_sprite_sheet(layer: Gimp.Layer, grid: SpriteSheetGrid) -> None:
+    """
+    Attach or update the sprite sheet grid parasite on a layer.
+    """
+    layer.detach_parasite(SPRITE_SHEET_PARASITE)
+
+    parasite = Gimp.Parasite.new(
+        name  = SPRITE_SHEET_PARASITE,
+        flags = 1, # 1-persistent
+        data  = list(ssg_serf.pack(*grid))
+    )
+    layer.attach_parasite(parasite)
+
+def get_image_reduced_view(img: Gimp.Image) -> Optional[ReducedView]:
+    """
+    Returns reduced view info of the image or None if image is not a reduced view.
+    """
+    par = img.get_parasite(REDUCED_VIEW_PARASITE)
+    if not par or len(par.get_data()) != rv_serf.size:
+        return None
+    return ReducedView._make(rv_serf.unpack(bytes(par.get_data())))
+
+def set_image_reduced_view(img: Gimp.Image, view: ReducedView) -> None:
+    """
+    Attach or update the reduced view parasite on an image.
+    """
+    img.detach_parasite(REDUCED_VIEW_PARASITE)
+
+    parasite = Gimp.Parasite.new(
+        name  = REDUCED_VIEW_PARASITE,
+        flags = 1, # 1-persistent
+        data  = list(rv_serf.pack(*view))
+    )
+    img.attach_parasite(parasite)
+
 def make_mipmap_lods(layer: Gimp.Layer, min_size: int = 1, max_level: int = -1) -> List[Gegl.Buffer]:
     """
     Generate a list of pixel regions for successive Mipmap levels of `layer`.